@@ -1,7 +1,14 @@
+import datetime
+from functools import partial
+
 import bleach
-from django.core.paginator import Paginator
-from django.db import models
+from django.core.paginator import InvalidPage
+from django.db import models, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.http import Http404, HttpResponseRedirect, JsonResponse
 from django.shortcuts import get_object_or_404
+from django.template.loader import render_to_string
 from django.utils import timezone
 from django.utils.functional import cached_property
 from django.utils.translation import gettext_lazy as _
@@ -14,11 +21,16 @@ from wagtail.contrib.routable_page.models import RoutablePageMixin, path
 from wagtail.fields import RichTextField
 from wagtail.models import Orderable, Page, PageManager, PageQuerySet
 from wagtail.search import index
+from wagtail.signals import page_published, page_unpublished
 from wagtailautocomplete.edit_handlers import AutocompletePanel
 
-from cdhweb.pages.mixin import StandardHeroMixinNoImage
+from cdhweb.pages.archive import ArchiveIndex
+from cdhweb.pages.blocks.tile_block import tile_image_prefetch
+from cdhweb.pages.mixin import DatedChildPageMixin, StandardHeroMixinNoImage
 from cdhweb.pages.models import BasePage, ContentPage, LinkPage
-from cdhweb.people.models import Person
+from cdhweb.pages.pagination import KeysetPaginator
+from cdhweb.pages.schedule import bump_generation
+from cdhweb.people.models import Person, PersonRelatedLink, Profile
 
 
 class Author(Orderable):
@@ -58,7 +70,7 @@ class BlogPostTag(TaggedItemBase):
     )
 
 
-class BlogPost(BasePage, ClusterableModel):
+class BlogPost(DatedChildPageMixin, BasePage, ClusterableModel):
     """A Blog post, implemented as a Wagtail page."""
 
     template = "blog/blog_post.html"
@@ -185,36 +197,22 @@ class BlogPost(BasePage, ClusterableModel):
         """Comma-separated list of author names."""
         return ", ".join(str(author.person) for author in self.authors.all())
 
-    def get_url_parts(self, request, *args, **kwargs):
+    def get_dated_route_kwargs(self):
         """Custom blog post URLs of the form /updates/2014/03/01/my-post."""
-        url_parts = super().get_url_parts(request, *args, **kwargs)
-        # NOTE evidently these can sometimes be None; unclear why – perhaps it
-        # gets called in a context where the request is unavailable. Seems to
-        # happen immediately on page creation; the creation still succeeds.
-        if url_parts and self.first_published_at:
-            site_id, root_url, _remainder = url_parts
-            parent = self.get_parent().specific
-
-            # If for some reason we don't have a bloglanding-style parent, just
-            # use `super()`
-            if not hasattr(parent, "reverse_subpage"):
-                return url_parts
-
-            # These dates need to be in DEFAULT_TIMEZONE, rather than UTC,
-            # otherwise the dates don't match up with the generated URLs (in
-            # `BlogPage.get_url_parts`)
-            path_date = timezone.localtime(self.first_published_at)
-            page_path = parent.reverse_subpage(
-                "dated_child",
-                kwargs={
-                    "year": path_date.year,
-                    # force two-digit month and day
-                    "month": "%02d" % path_date.month,
-                    "day": "%02d" % path_date.day,
-                    "slug": self.slug,
-                },
-            )
-            return site_id, root_url, parent.get_url(request) + page_path
+        # NOTE first published date is not set until the post is published
+        if not self.first_published_at:
+            return None
+        # These dates need to be in DEFAULT_TIMEZONE, rather than UTC,
+        # otherwise the dates don't match up with the generated URLs (in
+        # `BlogLandingPage.dated_child`)
+        path_date = timezone.localtime(self.first_published_at)
+        return {
+            "year": path_date.year,
+            # force two-digit month and day
+            "month": "%02d" % path_date.month,
+            "day": "%02d" % path_date.day,
+            "slug": self.slug,
+        }
 
     def get_sitemap_urls(self, request):
         """Override sitemap listings to add priority for featured posts."""
@@ -226,6 +224,47 @@ class BlogPost(BasePage, ClusterableModel):
         return urls
 
 
+class BlogMonthIndex(ArchiveIndex):
+    """Cached index of the months with published blog posts and the number
+    of posts in each, most recent first."""
+
+    model = BlogPost
+    date_field = "first_published_at"
+    cache_key = "blog-month-index"
+    reverse = True
+
+    def get_period(self, date):
+        date = timezone.localtime(date)
+        return datetime.date(date.year, date.month, 1)
+
+
+#: month archive index for blog posts, cleared on publish
+month_index = BlogMonthIndex().connect()
+
+#: generation name for cached blog feeds; advanced when posts are published
+#: and when authors change
+FEED_GENERATION = "blog-feeds"
+
+
+@receiver(page_published, sender=BlogPost)
+@receiver(page_unpublished, sender=BlogPost)
+@receiver(post_delete, sender=BlogPost)
+@receiver(post_save, sender=Person)
+@receiver(post_delete, sender=Person)
+@receiver(post_save, sender=PersonRelatedLink)
+@receiver(post_delete, sender=PersonRelatedLink)
+@receiver(page_published, sender=Profile)
+@receiver(page_unpublished, sender=Profile)
+@receiver(post_delete, sender=Profile)
+def clear_cached_feeds(sender, **kwargs):
+    """Handler to replace cached blog feeds when posts are published,
+    unpublished or deleted, and when anything included for their authors
+    (name, email, profile or website link) changes. The generation is
+    advanced once the change is committed, so that a feed rendered from
+    the previous content can't be cached under the new generation."""
+    transaction.on_commit(partial(bump_generation, FEED_GENERATION))
+
+
 class BlogLinkPageArchived(LinkPage):
     """Container page that defines where blog posts can be created."""
 
@@ -251,25 +290,74 @@ class BlogLandingPage(StandardHeroMixinNoImage, RoutablePageMixin, Page):
 
     subpage_types = [BlogPost, ContentPage]
 
-    def get_context(self, request, year=None, month=None):
-        context = super().get_context(request)
-
+    def get_paginator(self, year=None, month=None):
+        """Keyset paginator for posts, optionally for a year and month."""
         if year:
             posts = self.get_posts_for_year_and_month(year=year, month=month)
         else:
             posts = self.get_latest_posts()
 
-        posts = posts.prefetch_related("image", "image__renditions")
+        posts = posts.prefetch_related(tile_image_prefetch("image"))
+        return KeysetPaginator(posts, self.page_size, "-first_published_at")
+
+    def get_posts_page(self, request, year=None, month=None):
+        """Page of posts for the ``cursor`` request parameter, using keyset
+        pagination on publication date so that later pages are as cheap
+        as the first. Raises :class:`~django.http.Http404` for an invalid
+        cursor."""
+        try:
+            return self.get_paginator(year, month).page(request.GET.get("cursor"))
+        except InvalidPage:
+            raise Http404
+
+    def get_legacy_page_url(self, request, year=None, month=None):
+        """Url with a cursor for a numbered ``page`` request parameter, as
+        used before keyset pagination, so that existing links still get
+        the posts they refer to. Raises :class:`~django.http.Http404` for
+        an invalid or out of range page number."""
+        try:
+            number = int(request.GET["page"])
+        except ValueError:
+            raise Http404
+        if number < 1:
+            raise Http404
+        params = request.GET.copy()
+        del params["page"]
+        params.pop("cursor", None)
+        if number > 1:
+            paginator = self.get_paginator(year, month)
+            # the page follows the last post of the previous page
+            offset = (number - 1) * self.page_size - 1
+            posts = paginator.queryset.prefetch_related(None)
+            last = posts.values("pk", "first_published_at")[offset : offset + 1]
+            if not last:
+                raise Http404
+            params["cursor"] = paginator.encode_cursor(posts.model(**last[0]), "n")
+        return "%s?%s" % (request.path, params.urlencode()) if params else request.path
+
+    def serve(self, request, view=None, args=None, kwargs=None):
+        # redirect numbered listing pages to the equivalent cursor; not
+        # permanent, since the posts on a numbered page change as posts
+        # are published
+        if "page" in request.GET and view in (None, self.index_route, self.by_date):
+            kwargs = kwargs or {}
+            return HttpResponseRedirect(
+                self.get_legacy_page_url(
+                    request, year=kwargs.get("year"), month=kwargs.get("month")
+                )
+            )
+        return super().serve(request, view, args, kwargs)
+
+    def get_context(self, request, year=None, month=None):
+        context = super().get_context(request)
 
-        page_number = request.GET.get("page") or 1
-        paginator = Paginator(posts, self.page_size)
-        page = paginator.page(page_number)
+        page = self.get_posts_page(request, year=year, month=month)
         context.update(
             {
-                "paginator": paginator,
                 "is_paginated": page.has_other_pages(),
                 "page_obj": page,  # Used in pagination template
                 "posts": page,  # Used in page template
+                "tiles_url": self.get_tiles_url(year, month),
             }
         )
 
@@ -283,6 +371,26 @@ class BlogLandingPage(StandardHeroMixinNoImage, RoutablePageMixin, Page):
         context = self.get_context(request, year=year, month=month)
         return self.render(request, context_overrides=context)
 
+    # not "tiles/", which the legacy blog post redirect would match
+    @path("latest/tiles/", name="tiles")
+    @path("<int:year>/tiles/", name="tiles-by-year")
+    @path("<int:year>/<int:month>/tiles/", name="tiles-by-month")
+    def tiles(self, request, year=None, month=None):
+        """Rendered tiles for a page of posts as JSON, for loading more
+        posts without reloading the page: ``html`` for the tiles and
+        ``next``, the url for the following page (null on the last
+        page)."""
+        page = self.get_posts_page(request, year=year, month=month)
+        next_url = None
+        if page.has_next():
+            params = request.GET.copy()
+            params["cursor"] = page.next_cursor
+            next_url = "%s?%s" % (request.path, params.urlencode())
+        html = render_to_string(
+            "blog/blog_tiles.html", {"posts": page}, request=request
+        )
+        return JsonResponse({"html": html, "next": next_url})
+
     @path("<int:year>/<int:month>/<int:day>/<slug:slug>/", name="dated_child")
     def dated_child(self, request, year=None, month=None, day=None, slug=None):
         child = get_object_or_404(
@@ -298,6 +406,18 @@ class BlogLandingPage(StandardHeroMixinNoImage, RoutablePageMixin, Page):
         )
         return child.specific.serve(request)
 
+    def get_tiles_url(self, year=None, month=None):
+        """Url for the JSON tiles endpoint matching a year or month archive."""
+        if month:
+            subpage = self.reverse_subpage(
+                "tiles-by-month", kwargs={"year": year, "month": month}
+            )
+        elif year:
+            subpage = self.reverse_subpage("tiles-by-year", kwargs={"year": year})
+        else:
+            subpage = self.reverse_subpage("tiles")
+        return self.url + subpage
+
     def get_posts_for_year_and_month(self, year=None, month=None):
         # get blogs by year and month
         child_qs = self.get_latest_posts().filter(first_published_at__year=year)
@@ -309,10 +429,10 @@ class BlogLandingPage(StandardHeroMixinNoImage, RoutablePageMixin, Page):
         child_pages = self.get_children().live().public().specific()
 
         # Fetch all posts ordered by most recently published
-        return child_pages.order_by("-first_published_at")
+        return child_pages.order_by("-first_published_at", "-pk")
 
     def get_list_of_dates(self):
-        # get list of dates to sort by
-
-        child_pages = self.get_children().live()
-        return child_pages.dates("first_published_at", "month", order="DESC")
+        """List of months with published posts on this page, most recent
+        first, as ``(date, number of posts)`` tuples; from the cached
+        :data:`month_index`."""
+        return month_index.periods(parent=self)
@@ -1,4 +1,8 @@
+from datetime import datetime
+from unittest.mock import patch
+
 import pytest
+from django.utils.timezone import get_default_timezone
 from wagtail.test.utils import WagtailPageTestCase
 
 from cdhweb.blog.models import BlogLandingPage, BlogLinkPageArchived, BlogPost
@@ -71,3 +75,95 @@ class TestBlogLinkPageArchived(WagtailPageTestCase):
     def test_parent_page_types(self):
         """blog link page can't be created in admin"""
         self.assertAllowedParentPageTypes(BlogLinkPageArchived, [])
+
+
+@pytest.fixture
+def blog_landing_page(db, homepage):
+    """Blog landing page with three posts: two in March 2019, one in 2020."""
+    landing = BlogLandingPage(title="Updates", slug="updates")
+    homepage.add_child(instance=landing)
+    for slug, pubdate in [
+        ("first", datetime(2019, 3, 1, 12)),
+        ("second", datetime(2019, 3, 20, 12)),
+        ("third", datetime(2020, 1, 5, 12)),
+    ]:
+        post = BlogPost(title=slug, slug=slug)
+        landing.add_child(instance=post)
+        post.first_published_at = pubdate.replace(tzinfo=get_default_timezone())
+        post.save()
+    return landing
+
+
+@patch.object(BlogLandingPage, "page_size", 2)
+class TestBlogLandingPage:
+    def test_paginated(self, client, blog_landing_page):
+        """landing page should link to older posts with a cursor"""
+        response = client.get(blog_landing_page.url)
+        assert [post.slug for post in response.context["posts"]] == [
+            "third",
+            "second",
+        ]
+        page = response.context["page_obj"]
+        assert page.has_next() and not page.has_previous()
+        assert "?cursor=%s" % page.next_cursor in response.content.decode()
+        response = client.get(blog_landing_page.url, {"cursor": page.next_cursor})
+        assert [post.slug for post in response.context["posts"]] == ["first"]
+        assert response.context["page_obj"].has_previous()
+
+    def test_legacy_page(self, client, blog_landing_page):
+        """numbered pages should redirect to the equivalent cursor"""
+        url = blog_landing_page.url
+        response = client.get(url, {"page": 2})
+        assert response.status_code == 302
+        response = client.get(response["Location"])
+        assert [post.slug for post in response.context["posts"]] == ["first"]
+        # other parameters are kept
+        response = client.get(url, {"page": 1, "utm_source": "x"})
+        assert response["Location"] == url + "?utm_source=x"
+        month_url = url + blog_landing_page.reverse_subpage(
+            "by-month", kwargs={"year": 2019, "month": 3}
+        )
+        response = client.get(month_url, {"page": 1})
+        assert response["Location"] == month_url
+        for page in [3, 0, "x"]:
+            assert client.get(url, {"page": page}).status_code == 404
+        # only listings are paginated; posts ignore the parameter
+        post = BlogPost.objects.get(slug="first")
+        response = client.get(post.url, {"page": 2})
+        assert response.status_code == 200
+        assert response.context["page"] == post
+
+    def test_invalid_cursor(self, client, blog_landing_page):
+        response = client.get(blog_landing_page.url, {"cursor": "bogus"})
+        assert response.status_code == 404
+
+    def test_month(self, client, blog_landing_page):
+        url = blog_landing_page.url + blog_landing_page.reverse_subpage(
+            "by-month", kwargs={"year": 2019, "month": 3}
+        )
+        response = client.get(url)
+        assert [post.slug for post in response.context["posts"]] == [
+            "second",
+            "first",
+        ]
+        assert not response.context["is_paginated"]
+        assert response.context["tiles_url"] == "/updates/2019/3/tiles/"
+
+    def test_tiles(self, client, blog_landing_page):
+        """tiles endpoint should return rendered tiles and the next url"""
+        url = blog_landing_page.url + blog_landing_page.reverse_subpage("tiles")
+        data = client.get(url).json()
+        assert "third" in data["html"] and "second" in data["html"]
+        assert "first" not in data["html"]
+        assert data["next"].startswith(url + "?cursor=")
+        data = client.get(data["next"]).json()
+        assert "first" in data["html"]
+        assert data["next"] is None
+
+    def test_tiles_by_year(self, client, blog_landing_page):
+        url = blog_landing_page.url + blog_landing_page.reverse_subpage(
+            "tiles-by-year", kwargs={"year": 2020}
+        )
+        data = client.get(url).json()
+        assert "third" in data["html"] and "second" not in data["html"]
+        assert data["next"] is None
@@ -1,10 +1,16 @@
 from datetime import date, timezone
+from unittest.mock import patch
 
 import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
-from pytest_django.asserts import assertContains
+from pytest_django.asserts import assertContains, assertNotContains
 
+from cdhweb.blog.models import Author
 from cdhweb.blog.tests.conftest import announcement
+from cdhweb.blog.views import RssBlogPostFeed
 
 
 class TestRssBlogPostFeed:
@@ -60,3 +66,96 @@ class TestRssBlogPostFeed:
                 "%a, %d %b %Y %H:%M:%S %z"
             ),
         )
+
+    def test_cached(self, client, blog_posts, django_capture_on_commit_callbacks):
+        """rendered feed should be cached until a post is published"""
+        response = client.get(reverse("rss"))
+        with CaptureQueriesContext(connection) as queries:
+            cached_response = client.get(reverse("rss"))
+        assert cached_response.content == response.content
+        assert not queries
+        # publishing a post replaces the cached feed
+        post = blog_posts["announcement"]
+        post.title = "A Bigger Announcement!"
+        with django_capture_on_commit_callbacks(execute=True):
+            post.save_revision().publish()
+            # not until the change is committed
+            assertNotContains(client.get(reverse("rss")), post.title)
+        assertContains(client.get(reverse("rss")), post.title)
+
+    def test_cached_page_number(self, client, blog_posts):
+        """variants of a page number should share a cached feed"""
+        client.get(reverse("rss"))
+        with CaptureQueriesContext(connection) as queries:
+            client.get(reverse("rss"), {"page": "1"})
+            client.get(reverse("rss"), {"page": "01"})
+        assert not queries
+
+    def test_cached_authors(
+        self,
+        client,
+        blog_posts,
+        staffer,
+        staffer_profile,
+        django_capture_on_commit_callbacks,
+    ):
+        """author and profile changes should replace the cached feed"""
+        Author.objects.create(post=blog_posts["announcement"], person=staffer)
+        assertContains(client.get(reverse("atom")), staffer_profile.get_url())
+        staffer.email = "new.email@example.com"
+        with django_capture_on_commit_callbacks(execute=True):
+            staffer.save()
+        assertContains(client.get(reverse("atom")), staffer.email)
+        with django_capture_on_commit_callbacks(execute=True):
+            staffer_profile.unpublish()
+        assertNotContains(client.get(reverse("atom")), staffer_profile.get_url())
+
+    def test_conditional(self, client, blog_posts):
+        """feed should support conditional requests"""
+        response = client.get(reverse("rss"))
+        assert response["Last-Modified"]
+        response = client.get(reverse("rss"), HTTP_IF_NONE_MATCH=response["ETag"])
+        assert response.status_code == 304
+
+    def test_queries(self, client, blog_posts, grad_pi, postdoc, faculty_pi):
+        """number of queries should not depend on the number of authors"""
+
+        def feed_queries():
+            cache.clear()
+            with CaptureQueriesContext(connection) as queries:
+                client.get(reverse("rss"))
+            return len(queries)
+
+        for post in blog_posts.values():
+            Author.objects.create(post=post, person=grad_pi)
+            Author.objects.create(post=post, person=faculty_pi)
+        # first request populates cached sites and settings
+        feed_queries()
+        num_queries = feed_queries()
+        for post in blog_posts.values():
+            Author.objects.create(post=post, person=postdoc)
+        assert feed_queries() == num_queries
+
+    @patch.object(RssBlogPostFeed, "page_size", 2)
+    def test_paging(self, client, blog_posts):
+        """older posts should be available in paged archive feeds"""
+        url = "http://example.com%s" % reverse("rss")
+        response = client.get(reverse("rss"))
+        assertContains(response, '<atom:link href="%s?page=2" rel="next"' % url)
+        assertContains(response, '<atom:link href="%s?page=2" rel="last"' % url)
+        assertNotContains(response, 'rel="previous"')
+        assertContains(response, "<item>", count=2)
+        response = client.get(reverse("rss"), {"page": 2})
+        assertContains(response, "<item>", count=1)
+        assertContains(response, blog_posts["project_feature"].title)
+        assertContains(response, '<atom:link href="%s" rel="previous"' % url)
+        assert client.get(reverse("rss"), {"page": 3}).status_code == 404
+        assert client.get(reverse("rss"), {"page": "x"}).status_code == 404
+
+
+class TestAtomBlogPostFeed:
+    @patch.object(RssBlogPostFeed, "page_size", 2)
+    def test_paging(self, client, blog_posts):
+        response = client.get(reverse("atom"))
+        assertContains(response, 'rel="next"')
+        assertContains(response, "<entry>", count=2)
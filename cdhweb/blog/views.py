@@ -1,25 +1,148 @@
+import hashlib
 from typing import Any
 
-from django.contrib.syndication.views import Feed
-from django.shortcuts import get_object_or_404
-from django.utils.feedgenerator import Atom1Feed
+from django.contrib.sites.shortcuts import get_current_site
+from django.contrib.syndication.views import Feed, add_domain
+from django.core.cache import cache
+from django.core.paginator import InvalidPage, Paginator
+from django.db.models import Prefetch
+from django.http import Http404, HttpResponse, HttpResponsePermanentRedirect
+from django.utils.cache import get_conditional_response
+from django.utils.feedgenerator import Atom1Feed, Rss201rev2Feed
+from django.utils.http import parse_http_date
 from django.views.generic.base import RedirectView
 from django.views.generic.detail import DetailView
+from wagtail.views import serve
 
-from cdhweb.blog.models import BlogPost
+from cdhweb.blog.models import FEED_GENERATION, Author, BlogPost
+from cdhweb.pages.redirects import get_redirect
+from cdhweb.pages.schedule import get_generation
+
+
+class PagedFeedMixin:
+    """Feed generator mixin to add RFC 5005 paging links (first, previous,
+    next and last pages of the feed) to the feed metadata."""
+
+    def add_paging_links(self, handler, element):
+        for rel, href in self.feed.get("paging_links", {}).items():
+            handler.addQuickElement(element, "", {"rel": rel, "href": href})
+
+
+class PagedRssFeed(PagedFeedMixin, Rss201rev2Feed):
+    def add_root_elements(self, handler):
+        super().add_root_elements(handler)
+        self.add_paging_links(handler, "atom:link")
+
+
+class PagedAtomFeed(PagedFeedMixin, Atom1Feed):
+    def add_root_elements(self, handler):
+        super().add_root_elements(handler)
+        self.add_paging_links(handler, "link")
 
 
 class RssBlogPostFeed(Feed):
-    """Blog post RSS feed"""
+    """Blog post RSS feed. The first page is the most recent posts; older
+    posts are available in paged archive feeds (RFC 5005) with the ``page``
+    parameter. Rendered feeds are cached until the next post is published
+    or an author changes, and served with ETag and Last-Modified headers."""
 
+    feed_type = PagedRssFeed
     title = "Center for Digital Humanities @ Princeton University Updates"
     link = "/updates/"  # use the old updates url for now
     description = "Updates and news on work from the Center for Digital Humanities @ Princeton University"
     description_template = "blog/feed_description.html"
 
-    def items(self):
-        """ten most recent blog posts, ordered by publish date"""
-        return BlogPost.objects.live().recent()[:10]
+    #: number of posts per page of the feed
+    page_size = 10
+    #: fallback timeout for cached feeds; they are replaced on publish
+    cache_timeout = 60 * 60 * 24
+
+    def __call__(self, request, *args, **kwargs):
+        # cache on the page number, so variants like ?page=01 share an entry
+        try:
+            page = int(request.GET.get("page", 1))
+        except ValueError:
+            raise Http404("Invalid feed page")
+        key = "blog-feed-%s-%s-%d-%d" % (
+            self.__class__.__name__,
+            request.get_host(),
+            page,
+            get_generation(FEED_GENERATION),
+        )
+        cached = cache.get(key)
+        if cached is None:
+            response = super().__call__(request, *args, **kwargs)
+            cached = {
+                "content": response.content,
+                "content_type": response["Content-Type"],
+                "last_modified": response.get("Last-Modified"),
+                "etag": '"%s"' % hashlib.md5(response.content).hexdigest(),
+            }
+            cache.set(key, cached, self.cache_timeout)
+
+        last_modified = cached["last_modified"]
+        response = get_conditional_response(
+            request,
+            etag=cached["etag"],
+            last_modified=parse_http_date(last_modified) if last_modified else None,
+        )
+        if response is None:
+            response = HttpResponse(
+                cached["content"], content_type=cached["content_type"]
+            )
+        response["ETag"] = cached["etag"]
+        if last_modified:
+            response["Last-Modified"] = last_modified
+        return response
+
+    def get_object(self, request, *args, **kwargs):
+        """Page of posts to include, based on the ``page`` parameter."""
+        paginator = Paginator(self.get_queryset(), self.page_size)
+        try:
+            page = paginator.page(request.GET.get("page", 1))
+        except InvalidPage:
+            raise Http404("Invalid feed page")
+        # feed instances are shared between requests, so keep the url for
+        # paging links (on the same domain as the feed self link) with the page
+        page.feed_url = add_domain(
+            get_current_site(request).domain, request.path, request.is_secure()
+        )
+        return page
+
+    def get_queryset(self):
+        """published posts, most recent first, with the related data needed
+        for the feed"""
+        return (
+            BlogPost.objects.live()
+            .recent()
+            .prefetch_related(
+                Prefetch(
+                    "authors",
+                    queryset=Author.objects.select_related(
+                        "person", "person__profile"
+                    ).prefetch_related("person__related_links__type"),
+                ),
+                "tags",
+            )
+        )
+
+    def items(self, page):
+        """posts on the current page of the feed"""
+        return page.object_list
+
+    def feed_extra_kwargs(self, page):
+        """links to other pages of the feed, for paging"""
+        url = page.feed_url
+        links = {"first": url, "last": "%s?page=%d" % (url, page.paginator.num_pages)}
+        if page.has_previous():
+            links["previous"] = (
+                "%s?page=%d" % (url, page.previous_page_number())
+                if page.previous_page_number() > 1
+                else url
+            )
+        if page.has_next():
+            links["next"] = "%s?page=%d" % (url, page.next_page_number())
+        return {"paging_links": links}
 
     def item_title(self, item):
         """blog post title"""
@@ -38,16 +161,24 @@ class RssBlogPostFeed(Feed):
         """author of the blog post; comma-separated list for multiple"""
         return item.author_list or None
 
+    def _single_author(self, item):
+        # the author, if there is only one; uses prefetched authors
+        authors = item.authors.all()
+        if len(authors) == 1:
+            return authors[0].person
+
     def item_author_email(self, item):
         """author email, if there is only one author"""
-        if item.authors.count() == 1:
-            return item.authors.first().person.email
+        author = self._single_author(item)
+        if author:
+            return author.email
 
     def item_author_link(self, item):
         """link to author profile page, if there is only one author and
         the author has a published profile"""
-        if item.authors.count() == 1:
-            return item.authors.first().person.profile_url
+        author = self._single_author(item)
+        if author:
+            return author.profile_url
 
     def item_pubdate(self, item):
         """publication date"""
@@ -65,14 +196,28 @@ class RssBlogPostFeed(Feed):
 class AtomBlogPostFeed(RssBlogPostFeed):
     """Blog post Atom feed"""
 
-    feed_type = Atom1Feed
+    feed_type = PagedAtomFeed
     subtitle = RssBlogPostFeed.description
 
 
 class BlogPostRedirectView(RedirectView):
+    """Redirect legacy blog post urls by slug, from the in-memory
+    redirect table."""
+
     pattern_name = "blog-detail"
     permanent = True
 
+    def get(self, request, *args, **kwargs):
+        url = self.get_redirect_url(*args, **kwargs)
+        # when the blog itself lives under /updates/, current post urls
+        # match the legacy pattern; serve the page instead of redirecting
+        # to the same url
+        if url == request.path:
+            return serve(request, request.path)
+        return HttpResponsePermanentRedirect(url)
+
     def get_redirect_url(self, *args, **kwargs):
-        post = get_object_or_404(BlogPost, slug=kwargs["slug"])
-        return post.url
+        redirect = get_redirect(self.request, self.request.path)
+        if redirect is None:
+            raise Http404
+        return redirect[0]
@@ -1,10 +1,15 @@
+from django.db.models import Prefetch
+from django.urls import reverse
+from wagtail import hooks
 from wagtail_modeladmin.mixins import ThumbnailMixin
 from wagtail_modeladmin.options import ModelAdmin, modeladmin_register
 
-from cdhweb.blog.models import BlogPost
+from cdhweb.blog.models import Author, BlogLandingPage, BlogPost
+from cdhweb.pages.benchmarks import Benchmark, page_benchmark
+from cdhweb.pages.modeladmin import ListQueryMixin, StreamingExportMixin
 
 
-class BlogPostAdmin(ThumbnailMixin, ModelAdmin):
+class BlogPostAdmin(ListQueryMixin, StreamingExportMixin, ThumbnailMixin, ModelAdmin):
     model = BlogPost
     menu_icon = "edit"
     list_display = (
@@ -16,16 +21,28 @@ class BlogPostAdmin(ThumbnailMixin, ModelAdmin):
         "featured",
     )
     list_display_add_buttons = "title"
+    list_select_related = ("image",)
+    list_prefetch_related = [
+        Prefetch("authors", queryset=Author.objects.select_related("person")),
+        "image__renditions",
+    ]
     list_filter = ("featured", "first_published_at")
     list_export = (
         "title",
         "author_list",
         "first_published_at",
         "featured",
-        "featured_image",
+        "image",
         "tags",
         "body",
     )
+    export_prefetch = {
+        "author_list": [
+            Prefetch("authors", queryset=Author.objects.select_related("person"))
+        ],
+        "image": ["image"],
+        "tags": ["tags"],
+    }
     export_filename = "cdhweb-blogposts"
     search_fields = (
         "title",
@@ -33,7 +50,7 @@ class BlogPostAdmin(ThumbnailMixin, ModelAdmin):
         "authors__person__last_name",
         "body",
     )
-    thumb_image_field_name = "featured_image"
+    thumb_image_field_name = "image"
     thumb_col_header_text = "image"
     ordering = ("-first_published_at",)
     list_per_page = 25
@@ -41,3 +58,29 @@ class BlogPostAdmin(ThumbnailMixin, ModelAdmin):
 
 
 modeladmin_register(BlogPostAdmin)
+
+
+@hooks.register("register_redirect_prefixes")
+def register_legacy_post_redirects():
+    """Redirect legacy blog post urls (``/updates/<slug>/``, optionally
+    with a date) to the current url for the post with that slug."""
+    return {"/updates/": legacy_post_urls}
+
+
+def legacy_post_urls():
+    """Current urls for live blog posts keyed on slug; if more than one
+    post has the same slug, the most recently published is used."""
+    posts = list(BlogPost.objects.live().order_by("first_published_at"))
+    urls = BlogPost.urls_for(posts)
+    return {post.slug: urls[post.pk] for post in posts}
+
+
+@hooks.register("register_benchmarks")
+def register_blog_benchmarks():
+    """Blog listing, a blog post and the feeds."""
+    return [
+        *page_benchmark("blog", BlogLandingPage.objects.all(), 30),
+        *page_benchmark("blog-post", BlogPost.objects.all(), 45),
+        Benchmark("blog-rss", reverse("rss"), 5),
+        Benchmark("blog-atom", reverse("atom"), 5),
+    ]
@@ -1,10 +1,32 @@
 """Fixtures/utilities that should be globally available for testing."""
+
 # FIXME not sure how else to share fixtures that depend on other fixtures
 # between modules - if you import just the top-level fixture (e.g. "events"),
 # it fails to find the fixture dependencies, and so on all the way down. For
 # now this does what we want, although it pollutes the namespace somewhat
+import pytest
+from django.core.cache import cache
+
 from cdhweb.blog.tests.conftest import *
 from cdhweb.events.tests.conftest import *
+from cdhweb.pages.redirects import redirect_table
 from cdhweb.pages.tests.conftest import *
 from cdhweb.people.tests.conftest import *
 from cdhweb.projects.tests.conftest import *
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    """Clear the cache before each test, so cached archive indexes and
+    other cached data from previous tests are never used."""
+    cache.clear()
+    # in-memory data that is rebuilt based on cached generations
+    redirect_table.generation = None
+
+
+@pytest.fixture(autouse=True)
+def media_root(settings, tmp_path):
+    """Save uploaded files, images and renditions to a temporary directory,
+    so tests never write to the project media directory."""
+    settings.MEDIA_ROOT = tmp_path
+    return tmp_path
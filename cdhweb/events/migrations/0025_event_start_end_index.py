@@ -0,0 +1,17 @@
+# Generated by Django 5.0.14 on 2026-10-19 15:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0024_alter_event_body'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['start_time', 'end_time'], name='events_event_start_end_idx'),
+        ),
+    ]
@@ -1,11 +1,14 @@
 # -*- coding: utf-8 -*-
 
 import datetime
+import hashlib
 
 import icalendar
+from django.core.cache import cache
 from django.core.exceptions import ValidationError
 from django.db import models
 from django.db.models.fields.related import RelatedField
+from django.dispatch import receiver
 from django.shortcuts import get_object_or_404
 from django.urls import reverse
 from django.utils import timezone
@@ -21,10 +24,13 @@ from wagtail.contrib.routable_page.models import RoutablePageMixin, path, re_pat
 from wagtail.fields import RichTextField
 from wagtail.models import Page, PageManager, PageQuerySet
 from wagtail.search import index
+from wagtail.signals import page_published, page_unpublished
 from wagtailautocomplete.edit_handlers import AutocompletePanel
 
+from cdhweb.pages.archive import ArchiveIndex
 from cdhweb.pages.blocks.image_block import UnsizedImageBlock
-from cdhweb.pages.mixin import StandardHeroMixinNoImage
+from cdhweb.pages.blocks.tile_block import tile_image_prefetch
+from cdhweb.pages.mixin import DatedChildPageMixin, StandardHeroMixinNoImage
 from cdhweb.pages.models import BasePage, ContentPage, LandingPage, LinkPage
 from cdhweb.people.models import Person
 
@@ -83,6 +89,38 @@ class Location(models.Model):
             raise ValidationError("Address is required for non-virtual events")
 
 
+#: semester start (month, day); each semester ends when the next one starts.
+#: Semesters are Spring (through May), Summer (through August), and Fall.
+SEMESTER_STARTS = {"spring": (1, 1), "summer": (6, 1), "fall": (9, 1)}
+
+
+def semester_date_range(semester, year):
+    """Start (inclusive) and end (exclusive) datetimes for a semester,
+    in the default timezone. Raises :class:`ValueError` for an unknown
+    semester."""
+    semester = semester.lower()
+    if semester not in SEMESTER_STARTS:
+        raise ValueError(f"Invalid semester: {semester}")
+    tz = timezone.get_default_timezone()
+    start = datetime.datetime(year, *SEMESTER_STARTS[semester], tzinfo=tz)
+    semesters = list(SEMESTER_STARTS)
+    index = semesters.index(semester)
+    if index + 1 < len(semesters):
+        end = datetime.datetime(year, *SEMESTER_STARTS[semesters[index + 1]], tzinfo=tz)
+    else:
+        end = datetime.datetime(year + 1, *SEMESTER_STARTS[semesters[0]], tzinfo=tz)
+    return start, end
+
+
+def get_semester(date):
+    """Return the semester a date occurs in as a string."""
+    semester = None
+    for name, start in SEMESTER_STARTS.items():
+        if (date.month, date.day) >= start:
+            semester = name
+    return semester.title()
+
+
 class EventQuerySet(PageQuerySet):
     def upcoming(self):
         """Find upcoming events. Includes events that end on the current
@@ -108,6 +146,37 @@ class EventQuerySet(PageQuerySet):
         """Order events by start time"""
         return self.order_by("start_time")
 
+    def in_semester(self, semester, year):
+        """Find events that start during the specified semester."""
+        start, end = semester_date_range(semester, year)
+        return self.filter(start_time__gte=start, start_time__lt=end)
+
+    def overlapping(self, start, end):
+        """Find events that overlap a time range: events that start before
+        the end of the range (exclusive) and end during or after its
+        start."""
+        return self.filter(start_time__lt=end, end_time__gte=start)
+
+    def of_type(self, name):
+        """Filter events by event type name (case insensitive)."""
+        return self.filter(type__name__iexact=name)
+
+    def at_location(self, name):
+        """Filter events by location name or short name (case insensitive)."""
+        return self.filter(
+            models.Q(location__short_name__iexact=name)
+            | models.Q(location__name__iexact=name)
+        )
+
+    def for_tiles(self):
+        """Fetch everything displayed on event tiles (type, speakers and
+        images with their renditions) with a fixed number of queries."""
+        return self.select_related("type", "location").prefetch_related(
+            "speakers__person",
+            tile_image_prefetch("image"),
+            tile_image_prefetch("feed_image"),
+        )
+
 
 # custom manager for wagtail pages, see:
 # https://docs.wagtail.io/en/stable/topics/pages.html#custom-page-managers
@@ -137,7 +206,7 @@ class Speaker(models.Model):
         return "%s at %s" % (self.person, self.event)
 
 
-class Event(BasePage, ClusterableModel):
+class Event(DatedChildPageMixin, BasePage, ClusterableModel):
     """Page type for an event, such as a workshop, lecture, or conference."""
 
     template = "events/event_page.html"
@@ -278,6 +347,14 @@ class Event(BasePage, ClusterableModel):
         ),
     ]
 
+    class Meta:
+        indexes = [
+            # find events by date range, for calendar and date listings
+            models.Index(
+                fields=["start_time", "end_time"], name="events_event_start_end_idx"
+            )
+        ]
+
     def __str__(self):
         return " - ".join([self.title, self.start_time.strftime("%b %d, %Y")])
 
@@ -300,31 +377,16 @@ class Event(BasePage, ClusterableModel):
         if not self.type:
             raise ValidationError("Event must specify a type.")
 
-    def get_url_parts(self, request, *args, **kwargs):
+    def get_dated_route_kwargs(self):
         """Custom event page URLs of the form /events/2014/03/my-event."""
-        url_parts = super().get_url_parts(request, *args, **kwargs)
-        # NOTE evidently this can sometimes be None; unclear why – perhaps it
-        # gets called in a context where the request is unavailable? Only
-        # happens in QA, not locally.
-        if url_parts:
-            site_id, root_url, _remainder = url_parts
-            parent = self.get_parent().specific
-
-            # If for some reason we don't have a eventlanding-style parent, just
-            # use `super()`
-            if not hasattr(parent, "reverse_subpage"):
-                return url_parts
-
-            page_path = parent.reverse_subpage(
-                "dated_child",
-                kwargs={
-                    "year": self.start_time.year,
-                    # force two-digit month
-                    "month": "%02d" % self.start_time.month,
-                    "slug": self.slug,
-                },
-            )
-            return site_id, root_url, parent.get_url(request) + page_path
+        # use the local date, to match the parent route
+        start_time = timezone.localtime(self.start_time)
+        return {
+            "year": start_time.year,
+            # force two-digit month
+            "month": "%02d" % start_time.month,
+            "slug": self.slug,
+        }
 
     def get_ical_url(self):
         """URL to download this event as a .ics (iCal) file."""
@@ -383,6 +445,68 @@ class Event(BasePage, ClusterableModel):
         """duration between start and end time as :class:`datetime.timedelta`"""
         return self.end_time - self.start_time
 
+    #: how long serialized ical events are cached; they are replaced
+    #: whenever the event is published
+    ical_cache_timeout = 60 * 60 * 24 * 7
+
+    @property
+    def ical_version(self):
+        """Version of everything included in the serialized ical event: the
+        last publication time, the url path (which changes when the event
+        or one of its ancestors is moved or renamed) and the location, so
+        that changes to any of them are never served stale."""
+        published = self.last_published_at.timestamp() if self.last_published_at else 0
+        location = self.location
+        if location:
+            location = (
+                location.pk,
+                location.name,
+                location.address,
+                location.is_virtual,
+            )
+        return "%d:%d:%s:%s" % (self.pk, published, self.url_path, location)
+
+    @property
+    def ical_cache_key(self):
+        """Cache key for the serialized ical event, based on
+        :attr:`ical_version`."""
+        return "event-ical-%d-%s" % (
+            self.pk,
+            hashlib.md5(self.ical_version.encode()).hexdigest(),
+        )
+
+    def cache_ical_event(self):
+        """Serialize this event as an ical VEVENT, cache and return it."""
+        vevent = self.ical_event().to_ical()
+        cache.set(self.ical_cache_key, vevent, self.ical_cache_timeout)
+        return vevent
+
+    @classmethod
+    def get_ical_events(cls, events):
+        """Serialized ical VEVENTs for a list of events, in order. Cached
+        events are retrieved with a single cache read; any that are missing
+        are serialized and cached, loading deferred content for all of them
+        in a single query."""
+        cached = cache.get_many([event.ical_cache_key for event in events])
+        missing = [
+            event
+            for event in events
+            if event.ical_cache_key not in cached
+            and "body" in event.get_deferred_fields()
+        ]
+        if missing:
+            bodies = dict(
+                cls.objects.filter(pk__in=[event.pk for event in missing]).values_list(
+                    "pk", "body"
+                )
+            )
+            for event in missing:
+                event.body = bodies[event.pk]
+        return [
+            cached.get(event.ical_cache_key) or event.cache_ical_event()
+            for event in events
+        ]
+
     def ical_event(self):
         """Return the current event as a :class:`icalendar.Event` for
         inclusion in a :class:`icalendar.Calendar`"""
@@ -402,6 +526,37 @@ class Event(BasePage, ClusterableModel):
         return event
 
 
+class EventSemesterIndex(ArchiveIndex):
+    """Cached index of the semesters with published events and the number
+    of events in each."""
+
+    model = Event
+    date_field = "start_time"
+    cache_key = "events-semester-index"
+
+    def get_period(self, date):
+        # year, semester order, and semester label
+        date = timezone.localtime(date)
+        semester = get_semester(date)
+        return (date.year, list(SEMESTER_STARTS).index(semester.lower()), semester)
+
+
+#: semester archive index for events, cleared on publish
+semester_index = EventSemesterIndex().connect()
+
+
+@receiver(page_published, sender=Event)
+def cache_ical_event(sender, instance, **kwargs):
+    """Handler to rebuild the cached ical event when an event is published."""
+    instance.cache_ical_event()
+
+
+@receiver(page_unpublished, sender=Event)
+def clear_ical_event(sender, instance, **kwargs):
+    """Handler to remove the cached ical event when an event is unpublished."""
+    cache.delete(instance.ical_cache_key)
+
+
 class EventsLinkPageArchived(LinkPage):
     """Container page that defines where Event pages can be created."""
 
@@ -461,54 +616,29 @@ class EventsLandingPage(StandardHeroMixinNoImage, RoutablePageMixin, Page):
 
     def get_upcoming_events_for_semester(self, semester, year):
         # Adjust the semester and year to datetime ranges
-        if semester == "spring":
-            start_date = datetime.date(year, 1, 1)
-            end_date = datetime.date(year, 5, 31)
-        elif semester == "summer":
-            start_date = datetime.date(year, 6, 1)
-            end_date = datetime.date(year, 8, 31)
-        elif semester == "fall":
-            start_date = datetime.date(year, 9, 1)
-            end_date = datetime.date(year, 12, 31)
-        else:
-            raise ValueError(f"Invalid semester: {semester}")
+        start, end = semester_date_range(semester, year)
 
-        child_pages = self.get_children().live().specific().type(Event)
+        child_pages = Event.objects.child_of(self).live().for_tiles()
         # Filter events based on start_time within the semester range
-        return child_pages.filter(
-            event__start_time__gte=start_date, event__start_time__lte=end_date
-        ).order_by("event__start_time")
+        return child_pages.filter(start_time__gte=start, start_time__lt=end).order_by(
+            "start_time"
+        )
 
     def get_upcoming_events(self):
         current_datetime = timezone.now()
 
-        child_pages = self.get_children().live().specific().type(Event)
+        child_pages = Event.objects.child_of(self).live().for_tiles()
 
         # Fetch upcoming events among the child pages
-        return child_pages.filter(event__end_time__gte=current_datetime).order_by(
-            "event__start_time"
-        )
+        return child_pages.filter(end_time__gte=current_datetime).order_by("start_time")
 
-    @staticmethod
-    def get_semester(date):
-        """Return the semester a date occurs in as a string."""
-        # determine semester based on the month
-        if date.month <= 5:
-            return "Spring"
-        if date.month <= 8:
-            return "Summer"
-        return "Fall"
+    get_semester = staticmethod(get_semester)
 
     def get_semester_date_list(self):
-        """Get a list of semester labels (semester and year) for published
-        events. Semesters are Spring (through May), Summer (through
-        August), and Fall."""
-        date_list = []
-        dates = Event.objects.live().dates("start_time", "month", order="ASC")
-        for date in dates:
-            # add semester + year to list if not already present
-            sem_date = (self.get_semester(date), date.year)
-            if sem_date not in date_list:
-                date_list.append(sem_date)
-
-        return date_list
+        """Get a list of semesters (semester label, year, and number of
+        events) for published events, in order, from the cached
+        :data:`semester_index`."""
+        return [
+            (semester, year, count)
+            for (year, _, semester), count in semester_index.periods()
+        ]
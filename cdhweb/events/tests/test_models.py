@@ -1,7 +1,9 @@
 import pytest
 from django.core.exceptions import ValidationError
+from wagtail_factories import ImageFactory
+
+from cdhweb.events.models import Event, EventType, Location, semester_date_range
 
-from cdhweb.events.models import Event, EventType, Location
 
 class TestSpeaker:
     def test_str(self, lecture):
@@ -72,3 +74,31 @@ class TestEventQueryset:
         assert events["deadline"] not in recent
         assert recent[0] == events["workshop"]
         assert recent[1] == events["lecture"]
+
+    def test_in_semester(self, events):
+        assert list(Event.objects.in_semester("fall", 2019)) == [events["workshop"]]
+        assert list(Event.objects.in_semester("spring", 2017)) == [events["course"]]
+        assert not Event.objects.in_semester("summer", 2019).exists()
+
+    def test_for_tiles(self, workshop, django_assert_num_queries):
+        workshop.image = ImageFactory()
+        workshop.save()
+        tile = workshop.image.get_rendition("fill-400x222")
+        workshop.image.get_rendition("max-310x240")
+        # only the renditions displayed on tiles are loaded
+        event = Event.objects.filter(pk=workshop.pk).for_tiles().get()
+        assert event.image.prefetched_renditions == [tile]
+        with django_assert_num_queries(0):
+            assert event.image.get_rendition("fill-400x222") == tile
+
+
+def test_semester_date_range():
+    start, end = semester_date_range("spring", 2020)
+    assert (start.month, start.day) == (1, 1)
+    # end is exclusive; includes all of may 31
+    assert (end.month, end.day) == (6, 1)
+    start, end = semester_date_range("Fall", 2020)
+    assert (start.year, start.month) == (2020, 9)
+    assert (end.year, end.month, end.day) == (2021, 1, 1)
+    with pytest.raises(ValueError):
+        semester_date_range("winter", 2020)
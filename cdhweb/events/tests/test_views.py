@@ -8,6 +8,7 @@ from django.utils import timezone
 from pytest_django.asserts import assertContains
 from wagtail.models import Page
 
+from cdhweb.events.models import Event
 from cdhweb.events.views import EventSemesterDates
 
 
@@ -52,6 +53,146 @@ class TestEventIcalView:
         assert cal.subcomponents[0]["uid"] == workshop.get_full_url()
 
 
+def calendar_uids(response):
+    """parse a streamed ical calendar and return the included event uids"""
+    cal = icalendar.Calendar.from_ical(b"".join(response.streaming_content))
+    return [event["uid"] for event in cal.walk("vevent")]
+
+
+class TestIcalCalendarView:
+    url = "/events/calendar.ics"
+
+    def test_upcoming(self, client, events, upcoming_event):
+        response = client.get(self.url)
+        assert response["Content-Type"] == "text/calendar"
+        assert "CDH-calendar.ics" in response["Content-Disposition"]
+        # upcoming events only, in order
+        assert calendar_uids(response) == [
+            upcoming_event.get_full_url(),
+            events["deadline"].get_full_url(),
+        ]
+
+    def test_filters(self, client, events):
+        response = client.get(self.url, {"semester": "fall-2019"})
+        assert calendar_uids(response) == [events["workshop"].get_full_url()]
+        response = client.get(self.url, {"semester": "fall-2019", "type": "lecture"})
+        assert calendar_uids(response) == []
+        response = client.get(
+            self.url, {"semester": "spring-2018", "location": "zoom meeting"}
+        )
+        assert calendar_uids(response) == [events["lecture"].get_full_url()]
+        response = client.get(self.url, {"type": "deadline"})
+        assert calendar_uids(response) == [events["deadline"].get_full_url()]
+        # invalid semester
+        assert client.get(self.url, {"semester": "winter-2019"}).status_code == 404
+        assert client.get(self.url, {"semester": "fall"}).status_code == 404
+
+    def test_not_modified(self, client, events):
+        response = client.get(self.url)
+        etag = response["ETag"]
+        response = client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 304
+        # publishing changes the etag
+        events["deadline"].save_revision().publish()
+        response = client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200
+        assert response["ETag"] != etag
+
+    def test_cached_events(self, client, events):
+        deadline = events["deadline"]
+        # serialized and cached on publish
+        deadline.save_revision().publish()
+        with patch.object(Event, "ical_event") as mock_ical_event:
+            response = client.get(self.url)
+            assert calendar_uids(response) == [deadline.get_full_url()]
+            mock_ical_event.assert_not_called()
+
+    def test_location_and_url_changes(self, client, events):
+        workshop = events["workshop"]
+        workshop.save_revision().publish()
+        params = {"semester": "fall-2019"}
+        etag = client.get(self.url, params)["ETag"]
+        # editing the location changes the cached event and the etag
+        workshop.location.name = "New Venue"
+        workshop.location.save()
+        response = client.get(self.url, params, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200
+        cal = icalendar.Calendar.from_ical(b"".join(response.streaming_content))
+        assert "New Venue" in cal.walk("vevent")[0]["location"]
+        etag = response["ETag"]
+        # so does renaming an ancestor page
+        parent = workshop.get_parent()
+        parent.slug = "happenings"
+        parent.save()
+        response = client.get(self.url, params, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200
+        workshop.refresh_from_db()
+        assert "/happenings/" in workshop.get_full_url()
+        assert calendar_uids(response) == [workshop.get_full_url()]
+
+
+class TestEventCalendarView:
+    url = "/events/calendar.json"
+
+    def test_range(self, client, events):
+        # october 2019 includes the workshop
+        response = client.get(self.url, {"start": "2019-10-01", "end": "2019-11-01"})
+        assert response.status_code == 200
+        data = response.json()["events"]
+        assert len(data) == 1
+        workshop = events["workshop"]
+        assert data[0]["id"] == workshop.pk
+        assert data[0]["title"] == workshop.title
+        assert data[0]["url"] == workshop.get_url()
+        assert data[0]["type"] == "Workshop"
+        assert data[0]["location"] == "CDH"
+        assert "public" in response["Cache-Control"]
+        # range ending before the event starts
+        response = client.get(self.url, {"start": "2019-09-01", "end": "2019-10-05"})
+        assert response.json()["events"] == []
+
+    def test_overlapping(self, client, events):
+        # course runs february to april 2017; a week in march overlaps
+        response = client.get(
+            self.url, {"start": "2017-03-06T00:00", "end": "2017-03-13T00:00"}
+        )
+        assert [event["id"] for event in response.json()["events"]] == [
+            events["course"].pk
+        ]
+
+    def test_filters(self, client, events):
+        # april 2018 includes the lecture
+        params = {"start": "2018-04-01", "end": "2018-05-01"}
+        assert len(client.get(self.url, params).json()["events"]) == 1
+        response = client.get(self.url, {**params, "type": "workshop"})
+        assert response.json()["events"] == []
+        response = client.get(self.url, {**params, "type": "lecture"})
+        assert len(response.json()["events"]) == 1
+        response = client.get(self.url, {**params, "location": "zoom meeting"})
+        assert response.json()["events"][0]["location"] == "Zoom Meeting"
+        response = client.get(self.url, {**params, "location": "CDH"})
+        assert response.json()["events"] == []
+
+    def test_invalid(self, db, client):
+        assert client.get(self.url).status_code == 400
+        assert client.get(self.url, {"start": "2019-10-01"}).status_code == 400
+        response = client.get(self.url, {"start": "2019-10-01", "end": "soon"})
+        assert response.status_code == 400
+        # end before start
+        response = client.get(self.url, {"start": "2019-10-01", "end": "2019-09-01"})
+        assert response.status_code == 400
+        # too long a range
+        response = client.get(self.url, {"start": "2019-01-01", "end": "2020-01-01"})
+        assert response.status_code == 400
+        assert "error" in response.json()
+
+    def test_not_modified(self, client, events):
+        params = {"start": "2019-10-01", "end": "2019-11-01"}
+        etag = client.get(self.url, params)["ETag"]
+        response = client.get(self.url, params, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 304
+
+
 @pytest.mark.skip("broken tests; views no longer used?")
 class TestUpcomingEventsView:
     def test_no_events(self, db, client):
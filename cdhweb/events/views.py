@@ -1,13 +1,21 @@
 import datetime
+import hashlib
 
 import icalendar
-from django.http import Http404, HttpResponse
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
 from django.utils import timezone
-from django.views.generic.base import TemplateView
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.dateparse import parse_date, parse_datetime
+from django.views.generic.base import TemplateView, View
 from django.views.generic.dates import ArchiveIndexView, YearArchiveView
 from django.views.generic.detail import DetailView
 
-from cdhweb.events.models import Event, EventsLandingPage
+from cdhweb.events.models import (
+    Event,
+    EventsLandingPage,
+    get_semester,
+    semester_index,
+)
 from cdhweb.pages.views import LastModifiedListMixin, LastModifiedMixin
 
 
@@ -27,29 +35,12 @@ class EventSemesterDates:
     """Mixin to return list of event semester dates based on
     event dates in the system."""
 
-    @staticmethod
-    def get_semester(date):
-        """Return the semester a date occurs in as a string."""
-        # determine semester based on the month
-        if date.month <= 5:
-            return "Spring"
-        if date.month <= 8:
-            return "Summer"
-        return "Fall"
+    get_semester = staticmethod(get_semester)
 
     def get_semester_date_list(self):
         """Get a list of semester labels (semester and year) for published
-        events. Semesters are Spring (through May), Summer (through
-        August), and Fall."""
-        date_list = []
-        dates = Event.objects.live().dates("start_time", "month", order="ASC")
-        for date in dates:
-            # add semester + year to list if not already present
-            sem_date = (self.get_semester(date), date.year)
-            if sem_date not in date_list:
-                date_list.append(sem_date)
-
-        return date_list
+        events."""
+        return [(semester, year) for (year, _, semester), _ in semester_index.periods()]
 
 
 class EventsLandingPageView(TemplateView, EventSemesterDates):
@@ -142,16 +133,6 @@ class EventSemesterArchiveView(
     context_object_name = "events"
     date_list_period = "month"
 
-    # use month/year archive on the blog and then collapse
-    semester_dates = {
-        # spring: jan 1 - may 31
-        "spring": {"start": (1, 1), "end": (5, 31)},
-        # summer: june 1 - aug 31
-        "summer": {"start": (6, 1), "end": (8, 31)},
-        # fall: sep 1 -  dec 31
-        "fall": {"start": (9, 1), "end": (12, 31)},
-    }
-
     def get_queryset(self):
         return super().get_queryset().prefetch_related("page_ptr")
 
@@ -161,24 +142,8 @@ class EventSemesterArchiveView(
         ).get_dated_items()
 
         # year archive gets items by years; filter by semester
-        semester = self.kwargs["semester"]
-        # generate dates for start and end with current year
-        month, year = self.semester_dates[semester]["start"]
-        start = datetime.datetime(
-            int(self.kwargs["year"]),
-            month,
-            year,
-            tzinfo=timezone.get_default_timezone(),
-        )
-        month, year = self.semester_dates[semester]["end"]
-        end = datetime.datetime(
-            int(self.kwargs["year"]),
-            month,
-            year,
-            tzinfo=timezone.get_default_timezone(),
-        )
-        items = items.filter(
-            start_time__gte=start, start_time__lte=end
+        items = items.in_semester(
+            self.kwargs["semester"], int(self.kwargs["year"])
         ).order_by_start()
 
         return (date_list, items, context)
@@ -234,21 +199,161 @@ class EventIcalView(EventDetailView):
         return response
 
 
-# ical calendar for all upcoming events
-# TODO when we can get to it
-# class IcalCalendarView(EventListView):
-
-#     def get_queryset(self):
-#         return super(IcalCalendarView, self).get_queryset().upcoming()
-
-#     def render_to_response(self, context, **response_kwargs):
-#         cal = icalendar.Calendar()
-#         # TODO: required to be compliant
-#         # cal.add('prodid', '-//My calendar product//mxm.dk//')
-#         # cal.add('version', '2.0')
-#         for event in self.get_queryset():
-#             cal.add_component(event.ical_event())
-#         # TODO: should support cancelled events if possible
-#         response = HttpResponse(cal.to_ical(), content_type="text/calendar")
-#         response['Content-Disposition'] = 'attachment; filename="CDH-calendar.ics"'
-#         return response
+class EventFilterMixin:
+    """View mixin to filter events by type and location (name or short
+    name) from the request, and to calculate an ETag for a list of events."""
+
+    def filter_events(self, events):
+        event_type = self.request.GET.get("type")
+        if event_type:
+            events = events.of_type(event_type)
+        location = self.request.GET.get("location")
+        if location:
+            events = events.at_location(location)
+        return events
+
+    def get_etag(self, events):
+        # any change to the list of events or to an event, its url or its
+        # location changes the etag
+        versions = ",".join(event.ical_version for event in events)
+        return '"%s"' % hashlib.md5(versions.encode()).hexdigest()
+
+
+class IcalCalendarView(EventFilterMixin, View):
+    """Subscribable ical calendar of upcoming events, optionally filtered by
+    event type, location and semester (e.g. ``?semester=fall-2024``, which
+    includes past events in that semester).
+
+    Serialized events are cached (see :meth:`Event.get_ical_events`) and
+    the calendar is streamed by concatenating them. An ETag based on the
+    events included and their versions (see :attr:`Event.ical_version`)
+    lets calendar clients that poll frequently get a 304 when nothing has
+    changed."""
+
+    filename = "CDH-calendar.ics"
+
+    def get_queryset(self):
+        events = Event.objects.live()
+        semester = self.request.GET.get("semester")
+        if semester:
+            try:
+                semester, year = semester.split("-")
+                events = events.in_semester(semester, int(year))
+            except ValueError:
+                raise Http404("Invalid semester: %s" % semester)
+        else:
+            events = events.upcoming()
+        return self.filter_events(events).order_by_start()
+
+    def get_calendar_header(self):
+        """Serialized calendar properties, without the closing line."""
+        cal = icalendar.Calendar()
+        cal.add("prodid", "-//Center for Digital Humanities at Princeton//cdhweb//EN")
+        cal.add("version", "2.0")
+        cal.add("x-wr-calname", "CDH Events")
+        return cal.to_ical().replace(b"END:VCALENDAR\r\n", b"")
+
+    def stream_calendar(self, events):
+        yield self.get_calendar_header()
+        yield from Event.get_ical_events(events)
+        yield b"END:VCALENDAR\r\n"
+
+    def get(self, request, *args, **kwargs):
+        events = list(
+            self.get_queryset().select_related("location").defer_streamfields()
+        )
+        etag = self.get_etag(events)
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = StreamingHttpResponse(
+                self.stream_calendar(events), content_type="text/calendar"
+            )
+            response["Content-Disposition"] = 'attachment; filename="%s"' % (
+                self.filename
+            )
+        response["ETag"] = etag
+        return response
+
+
+class EventCalendarView(EventFilterMixin, View):
+    """JSON list of events overlapping a date range, for calendar displays.
+    Requires ``start`` and ``end`` parameters (ISO dates or datetimes; the
+    end is exclusive), and optionally filters by ``type`` and ``location``.
+    Responses can be cached and support conditional requests."""
+
+    #: maximum range of dates that can be requested at once
+    max_range = datetime.timedelta(days=100)
+    #: how long clients and proxies may cache responses, in seconds
+    cache_timeout = 60 * 5
+
+    @staticmethod
+    def parse_date(value):
+        """Parse an ISO date or datetime; dates and naive datetimes are
+        interpreted in the default timezone. Returns None if invalid."""
+        try:
+            parsed = parse_datetime(value or "")
+            if parsed is None:
+                date = parse_date(value or "")
+                if date is None:
+                    return None
+                parsed = datetime.datetime.combine(date, datetime.time())
+        except ValueError:
+            return None
+        if timezone.is_naive(parsed):
+            parsed = timezone.make_aware(parsed)
+        return parsed
+
+    def get_date_range(self):
+        """Start and end of the requested range; raises :class:`ValueError`
+        if missing or invalid."""
+        start = self.parse_date(self.request.GET.get("start"))
+        end = self.parse_date(self.request.GET.get("end"))
+        if start is None or end is None:
+            raise ValueError("start and end dates are required")
+        if end <= start or end - start > self.max_range:
+            raise ValueError(
+                "end must be after start, by no more than %d days" % self.max_range.days
+            )
+        return start, end
+
+    def get_queryset(self, start, end):
+        events = Event.objects.live().overlapping(start, end)
+        return (
+            self.filter_events(events)
+            .select_related("type", "location")
+            .defer_streamfields()
+            .order_by_start()
+        )
+
+    def event_data(self, event, url):
+        """Compact dictionary of event data for the response."""
+        data = {
+            "id": event.pk,
+            "title": event.title,
+            "url": url,
+            "start": event.start_time.isoformat(),
+            "end": event.end_time.isoformat(),
+            "type": event.type.name if event.type else None,
+        }
+        if event.location:
+            data["location"] = str(event.location)
+            data["virtual"] = event.location.is_virtual
+        return data
+
+    def get(self, request, *args, **kwargs):
+        try:
+            start, end = self.get_date_range()
+        except ValueError as err:
+            return JsonResponse({"error": str(err)}, status=400)
+
+        events = list(self.get_queryset(start, end))
+        etag = self.get_etag(events)
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            urls = Event.urls_for(events, request)
+            response = JsonResponse(
+                {"events": [self.event_data(event, urls[event.pk]) for event in events]}
+            )
+        response["ETag"] = etag
+        patch_cache_control(response, public=True, max_age=self.cache_timeout)
+        return response
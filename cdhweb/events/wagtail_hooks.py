@@ -1,15 +1,25 @@
+from django.db.models import Prefetch
+from wagtail import hooks
 from wagtail_modeladmin.mixins import ThumbnailMixin
-from wagtail_modeladmin.options import (ModelAdmin, ModelAdminGroup,
-                                        modeladmin_register)
+from wagtail_modeladmin.options import ModelAdmin, ModelAdminGroup, modeladmin_register
 
-from cdhweb.events.models import Event, EventType, Location
+from cdhweb.events.models import (
+    Event,
+    EventsLandingPage,
+    EventType,
+    Location,
+    Speaker,
+    semester_index,
+)
+from cdhweb.pages.benchmarks import Benchmark, page_benchmark
+from cdhweb.pages.modeladmin import ListQueryMixin, StreamingExportMixin
 
 
-class EventAdmin(ThumbnailMixin, ModelAdmin):
+class EventAdmin(ListQueryMixin, StreamingExportMixin, ThumbnailMixin, ModelAdmin):
     model = Event
     menu_icon = "date"
     list_display = (
-    "admin_thumb",
+        "admin_thumb",
         "title",
         "type",
         "speaker_list",
@@ -18,6 +28,11 @@ class EventAdmin(ThumbnailMixin, ModelAdmin):
         "live",
     )
     list_display_add_buttons = "title"
+    list_select_related = ("type", "feed_image")
+    list_prefetch_related = [
+        Prefetch("speakers", queryset=Speaker.objects.select_related("person")),
+        "feed_image__renditions",
+    ]
     list_filter = ("start_time", "end_time", "type")
     list_export = (
         "title",
@@ -29,10 +44,18 @@ class EventAdmin(ThumbnailMixin, ModelAdmin):
         "speaker_list",
         "attendance",
         "join_url",
-        "content",
+        "body",
         "tags",
-        "updated",
+        "last_published_at",
     )
+    export_prefetch = {
+        "type": ["type"],
+        "location": ["location"],
+        "speaker_list": [
+            Prefetch("speakers", queryset=Speaker.objects.select_related("person"))
+        ],
+        "tags": ["tags"],
+    }
     export_filename = "cdhweb-events"
     search_fields = (
         "title",
@@ -44,7 +67,7 @@ class EventAdmin(ThumbnailMixin, ModelAdmin):
         "location__name",
         "location__address",
     )
-    thumb_image_field_name = "thumbnail"
+    thumb_image_field_name = "feed_image"
     thumb_col_header_text = "thumbnail"
     ordering = ("-start_time",)
     list_per_page = 25
@@ -72,3 +95,26 @@ class EventsGroup(ModelAdminGroup):
 
 
 modeladmin_register(EventsGroup)
+
+
+@hooks.register("register_benchmarks")
+def register_event_benchmarks():
+    """Upcoming events, the semester with the most events, an event, and
+    the calendar feeds."""
+    landing_pages = EventsLandingPage.objects.all()
+    benchmarks = page_benchmark("events", landing_pages, 30)
+    periods = semester_index.periods()
+    if periods:
+        (year, _, semester), _ = max(periods, key=lambda period: period[1])
+        benchmarks.extend(
+            page_benchmark(
+                "events-semester",
+                landing_pages,
+                30,
+                "%s-%s/" % (semester.lower(), year),
+            )
+        )
+    return benchmarks + [
+        *page_benchmark("event", Event.objects.all(), 35),
+        Benchmark("events-ical", "/events/calendar.ics", 40),
+    ]
@@ -9,3 +9,8 @@ class PagesConfig(AppConfig):
     # has to match this label (templates/cdhpages) for wagtail's page template
     # detection logic to work.
     label = "cdhpages"
+
+    def ready(self):
+        # connect signal handlers for rebuilding the redirect table and
+        # regenerating sitemaps on publish
+        from cdhweb.pages import redirects, sitemaps  # noqa: F401
@@ -0,0 +1,109 @@
+"""
+Cached archive indexes, for navigating pages by date.
+
+An archive index groups the live pages of one type into date periods
+(e.g. event semesters or blog post months) and keeps a count of the pages
+in each period, for each parent page. The index is stored in the cache, so
+archive navigation only costs a single cache read; it is built from the
+database with a single query when it is missing.
+
+The cache key includes a generation (see
+:func:`~cdhweb.pages.schedule.get_generation`), which is advanced once a
+transaction that publishes, unpublishes, moves or deletes a page has been
+committed. An index built by a concurrent request from data read before
+the commit is stored under the previous generation, so it is never used,
+and expires with the cache timeout.
+
+The index is rebuilt after a change rather than updated in place: building
+it is a single query of the path and date of each live page, only run on
+the first request after a change, while updating a shared cached index
+from several processes would need a lock to avoid losing concurrent
+updates.
+"""
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete
+from wagtail.signals import page_published, page_unpublished, post_page_move
+
+from cdhweb.pages.schedule import bump_generation, get_generation
+
+
+class ArchiveIndex:
+    """Cached index of archive periods and the number of live pages in each.
+    Subclasses must set :attr:`model`, :attr:`date_field` and
+    :attr:`cache_key`, and implement :meth:`get_period`."""
+
+    #: page model to index
+    model = None
+    #: name of the date or datetime field used to group pages
+    date_field = None
+    #: cache key for the stored index, and the name of its generation
+    cache_key = None
+    #: seconds to keep a stored index; indexes for previous generations
+    #: are left to expire
+    timeout = 7 * 24 * 60 * 60
+    #: sort periods with the most recent first
+    reverse = False
+
+    def get_period(self, date):
+        """Archive period for a date; must be hashable and orderable."""
+        raise NotImplementedError
+
+    def get_queryset(self):
+        return self.model.objects.live()
+
+    def build(self):
+        """Calculate the index from the database. The index is a dictionary
+        of page counts for each period, keyed on the path of the pages'
+        parent, so that periods can be listed for the children of one
+        page."""
+        index = {}
+        for path, date in self.get_queryset().values_list("path", self.date_field):
+            if date is None:
+                continue
+            counts = index.setdefault(path[: -self.model.steplen], {})
+            period = self.get_period(date)
+            counts[period] = counts.get(period, 0) + 1
+        return index
+
+    def get_cache_key(self):
+        """Cache key for the current generation of the index."""
+        return "%s-%d" % (self.cache_key, get_generation(self.cache_key))
+
+    def get_index(self):
+        """Retrieve the index from the cache, building it if necessary."""
+        key = self.get_cache_key()
+        index = cache.get(key)
+        if index is None:
+            index = self.build()
+            cache.set(key, index, self.timeout)
+        return index
+
+    def periods(self, parent=None):
+        """List of archive periods with their page counts, as ``(period,
+        count)`` tuples in order; optionally limited to the children of a
+        parent page."""
+        index = self.get_index()
+        if parent is not None:
+            counts = index.get(parent.path, {})
+        else:
+            counts = {}
+            for parent_counts in index.values():
+                for period, count in parent_counts.items():
+                    counts[period] = counts.get(period, 0) + count
+        return sorted(counts.items(), reverse=self.reverse)
+
+    def clear(self):
+        """Advance the generation of the index, so that it is rebuilt on
+        next use."""
+        bump_generation(self.cache_key)
+
+    def connect(self):
+        """Connect signal handlers to clear the cached index once changes
+        to pages are committed."""
+        # keep a reference to the handler; signals only hold weak references
+        self._on_change = lambda **kwargs: transaction.on_commit(self.clear)
+        for signal in [page_published, page_unpublished, post_page_move, post_delete]:
+            signal.connect(self._on_change, sender=self.model)
+        return self
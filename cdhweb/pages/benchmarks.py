@@ -0,0 +1,151 @@
+"""
+Rendering benchmarks for page types and other views.
+
+Each :class:`Benchmark` is a url to request and a query budget: the maximum
+number of SQL queries the view may make. Budgets should not depend on the
+amount of content, so a view that starts querying once per item in a
+listing (an "N+1" regression) goes over budget. Budgets apply to warm
+requests, with cached data in place; cold requests regenerate cached data
+(e.g. serialized calendar events), which can depend on the amount of
+content, so they are reported but not checked against budgets. Apps register benchmarks
+for the content that exists with the ``register_benchmarks`` wagtail hook,
+which should return a list of :class:`Benchmark` objects; use
+:func:`page_benchmark` for the first live page of a type.
+
+Run benchmarks with the ``run_benchmarks`` manage command, against a
+database populated by ``generate_dataset``. Wall time, query count and
+size of the rendered response are recorded for each benchmark, and can be
+saved as JSON to compare with later runs.
+"""
+
+import statistics
+import time
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from wagtail import hooks
+from wagtail.models import Site
+
+
+class Benchmark:
+    """A url to benchmark.
+
+    :param name: unique name for the benchmark, e.g. ``"event"``
+    :param url: url to request
+    :param budget: maximum number of SQL queries for the request
+    """
+
+    def __init__(self, name, url, budget):
+        self.name = name
+        self.url = url
+        self.budget = budget
+
+    def __repr__(self):
+        return "<Benchmark %s: %s>" % (self.name, self.url)
+
+
+def page_benchmark(name, queryset, budget, suffix=""):
+    """Benchmark for the url of the first live page in a queryset, with an
+    optional suffix (e.g. a query string); returns a list with one
+    benchmark, or an empty list if there are no pages."""
+    page = queryset.live().order_by("pk").first()
+    if page is None:
+        return []
+    return [Benchmark(name, page.url + suffix, budget)]
+
+
+def get_benchmarks():
+    """All benchmarks registered with the ``register_benchmarks`` hook."""
+    benchmarks = []
+    for fn in hooks.get_hooks("register_benchmarks"):
+        benchmarks.extend(fn())
+    return benchmarks
+
+
+class BenchmarkResult:
+    """Timing, query count and response size for a benchmark."""
+
+    def __init__(self, benchmark, status, queries, size, times, cold=False):
+        self.benchmark = benchmark
+        self.status = status
+        self.queries = queries
+        self.size = size
+        self.times = times
+        self.cold = cold
+
+    @property
+    def over_budget(self):
+        return not self.cold and self.queries > self.benchmark.budget
+
+    @property
+    def median(self):
+        return statistics.median(self.times)
+
+    def as_dict(self):
+        return {
+            "name": self.benchmark.name,
+            "url": self.benchmark.url,
+            "status": self.status,
+            "queries": self.queries,
+            "budget": self.benchmark.budget,
+            "bytes": self.size,
+            "cold": self.cold,
+            "time_ms": {
+                "min": round(min(self.times) * 1000, 2),
+                "median": round(self.median * 1000, 2),
+                "max": round(max(self.times) * 1000, 2),
+            },
+        }
+
+
+def get_client():
+    """Test client for requests to the default site."""
+    site = Site.objects.get(is_default_site=True)
+    host = site.hostname
+    if site.port not in (80, 443):
+        host = "%s:%s" % (host, site.port)
+    return Client(HTTP_HOST=host)
+
+
+def run_benchmark(benchmark, client=None, repeat=3, cold=False):
+    """Request a benchmark url ``repeat`` times, after a request to warm
+    up, and return a :class:`BenchmarkResult`. Queries are counted for the
+    last request. If ``cold`` is set, the cache is cleared before each
+    request, so that cached data is regenerated."""
+    client = client or get_client()
+    client.get(benchmark.url)
+    times = []
+    for _ in range(repeat):
+        if cold:
+            cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            response = client.get(benchmark.url)
+            content = b"".join(response) if response.streaming else response.content
+            times.append(time.perf_counter() - start)
+    return BenchmarkResult(
+        benchmark, response.status_code, len(queries), len(content), times, cold
+    )
+
+
+def run_benchmarks(benchmarks=None, repeat=3, cold=False):
+    """Run benchmarks (by default, all registered benchmarks) and return a
+    list of results."""
+    if benchmarks is None:
+        benchmarks = get_benchmarks()
+    client = get_client()
+    return [
+        run_benchmark(benchmark, client, repeat=repeat, cold=cold)
+        for benchmark in benchmarks
+    ]
+
+
+def results_to_json(results):
+    """Results as a JSON-serializable dictionary."""
+    return {
+        "created": timezone.now().isoformat(),
+        "results": [result.as_dict() for result in results],
+    }
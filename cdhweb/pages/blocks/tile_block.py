@@ -1,11 +1,29 @@
 from django.db import models
+from django.db.models import Prefetch
 from springkit.blocks.headings import HeadingBlock
 from springkit.blocks.jumplinks import JumplinkMixin
 from wagtail import blocks
+from wagtail.images import get_image_model
 from wagtail.images.blocks import ImageChooserBlock
 
 from cdhweb.pages.blocks.link import InternalPageLinkBlock
 
+#: rendition filter specs used by ``cdhpages/blocks/tile.html``
+TILE_RENDITIONS = (
+    "original",
+    "fill-400x222",
+    "fill-500x278",
+    "fill-800x444",
+    "fill-1000x556",
+)
+
+
+def tile_image_prefetch(lookup):
+    """Prefetch the image for ``lookup`` with only the renditions
+    displayed on tiles, rather than every rendition of the image."""
+    images = get_image_model().objects.prefetch_renditions(*TILE_RENDITIONS)
+    return Prefetch(lookup, queryset=images)
+
 
 class TileExternalLink(blocks.StructBlock):
     title = blocks.CharBlock(
@@ -0,0 +1,164 @@
+"""
+Serving documents, with the file sent by the front-end web server.
+
+Wagtail serves documents by streaming the file through a Django worker,
+which ties up an application thread for the length of each download. The
+document serve view (:class:`cdhweb.pages.views.DocumentServeView`) does
+the same access checks as wagtail's (the ``before_serve_document`` hooks,
+including collection view restrictions) and then either:
+
+- hands the file to the front-end web server with an ``X-Accel-Redirect``
+  (nginx) or ``X-Sendfile`` (Apache, lighttpd) header, configured with the
+  ``SENDFILE_HEADER`` setting; for ``X-Accel-Redirect``, files under
+  ``SENDFILE_ROOT`` (default: ``MEDIA_ROOT``) are redirected to urls under
+  ``SENDFILE_URL``, which should be an internal location serving the same
+  directory; or
+- if no header is configured (e.g. in development and tests), serves the
+  file from Django, with support for single byte ranges.
+
+Either way, conditional requests are answered from the document's file hash
+and modification time before the file is opened. Unrestricted documents
+are cacheable for ``DOCUMENTS_CACHE_MAX_AGE`` seconds; documents in
+collections with view restrictions may only be cached privately, and are
+revalidated (and access checked again) on every request.
+"""
+
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.cache import (
+    get_conditional_response,
+    patch_cache_control,
+    quote_etag,
+)
+from django.utils.http import http_date, parse_http_date_safe
+
+#: default maximum age for caching unrestricted documents, in seconds
+CACHE_MAX_AGE = 60 * 60 * 24 * 30
+#: default internal url prefix for X-Accel-Redirect
+SENDFILE_URL = "/protected-media/"
+#: size of chunks read when serving part of a file
+CHUNK_SIZE = 64 * 1024
+
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+class RangeNotSatisfiable(Exception):
+    """Requested byte range is outside the file."""
+
+
+def parse_range(header, size):
+    """Parse a ``Range`` header for a file of ``size`` bytes. Returns the
+    first and last byte positions (inclusive) of a single byte range, or
+    None if the whole file should be served (no range, multiple ranges or
+    a header that can't be parsed, which may be ignored). Raises
+    :class:`RangeNotSatisfiable` for ranges outside the file."""
+    match = RANGE_RE.match(header.replace(" ", "")) if header else None
+    if not match or match.groups() == ("", ""):
+        return None
+    first, last = match.groups()
+    if not first:
+        # suffix range: the last n bytes
+        if int(last) == 0 or size == 0:
+            raise RangeNotSatisfiable
+        return max(size - int(last), 0), size - 1
+    first = int(first)
+    if last and int(last) < first:
+        return None
+    if first >= size:
+        raise RangeNotSatisfiable
+    last = min(int(last), size - 1) if last else size - 1
+    return first, last
+
+
+def if_range_matches(request, etag, last_modified):
+    """Check that an ``If-Range`` header (if any) matches the current
+    version of the file, so that a requested range can be served."""
+    if_range = request.headers.get("if-range")
+    if not if_range:
+        return True
+    if if_range.startswith(('"', "W/")):
+        # weak etags never match
+        return etag is not None and if_range == etag
+    return parse_http_date_safe(if_range) == last_modified
+
+
+def iter_file_range(path, first, length):
+    """Read part of a file in chunks."""
+    with open(path, "rb") as file:
+        file.seek(first)
+        while length > 0:
+            chunk = file.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def file_response(request, path, size, etag, last_modified):
+    """Serve a file from Django, or the part of it in a ``Range`` header."""
+    try:
+        byte_range = parse_range(request.headers.get("range"), size)
+    except RangeNotSatisfiable:
+        response = HttpResponse(status=416)
+        response["Content-Range"] = "bytes */%d" % size
+        return response
+    if byte_range is None or not if_range_matches(request, etag, last_modified):
+        return FileResponse(open(path, "rb"))
+
+    first, last = byte_range
+    length = last - first + 1
+    response = StreamingHttpResponse(iter_file_range(path, first, length), status=206)
+    response["Content-Range"] = "bytes %d-%d/%d" % (first, last, size)
+    response["Content-Length"] = length
+    return response
+
+
+def sendfile_response(path, header):
+    """Response for the front-end server to send a file."""
+    response = HttpResponse()
+    if header == "X-Accel-Redirect":
+        root = getattr(settings, "SENDFILE_ROOT", settings.MEDIA_ROOT)
+        url = getattr(settings, "SENDFILE_URL", SENDFILE_URL)
+        relative_path = os.path.relpath(path, root).replace(os.sep, "/")
+        response[header] = url.rstrip("/") + "/" + quote(relative_path)
+    else:
+        response[header] = path
+    return response
+
+
+def set_cache_headers(response, document, etag, last_modified):
+    response["Accept-Ranges"] = "bytes"
+    if etag:
+        response["ETag"] = etag
+    response["Last-Modified"] = http_date(last_modified)
+    if document.collection.get_view_restrictions().exists():
+        patch_cache_control(response, private=True, no_cache=True)
+    else:
+        max_age = getattr(settings, "DOCUMENTS_CACHE_MAX_AGE", CACHE_MAX_AGE)
+        patch_cache_control(response, public=True, max_age=max_age)
+
+
+def serve_document_file(request, document, path):
+    """Response for a document's local file, after access checks: a
+    304 or 412 for conditional requests, otherwise the file (or part of
+    it) sent by the front-end server or by Django."""
+    stat = os.stat(path)
+    last_modified = int(stat.st_mtime)
+    etag = quote_etag(document.file_hash) if document.file_hash else None
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        header = getattr(settings, "SENDFILE_HEADER", None)
+        if header:
+            response = sendfile_response(path, header)
+        else:
+            response = file_response(request, path, stat.st_size, etag, last_modified)
+        if response.status_code in (200, 206):
+            response["Content-Type"] = document.content_type
+            response["Content-Disposition"] = document.content_disposition
+    set_cache_headers(response, document, etag, last_modified)
+    return response
@@ -1,15 +1,96 @@
 """
 Custom :class:`~wagtail.embeds.finders.base.EmbedFinder` implementations
 for embedding content in wagtail pages.
+
+Finders make requests with a shared, pooled HTTP session and strict
+timeouts, so that a slow provider can't hold up an editor saving a page or
+a visitor viewing one; request failures are raised as
+:class:`~wagtail.embeds.exceptions.EmbedException`, which wagtail reports
+to editors and ignores when rendering. Embeds don't expire when viewed;
+they are refreshed in the background by the ``refresh_embeds`` manage
+command (see :mod:`cdhweb.pages.embeds`).
 """
 
+import functools
+from concurrent.futures import ThreadPoolExecutor
 from json import JSONDecodeError
 from urllib.parse import urljoin
 
 import requests
 from bs4 import BeautifulSoup
-from wagtail.embeds.exceptions import EmbedException
+from requests.adapters import HTTPAdapter
+from wagtail.embeds.exceptions import EmbedException, EmbedNotFoundException
 from wagtail.embeds.finders.base import EmbedFinder
+from wagtail.embeds.finders.oembed import OEmbedFinder as BaseOEmbedFinder
+
+#: connect and read timeouts for embed requests, in seconds
+TIMEOUT = (3.05, 5)
+#: maximum number of pooled connections per host
+POOL_SIZE = 10
+
+
+@functools.cache
+def get_session():
+    """Shared HTTP session for embed requests, reusing connections."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    # some providers refuse requests without a browser user agent
+    session.headers["User-Agent"] = "Mozilla/5.0"
+    return session
+
+
+def get(url, **kwargs):
+    """GET a url with the shared session and timeouts; raises
+    :class:`~wagtail.embeds.exceptions.EmbedNotFoundException` if the
+    request fails or doesn't return a successful response."""
+    try:
+        response = get_session().get(url, timeout=TIMEOUT, **kwargs)
+        response.raise_for_status()
+    except requests.RequestException as err:
+        raise EmbedNotFoundException("Failed to load %s: %s" % (url, err))
+    return response
+
+
+class OEmbedFinder(BaseOEmbedFinder):
+    """Wagtail's oEmbed finder, using the shared session and timeouts.
+    The provider's ``cache_age`` is ignored, so that embeds are never
+    refetched while rendering a page."""
+
+    def find_embed(self, url, max_width=None, max_height=None):
+        endpoint = self._get_endpoint(url)
+        if endpoint is None:
+            raise EmbedNotFoundException
+
+        params = self.options.copy()
+        params["url"] = url
+        params["format"] = "json"
+        if max_width:
+            params["maxwidth"] = max_width
+        if max_height:
+            params["maxheight"] = max_height
+        try:
+            oembed = get(endpoint, params=params).json()
+        except JSONDecodeError:
+            raise EmbedNotFoundException("Error parsing oEmbed response")
+
+        # convert photos into html
+        if oembed["type"] == "photo":
+            html = '<img src="{}" alt="">'.format(oembed["url"])
+        else:
+            html = oembed.get("html")
+
+        return {
+            "title": oembed.get("title", ""),
+            "author_name": oembed.get("author_name", ""),
+            "provider_name": oembed.get("provider_name", ""),
+            "type": oembed["type"],
+            "thumbnail_url": oembed.get("thumbnail_url"),
+            "width": oembed.get("width"),
+            "height": oembed.get("height"),
+            "html": html,
+        }
 
 
 class GlitchHubEmbedFinder(EmbedFinder):
@@ -52,20 +133,16 @@ class GlitchHubEmbedFinder(EmbedFinder):
         # NOTE: currently ignores max width
 
         # implementation assumes that glitch has an embed json file
-        # with appropriate metadata
-        response = requests.get(urljoin(url, "embed.json"))
-        # if embed info couldn't be loaded, error
-        if response.status_code != requests.codes.ok:
-            raise EmbedException("Failed to load embed.json file")
-        try:
-            embed_info = response.json()
-        except JSONDecodeError:
-            raise EmbedException("Error parsing embed.json file")
-
-        # if embed info request succeeded, then get actual content
-        response = requests.get(url)
-        if response.status_code != requests.codes.ok:
-            raise EmbedException("Failed to load url")
+        # with appropriate metadata; request it and the page at the same time
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            embed_request = executor.submit(get, urljoin(url, "embed.json"))
+            page_request = executor.submit(get, url)
+            # if embed info couldn't be loaded, error
+            try:
+                embed_info = embed_request.result().json()
+            except JSONDecodeError:
+                raise EmbedException("Error parsing embed.json file")
+            response = page_request.result()
 
         soup = BeautifulSoup(response.content, "html.parser")
         # convert relative links so they are absolute to glitch url
@@ -74,5 +151,5 @@ class GlitchHubEmbedFinder(EmbedFinder):
         for source in soup.find_all(src=True):
             source["src"] = urljoin(url, source["src"])
 
-        embed_info["html"] = soup.prettify()
+        embed_info["html"] = str(soup)
         return embed_info
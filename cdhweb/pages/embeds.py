@@ -0,0 +1,184 @@
+"""
+Concurrent embed fetching for page saves, and background refresh.
+
+Wagtail fetches embeds one at a time and only when it needs them: while
+validating a page form (each embed block checks that its url can be
+embedded) or while rendering a page with an embed that hasn't been fetched
+or has expired. To keep slow providers from holding up editors and
+visitors:
+
+- when a page is saved, :func:`prefetch_form_embeds` finds all embed urls
+  in the submitted StreamFields and fetches any that aren't stored yet
+  concurrently, within a time limit, before the form is validated;
+- finders (see :mod:`cdhweb.pages.embed_finders`) don't set an expiry, so
+  stored embeds are always served as they are, however old;
+- the ``refresh_embeds`` manage command refetches embeds older than a
+  maximum age concurrently, keeping the stored version if a provider
+  fails (stale-while-revalidate).
+"""
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+from concurrent.futures import as_completed
+
+from django.utils import timezone
+from wagtail.blocks import StreamValue, StructValue
+from wagtail.blocks.list_block import ListValue
+from wagtail.embeds.blocks import EmbedValue
+from wagtail.embeds.embeds import get_embed_hash
+from wagtail.embeds.exceptions import EmbedException, EmbedUnsupportedProviderException
+from wagtail.embeds.finders import get_finders
+from wagtail.embeds.models import Embed
+from wagtail.fields import StreamField
+
+logger = logging.getLogger(__name__)
+
+#: number of embeds fetched at once
+MAX_WORKERS = 8
+#: maximum number of seconds to spend fetching embeds when a page is saved
+PREFETCH_TIMEOUT = 10
+
+
+def iter_embed_values(value):
+    """Embed block values in a StreamField value, including embeds nested
+    in struct, list and stream blocks."""
+    if isinstance(value, EmbedValue):
+        yield value
+    elif isinstance(value, StreamValue):
+        for child in value:
+            yield from iter_embed_values(child.value)
+    elif isinstance(value, StructValue):
+        for child in value.values():
+            yield from iter_embed_values(child)
+    elif isinstance(value, ListValue):
+        for child in value:
+            yield from iter_embed_values(child)
+
+
+def page_embed_values(page):
+    """Embed block values in the StreamFields of a (specific) page."""
+    for field in page._meta.get_fields():
+        if isinstance(field, StreamField):
+            yield from iter_embed_values(getattr(page, field.name))
+
+
+def form_embed_values(page_class, data, files):
+    """Embed block values in submitted page form data."""
+    for field in page_class._meta.get_fields():
+        if isinstance(field, StreamField):
+            try:
+                value = field.stream_block.value_from_datadict(data, files, field.name)
+            except (KeyError, ValueError):
+                # incomplete or invalid data; left for form validation
+                continue
+            yield from iter_embed_values(value)
+
+
+def find_embed(url, max_width=None, max_height=None):
+    """Fetch an embed with the first configured finder that accepts the
+    url, as wagtail does; returns a dictionary of embed fields."""
+    for finder in get_finders():
+        if finder.accept(url):
+            if max_height is None:
+                return finder.find_embed(url, max_width=max_width)
+            return finder.find_embed(url, max_width=max_width, max_height=max_height)
+    raise EmbedUnsupportedProviderException
+
+
+def fetch_embeds(keys, timeout=None):
+    """Fetch embeds for ``(url, max_width, max_height)`` keys concurrently.
+    Returns a dictionary of embed fields for each key that was fetched
+    successfully within the timeout (in seconds, for all embeds); failures
+    are logged. Fetches still in progress at the timeout are abandoned."""
+    results = {}
+    if not keys:
+        return results
+    executor = ThreadPoolExecutor(max_workers=MAX_WORKERS)
+    futures = {executor.submit(find_embed, *key): key for key in keys}
+    try:
+        for future in as_completed(futures, timeout=timeout):
+            key = futures[future]
+            try:
+                results[key] = future.result()
+            except EmbedException as err:
+                logger.warning("Failed to fetch embed for %s: %s", key[0], err)
+            except Exception:
+                # e.g. an unexpected response; don't interrupt saving a page
+                logger.exception("Error fetching embed for %s", key[0])
+    except FuturesTimeoutError:
+        logger.warning(
+            "Timed out fetching embeds: %s",
+            ", ".join(key[0] for key in keys if key not in results),
+        )
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+    return results
+
+
+def store_embed(embed_hash, url, max_width, embed_dict):
+    """Create or update a stored embed from a finder result, with the same
+    cleanup as :func:`wagtail.embeds.embeds.get_embed`."""
+    embed_dict = dict(embed_dict)
+    for dimension in ["width", "height"]:
+        try:
+            embed_dict[dimension] = int(embed_dict[dimension])
+        except (KeyError, TypeError, ValueError):
+            embed_dict[dimension] = None
+    embed_dict["html"] = embed_dict.get("html") or ""
+    embed_dict["thumbnail_url"] = embed_dict.get("thumbnail_url") or ""
+    # embeds are refreshed by the refresh_embeds command, not on view
+    embed_dict["cache_until"] = None
+    embed, _ = Embed.objects.update_or_create(
+        hash=embed_hash,
+        defaults=dict(
+            url=url, max_width=max_width, last_updated=timezone.now(), **embed_dict
+        ),
+    )
+    return embed
+
+
+def prefetch_embeds(values, timeout=PREFETCH_TIMEOUT):
+    """Fetch and store embeds for embed values that aren't stored yet.
+    Returns the number of embeds stored."""
+    keys = {
+        get_embed_hash(value.url, value.max_width, value.max_height): (
+            value.url,
+            value.max_width,
+            value.max_height,
+        )
+        for value in values
+    }
+    # expired embeds (from before expiry was disabled) are fetched again
+    stored = set(
+        Embed.objects.filter(hash__in=list(keys))
+        .exclude(cache_until__lte=timezone.now())
+        .values_list("hash", flat=True)
+    )
+    for embed_hash in stored:
+        del keys[embed_hash]
+    results = fetch_embeds(list(keys.values()), timeout=timeout)
+    for embed_hash, key in keys.items():
+        if key in results:
+            store_embed(embed_hash, key[0], key[1], results[key])
+    return len(results)
+
+
+def prefetch_form_embeds(page_class, request):
+    """Fetch embeds in a submitted page form that aren't stored yet."""
+    return prefetch_embeds(form_embed_values(page_class, request.POST, request.FILES))
+
+
+def refresh_embeds(embeds, timeout=None):
+    """Refetch stored embeds concurrently, updating those that are fetched
+    successfully and leaving the others as they are. Returns the number of
+    embeds updated."""
+    # stored embeds don't record a maximum height; refetch without one
+    keys = {embed.hash: (embed.url, embed.max_width, None) for embed in embeds}
+    results = fetch_embeds(list(set(keys.values())), timeout=timeout)
+    updated = 0
+    for embed_hash, key in keys.items():
+        if key in results:
+            store_embed(embed_hash, key[0], key[1], results[key])
+            updated += 1
+    return updated
@@ -0,0 +1,205 @@
+"""
+Focal point detection for images, in a background worker.
+
+Wagtail can suggest a focal point for a new image by running OpenCV face
+and feature detection when the image is saved, which holds up uploads of
+large photos in the admin. Instead, detection is disabled on save
+(``WAGTAILIMAGES_FEATURE_DETECTION_ENABLED``) and run by the
+``detect_focal_points`` manage command:
+
+- images are read in the main process, in id order, and detection runs in
+  a pool of worker processes on a downscaled copy of each image; the
+  database is only accessed from the main process;
+- suggestions are computed the same way as wagtail's (a box around all
+  faces, or all features if there are no faces, enlarged by 20% with a
+  minimum size), in the coordinates of the original image;
+- a suggested focal point is only saved if the image still has none, so
+  a focal point set by an editor in the meantime is never replaced, and
+  existing cropped renditions of the image are deleted so that they are
+  regenerated around the new focal point;
+- the id of the last image processed is recorded in the database, so that
+  a long-running worker (or the next run from cron, after a restart or a
+  cache clear) only looks at new images.
+"""
+
+import logging
+import multiprocessing
+from collections import deque
+from io import BytesIO
+
+from PIL import Image as PILImage
+from wagtail.images import get_image_model
+from wagtail.images.rect import Rect
+from willow.plugins.pillow import PillowImage
+
+from cdhweb.pages.models import FocalPointProgress
+
+logger = logging.getLogger(__name__)
+
+#: maximum width and height of the copy of an image used for detection
+DETECTION_SIZE = 800
+
+
+def bounding_box(points):
+    """A :class:`~wagtail.images.rect.Rect` around faces (``(left, top,
+    right, bottom)``) or features (``(x, y)``)."""
+    return Rect(
+        min(point[0] for point in points),
+        min(point[1] for point in points),
+        max(point[-2] for point in points),
+        max(point[-1] for point in points),
+    )
+
+
+def suggest_focal_point(pk, data):
+    """Suggest a focal point for image data, as
+    :meth:`wagtail.images.models.AbstractImage.get_suggested_focal_point`
+    does but on a downscaled copy of the image. Returns the image id and
+    a :class:`~wagtail.images.rect.Rect` in original image coordinates, or
+    None if nothing was detected. Runs in worker processes."""
+    image = PILImage.open(BytesIO(data))
+    width = image.width
+    # let the decoder skip detail that isn't needed (for JPEGs), then resize
+    image.draft("RGB", (DETECTION_SIZE, DETECTION_SIZE))
+    image.thumbnail((DETECTION_SIZE, DETECTION_SIZE))
+    scale = width / image.width
+
+    willow = PillowImage(image)
+    points = willow.detect_faces() or willow.detect_features()
+    if not points:
+        return pk, None
+    box = bounding_box(points)
+
+    # add 20% to width and height and give it a minimum size, as wagtail does
+    x, y = box.centroid
+    width, height = box.size
+    return pk, Rect.from_point(
+        x * scale,
+        y * scale,
+        max(width * scale * 1.2, 100),
+        max(height * scale * 1.2, 100),
+    )
+
+
+def safe_suggest_focal_point(pk, data):
+    """:func:`suggest_focal_point`, returning None for images that can't
+    be read instead of raising an error."""
+    try:
+        return suggest_focal_point(pk, data)
+    except Exception:
+        logger.exception("Error detecting focal point for image %s", pk)
+        return pk, None
+
+
+def save_focal_point(pk, rect):
+    """Save a suggested focal point for an image, unless it has one already,
+    and delete its cropped renditions. Returns True if the focal point was
+    saved."""
+    Image = get_image_model()
+    updated = Image.objects.filter(pk=pk, focal_point_x__isnull=True).update(
+        focal_point_x=round(rect.centroid_x),
+        focal_point_y=round(rect.centroid_y),
+        focal_point_width=round(rect.width),
+        focal_point_height=round(rect.height),
+    )
+    if not updated:
+        return False
+    # renditions that crop around the focal point were generated without
+    # one; delete them individually, so their files and cache entries are
+    # removed too
+    renditions = Image.get_rendition_model().objects.filter(image_id=pk)
+    for rendition in renditions.exclude(focal_point_key=""):
+        rendition.delete()
+    return True
+
+
+def get_images(after=None):
+    """Images without a focal point, in id order, after an optional id."""
+    images = (
+        get_image_model()
+        .objects.filter(focal_point_x__isnull=True)
+        .only("pk", "file")
+        .order_by("pk")
+    )
+    if after is not None:
+        images = images.filter(pk__gt=after)
+    return images
+
+
+def read_images(images):
+    """``(pk, data)`` for the files of images that can be analyzed."""
+    for image in images.iterator(chunk_size=100):
+        # detection isn't possible for vector images
+        if image.is_svg():
+            continue
+        try:
+            with image.open_file() as image_file:
+                yield image.pk, image_file.read()
+        except OSError as err:
+            logger.warning("Error reading image %s: %s", image.pk, err)
+
+
+def detect_focal_points(images, workers=1):
+    """Detect and save focal points for images, in a pool of worker
+    processes (or in the current process if ``workers`` is 1). Returns the
+    number of images examined and the number of focal points saved."""
+    examined = saved = 0
+
+    def process(pk, rect):
+        nonlocal examined, saved
+        examined += 1
+        if rect is not None and save_focal_point(pk, rect):
+            saved += 1
+
+    if workers > 1:
+        pool = multiprocessing.get_context("fork").Pool(workers)
+        try:
+            # read images in this process, keeping a few queued for each
+            # worker, so only a few are held in memory at a time
+            pending = deque()
+            for pk, data in read_images(images):
+                pending.append(pool.apply_async(safe_suggest_focal_point, (pk, data)))
+                if len(pending) > workers * 2:
+                    process(*pending.popleft().get())
+            while pending:
+                process(*pending.popleft().get())
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        for pk, data in read_images(images):
+            process(*safe_suggest_focal_point(pk, data))
+    return examined, saved
+
+
+def get_last_image():
+    """The id of the last image processed by :func:`process_new_images`, or
+    None if there is no record of a previous run."""
+    return (
+        FocalPointProgress.objects.values_list("last_image_id", flat=True)
+        .filter(pk=1)
+        .first()
+    )
+
+
+def set_last_image(pk):
+    """Record the id of the last image processed."""
+    FocalPointProgress.objects.update_or_create(pk=1, defaults={"last_image_id": pk})
+
+
+def process_new_images(workers=1):
+    """Detect focal points for images added since the last run (or all
+    images without a focal point, if there is no record of a previous
+    run), and record the last image processed. Returns the number of
+    images examined and the number of focal points saved."""
+    Image = get_image_model()
+    after = get_last_image()
+    # images added while this runs are left for the next run
+    last = Image.objects.order_by("pk").values_list("pk", flat=True).last()
+    images = get_images(after)
+    if last is not None:
+        images = images.filter(pk__lte=last)
+    counts = detect_focal_points(images, workers)
+    if last is not None:
+        set_last_image(last)
+    return counts
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from cdhweb.pages.sitemaps import SITEMAPS, write_sitemaps
+
+
+class Command(BaseCommand):
+    """Generate static sitemap files for all or selected sections of the site."""
+
+    help = __doc__
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "sections",
+            nargs="*",
+            help="Sections to regenerate (default: all; options: %s)"
+            % ", ".join(SITEMAPS.keys()),
+        )
+
+    def handle(self, *args, **options):
+        sections = options["sections"] or list(SITEMAPS.keys())
+        unknown = set(sections) - set(SITEMAPS.keys())
+        if unknown:
+            raise CommandError("Unknown sitemap section: %s" % ", ".join(unknown))
+        write_sitemaps(sections)
+        if options["verbosity"]:
+            self.stdout.write(
+                "Generated sitemaps for %s" % ", ".join(sections),
+                style_func=self.style.SUCCESS,
+            )
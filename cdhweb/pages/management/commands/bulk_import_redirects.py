@@ -0,0 +1,130 @@
+import csv
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from wagtail.contrib.redirects.models import Redirect
+from wagtail.models import Site
+
+from cdhweb.pages.redirects import REDIRECT_GENERATION
+from cdhweb.pages.schedule import bump_generation
+
+
+class Command(BaseCommand):
+    """Import redirects in bulk from a CSV file with ``from`` (old path)
+    and ``to`` (new url or path) columns. Existing redirects for the same
+    path are updated. Saves in batches and rebuilds the redirect table
+    once, so thousands of redirects can be imported at a time."""
+
+    help = __doc__
+
+    #: maximum length of old path and redirect link fields
+    max_length = 255
+
+    def add_arguments(self, parser):
+        parser.add_argument("src", help="Path to CSV file")
+        parser.add_argument(
+            "--site", type=int, help="Id of the site for the redirects (default: all)"
+        )
+        parser.add_argument(
+            "--temporary",
+            action="store_true",
+            help="Import as temporary instead of permanent redirects",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of redirects to save per query (default: %(default)s)",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Check the file and report changes without saving",
+        )
+
+    def handle(self, *args, **options):
+        site = None
+        if options["site"]:
+            try:
+                site = Site.objects.get(pk=options["site"])
+            except Site.DoesNotExist:
+                raise CommandError("Site %s not found" % options["site"])
+
+        redirects, errors = self.read(options["src"])
+        for error in errors:
+            self.stderr.write(error)
+
+        existing = {
+            redirect.old_path: redirect
+            for redirect in Redirect.objects.filter(
+                site=site, old_path__in=redirects.keys()
+            )
+        }
+        permanent = not options["temporary"]
+        created = []
+        updated = []
+        for old_path, link in redirects.items():
+            redirect = existing.get(old_path) or Redirect(old_path=old_path, site=site)
+            redirect.redirect_link = link
+            redirect.redirect_page = None
+            redirect.redirect_page_route_path = ""
+            redirect.is_permanent = permanent
+            (updated if redirect.pk else created).append(redirect)
+
+        if not options["dry_run"]:
+            with transaction.atomic():
+                Redirect.objects.bulk_create(created, batch_size=options["batch_size"])
+                Redirect.objects.bulk_update(
+                    updated,
+                    [
+                        "redirect_link",
+                        "redirect_page",
+                        "redirect_page_route_path",
+                        "is_permanent",
+                    ],
+                    batch_size=options["batch_size"],
+                )
+            # bulk operations don't send signals
+            bump_generation(REDIRECT_GENERATION)
+
+        self.stdout.write(
+            "%s %d, updated %d, skipped %d"
+            % (
+                "Would create" if options["dry_run"] else "Created",
+                len(created),
+                len(updated),
+                len(errors),
+            ),
+            style_func=self.style.SUCCESS,
+        )
+
+    def read(self, src):
+        """Read redirects from a CSV file; returns a dictionary of
+        normalised old path to link (later rows override earlier rows for
+        the same path) and a list of errors for rows that can't be
+        imported."""
+        redirects = {}
+        errors = []
+        try:
+            with open(src, newline="", encoding="utf-8-sig") as csvfile:
+                reader = csv.DictReader(csvfile)
+                if not {"from", "to"} <= set(reader.fieldnames or []):
+                    raise CommandError("CSV file must have 'from' and 'to' columns")
+                for row in reader:
+                    old_path = Redirect.normalise_path(row["from"] or "")
+                    link = (row["to"] or "").strip()
+                    if old_path == "/" or not link:
+                        error = "missing path or link"
+                    elif max(len(old_path), len(link)) > self.max_length:
+                        error = "longer than %d characters" % self.max_length
+                    elif old_path == Redirect.normalise_path(link):
+                        error = "redirects to itself"
+                    else:
+                        redirects[old_path] = link
+                        continue
+                    errors.append(
+                        "Line %d: %s (%s)" % (reader.line_num, error, row["from"])
+                    )
+        except OSError as err:
+            raise CommandError("Can't read %s: %s" % (src, err))
+        return redirects, errors
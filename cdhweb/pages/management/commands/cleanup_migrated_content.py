@@ -1,10 +1,14 @@
 import re
 
 from django.core.management.base import BaseCommand
-from wagtail.models import Page
 
+from cdhweb.pages.transforms import StreamTransform, TransformRunner
 
-class Command(BaseCommand):
+
+class MigratedContentCleanup(StreamTransform):
+    """Clean up whitespace and markup in HTML migrated from mezzanine."""
+
+    block_types = ["migrated"]
 
     # list of regex patterns to replace with a single space
     re_to_space = [
@@ -40,52 +44,17 @@ class Command(BaseCommand):
         re.compile(r"[\n ]+<div>\s*</div>"),
     ]
 
-    def add_arguments(self, parser):
-        parser.add_argument(
-            "--noact",
-            action="store_true",
-            default=False,
-            help="Don't save any changes to the database",
-        )
+    def transform_value(self, block_type, value):
+        return self.clean_html(value)
 
-    def handle(self, *args, **options):
-        v_normal = 1
-        verbosity = options["verbosity"]
-        noact = options["noact"]
-        inline_styles = []
-        for page in Page.objects.all():
-            realpage = page.get_specific()
-            # skip pages with no body content
-            if not hasattr(realpage, "body"):
-                continue
-            for block in realpage.body:
-                # assuming only one migrated block per page
-                if block.block_type == "migrated":
-                    html = block.value.source
-                    cleaned_html = self.clean_html(html)
-                    block.value.source = cleaned_html
-                    if verbosity > v_normal:
-                        self.stdout.write(
-                            "\n\nHTML before cleanup for %s\n*****\n%s\n*****"
-                            % (page.get_full_url(), html)
-                        )
-                        self.stdout.write(
-                            "HTML after cleanup:\n%s\n*****" % cleaned_html
-                        )
-
-                    # unless noact mode has been requested, save new revision
-                    if not noact:
-                        new_revision = realpage.save_revision()
-                        # publish new revision if the page is live
-                        if realpage.live:
-                            new_revision.publish()
-
-                    if 'style="' in cleaned_html:
-                        inline_styles.append(realpage.get_full_url())
-
-        if inline_styles:
-            print("\nPages with inline styles:\n")
-            print("\n".join(inline_styles))
+    def warnings(self, stream):
+        if any(
+            'style="' in block["value"]
+            for block in stream
+            if block["type"] in self.block_types
+        ):
+            return ["inline styles"]
+        return []
 
     def clean_html(self, html):
         # remove these regexes
@@ -101,3 +70,49 @@ class Command(BaseCommand):
             html = regex.sub(" ", html)
 
         return html
+
+
+class Command(BaseCommand):
+    """Clean up HTML in migrated content blocks, saving a new revision
+    for each changed page."""
+
+    help = __doc__
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--noact",
+            action="store_true",
+            default=False,
+            help="Don't save any changes to the database; show a diff of "
+            "changes instead",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=1,
+            help="Number of worker processes (default: %(default)s)",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=100,
+            help="Number of pages to process at a time (default: %(default)s)",
+        )
+        parser.add_argument(
+            "--checkpoint",
+            help="Checkpoint file for resuming an interrupted run",
+        )
+
+    def handle(self, *args, **options):
+        v_normal = 1
+        runner = TransformRunner(
+            MigratedContentCleanup(),
+            chunk_size=options["chunk_size"],
+            workers=options["workers"],
+            checkpoint=options["checkpoint"],
+            dry_run=options["noact"],
+            # always show changes when not saving them
+            diff=options["noact"] or options["verbosity"] > v_normal,
+            stdout=self.stdout,
+        )
+        runner.run()
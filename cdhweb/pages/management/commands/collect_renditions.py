@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand
+from django.template.defaultfilters import filesizeformat
+
+from cdhweb.pages.renditions import RenditionCollector
+
+
+class Command(BaseCommand):
+    """Delete image renditions that aren't used by current templates and
+    published content (unused images, retired filter specs and outdated
+    focal points), and rendition files without a rendition, reporting the
+    storage reclaimed. Run periodically, e.g. from cron."""
+
+    help = __doc__
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=1000,
+            help="Number of renditions to examine and delete at a time "
+            "(default: %(default)s)",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Report what would be deleted without deleting anything",
+        )
+
+    def handle(self, *args, **options):
+        collector = RenditionCollector(
+            chunk_size=options["chunk_size"], dry_run=options["dry_run"]
+        )
+        stats = collector.run()
+        for reason, count in sorted(stats.deleted.items()):
+            self.stdout.write("%s: %d" % (reason.capitalize(), count))
+        self.stdout.write(
+            "%s %d of %d renditions and %d files without a rendition, %s"
+            % (
+                "Would delete" if options["dry_run"] else "Deleted",
+                stats.renditions,
+                stats.examined,
+                stats.files,
+                filesizeformat(stats.size),
+            ),
+            style_func=self.style.SUCCESS,
+        )
@@ -0,0 +1,65 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from cdhweb.pages.focal_points import (
+    detect_focal_points,
+    get_images,
+    process_new_images,
+)
+
+
+class Command(BaseCommand):
+    """Detect faces and features in images without a focal point and save
+    a suggested focal point, in a pool of worker processes. Runs
+    continuously, checking for new images, unless --once or --all is
+    specified."""
+
+    help = __doc__
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=2,
+            help="Number of worker processes (default: %(default)s)",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Check new images once, then exit (e.g. when run from cron)",
+        )
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Process all existing images without a focal point, including "
+            "images checked before, then exit",
+        )
+        parser.add_argument(
+            "--interval",
+            type=int,
+            default=60,
+            help="Time to sleep between checks for new images, in seconds "
+            "(default: %(default)s)",
+        )
+
+    def handle(self, *args, **options):
+        self.verbosity = options["verbosity"]
+        if options["all"]:
+            self.report(*detect_focal_points(get_images(), options["workers"]))
+            return
+        while True:
+            examined, saved = process_new_images(options["workers"])
+            # a continuously running worker only reports new images
+            if options["once"] or examined:
+                self.report(examined, saved)
+            if options["once"]:
+                break
+            time.sleep(options["interval"])
+
+    def report(self, examined, saved):
+        if self.verbosity:
+            self.stdout.write(
+                "Saved focal points for %d of %d images" % (saved, examined),
+                style_func=self.style.SUCCESS,
+            )
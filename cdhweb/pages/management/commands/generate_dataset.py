@@ -0,0 +1,487 @@
+import datetime
+import io
+import json
+import random
+from contextlib import contextmanager
+
+from django.core.files.images import ImageFile
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.utils import timezone
+from PIL import Image as PILImage
+from wagtail.images import get_image_model
+from wagtail.models import Page, Site
+
+from cdhweb.blog.models import (
+    FEED_GENERATION,
+    Author,
+    BlogLandingPage,
+    BlogPost,
+    clear_cached_feeds,
+    month_index,
+)
+from cdhweb.events.models import (
+    Event,
+    EventsLandingPage,
+    EventType,
+    Location,
+    Speaker,
+    semester_index,
+)
+from cdhweb.pages.models import HomePage
+from cdhweb.pages.redirects import REDIRECT_GENERATION
+from cdhweb.pages.schedule import bump_generation
+from cdhweb.pages.utils import bulk_add_children
+from cdhweb.people.models import (
+    PeopleCategoryPage,
+    PeopleLandingPage,
+    Person,
+    PersonActivity,
+    PersonCategory,
+    PersonRelatedLink,
+    Position,
+    Profile,
+    Title,
+    person_categories_changed,
+)
+from cdhweb.projects.models import (
+    Grant,
+    GrantType,
+    Membership,
+    Project,
+    ProjectsLandingPage,
+    Role,
+)
+
+#: prefix for slugs of generated pages
+SLUG_PREFIX = "generated-"
+#: email domain for generated people
+EMAIL_DOMAIN = "generated.example.org"
+#: title prefix for generated images
+IMAGE_TITLE = "Generated image"
+
+#: save and delete handlers that refresh or invalidate data after each
+#: change, and their senders; disconnected while clearing, since the data
+#: is refreshed once afterwards
+BULK_HANDLERS = [
+    (person_categories_changed, [Person, Position, Membership, Grant]),
+    (clear_cached_feeds, [Person, PersonRelatedLink, Profile, BlogPost]),
+]
+
+
+@contextmanager
+def disconnected(handlers):
+    """Temporarily disconnect ``(handler, senders)`` from save and delete
+    signals."""
+    reconnect = []
+    for handler, senders in handlers:
+        for signal in (post_save, post_delete):
+            for sender in senders:
+                if signal.disconnect(handler, sender=sender):
+                    reconnect.append((signal, handler, sender))
+    try:
+        yield
+    finally:
+        for signal, handler, sender in reconnect:
+            signal.connect(handler, sender=sender)
+
+
+FIRST_NAMES = (
+    "Ada Alan Amara Ana Ben Chen Dana Elena Farah Grace Hiro Imani Ivan Jia "
+    "Jonas Kofi Lena Lucia Mateo Maya Nadia Omar Priya Rosa Sam Tomas Uma "
+    "Vera Wei Yusuf Zoe"
+).split()
+LAST_NAMES = (
+    "Abbott Bauer Castillo Dubois Eriksen Fischer Garcia Haddad Ito Jensen "
+    "Kim Larsen Mendes Nakamura Okafor Petrov Quinn Rossi Santos Tanaka "
+    "Ueda Varga Weber Xu Yilmaz Zhang"
+).split()
+WORDS = (
+    "archive digital text corpus network map history language data visual "
+    "reading machine print music image media network science culture "
+    "museum manuscript record voice model analysis public memory city "
+    "sound code edition collection poetry law ocean film"
+).split()
+DEPARTMENTS = ["English", "History", "Computer Science", "Music", "Sociology"]
+
+
+class Command(BaseCommand):
+    """Generate a large synthetic dataset of people, projects, events and
+    blog posts for load and benchmark testing. Output is determined by the
+    random seed; previously generated data is removed first, so the command
+    can be re-run safely. Pages are created in bulk, without revisions."""
+
+    help = __doc__
+
+    #: number of each kind of item at scale 1
+    volumes = {"people": 5000, "projects": 800, "events": 3000, "posts": 2000}
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--seed", type=int, default=0, help="Random seed (default: %(default)s)"
+        )
+        parser.add_argument(
+            "--scale",
+            type=float,
+            default=1.0,
+            help="Multiplier for the number of items generated; at 1, "
+            + ", ".join("%d %s" % (n, kind) for kind, n in self.volumes.items()),
+        )
+        parser.add_argument(
+            "--images",
+            type=int,
+            default=20,
+            help="Number of images to generate and share between items "
+            "(default: %(default)s)",
+        )
+        parser.add_argument(
+            "--clear",
+            action="store_true",
+            help="Remove generated data without generating new data",
+        )
+
+    def handle(self, *args, **options):
+        self.verbosity = options["verbosity"]
+        self.random = random.Random(options["seed"])
+        counts = {
+            kind: max(1, int(n * options["scale"])) for kind, n in self.volumes.items()
+        }
+
+        with transaction.atomic():
+            self.clear()
+            if options["clear"]:
+                self.refresh()
+                return
+            self.sections = self.get_sections()
+            self.images = self.make_images(options["images"])
+            self.people = self.make_people(counts["people"])
+            self.make_projects(counts["projects"])
+            self.make_events(counts["events"])
+            self.make_posts(counts["posts"])
+            self.refresh()
+
+        self.log(
+            "Run update_index and build_sitemaps to index the generated pages",
+            style_func=self.style.SUCCESS,
+        )
+
+    def log(self, message, **kwargs):
+        if self.verbosity:
+            self.stdout.write(message, **kwargs)
+
+    def clear(self):
+        """Remove all previously generated data. Handlers that would refresh
+        people categories and feeds for every deleted object are
+        disconnected; see :meth:`refresh`."""
+        with disconnected(BULK_HANDLERS):
+            pages = Page.objects.filter(slug__startswith=SLUG_PREFIX)
+            page_count = pages.count()
+            pages.delete()
+            people = Person.objects.filter(email__endswith="@%s" % EMAIL_DOMAIN)
+            person_count = people.count()
+            people.delete()
+            get_image_model().objects.filter(title__startswith=IMAGE_TITLE).delete()
+        if page_count or person_count:
+            self.log(
+                "Removed %d generated pages and %d people" % (page_count, person_count)
+            )
+
+    def refresh(self):
+        """Update data that is normally updated on publish or save."""
+        PersonCategory.refresh()
+        PersonActivity.rebuild()
+        semester_index.clear()
+        month_index.clear()
+        bump_generation(FEED_GENERATION)
+        bump_generation(REDIRECT_GENERATION)
+
+    def get_child(self, parent, model, title, slug):
+        """Get or create a page of the specified type under the parent,
+        with a unique slug based on the one specified."""
+        page = model.objects.child_of(parent).first()
+        if page is None:
+            base_slug = slug
+            suffix = 1
+            while parent.get_children().filter(slug=slug).exists():
+                suffix += 1
+                slug = "%s-%d" % (base_slug, suffix)
+            page = model(title=title, slug=slug)
+            parent.add_child(instance=page)
+        return page
+
+    def get_sections(self):
+        """Get or create the home page and section landing pages."""
+        site = Site.objects.get(is_default_site=True)
+        home = site.root_page.specific
+        if not isinstance(home, HomePage):
+            home = HomePage.objects.first()
+            if home is None:
+                home = HomePage(title="Home", slug="home")
+                Page.get_first_root_node().add_child(instance=home)
+            site.root_page = home
+            site.save()
+
+        people = self.get_child(home, PeopleLandingPage, "People", slug="people")
+        for category in PeopleCategoryPage.PeopleCategories:
+            if not PeopleCategoryPage.objects.filter(category=category).exists():
+                people.add_child(
+                    instance=PeopleCategoryPage(
+                        title=category.label, category=category.value
+                    )
+                )
+        return {
+            "people": people,
+            "projects": self.get_child(
+                home, ProjectsLandingPage, "Projects", slug="projects"
+            ),
+            "events": self.get_child(home, EventsLandingPage, "Events", slug="events"),
+            "blog": self.get_child(home, BlogLandingPage, "Updates", slug="updates"),
+        }
+
+    def date_between(self, start_year, end_year):
+        start = datetime.date(start_year, 1, 1)
+        days = (datetime.date(end_year, 12, 31) - start).days
+        return start + datetime.timedelta(days=self.random.randint(0, days))
+
+    def datetime_between(self, start_year, end_year):
+        day = self.date_between(start_year, end_year)
+        return timezone.make_aware(
+            datetime.datetime.combine(
+                day,
+                datetime.time(
+                    self.random.randint(8, 20),
+                    self.random.choice([0, 15, 30, 45]),
+                ),
+            )
+        )
+
+    def title(self, min_words=2, max_words=6):
+        words = self.random.sample(WORDS, self.random.randint(min_words, max_words))
+        return " ".join(words).capitalize()
+
+    def paragraphs(self, count):
+        return "".join(
+            "<p>%s.</p>" % " ".join(self.random.choices(WORDS, k=40)).capitalize()
+            for _ in range(count)
+        )
+
+    def body(self):
+        """Stream data for a page body, with paragraphs and an image."""
+        blocks = [{"type": "paragraph", "value": self.paragraphs(3)}]
+        if self.images:
+            blocks.append(
+                {
+                    "type": "image",
+                    "value": {
+                        "image": self.random.choice(self.images).pk,
+                        "caption": "",
+                        "credit": "",
+                        "alt_text": self.title(),
+                        "size": "medium",
+                    },
+                }
+            )
+        blocks.append({"type": "paragraph", "value": self.paragraphs(2)})
+        return json.dumps(blocks)
+
+    def make_images(self, count):
+        images = []
+        Image = get_image_model()
+        for i in range(count):
+            color = tuple(self.random.randint(0, 255) for _ in range(3))
+            buffer = io.BytesIO()
+            PILImage.new("RGB", (640, 480), color).save(buffer, "PNG")
+            images.append(
+                Image.objects.create(
+                    title="%s %d" % (IMAGE_TITLE, i + 1),
+                    file=ImageFile(buffer, name="generated-%d.png" % (i + 1)),
+                )
+            )
+        return images
+
+    def make_people(self, count):
+        titles = [
+            Title.objects.get_or_create(title=title)[0]
+            for title in [
+                "Director",
+                "Developer",
+                "Postdoctoral Fellow",
+                "Graduate Fellow",
+                "Faculty Affiliate",
+            ]
+        ]
+        people = Person.objects.bulk_create(
+            [
+                Person(
+                    first_name=self.random.choice(FIRST_NAMES),
+                    last_name=self.random.choice(LAST_NAMES),
+                    email="person-%05d@%s" % (i, EMAIL_DOMAIN),
+                    cdh_staff=self.random.random() < 0.1,
+                    pu_status=self.random.choice(Person.PU_STATUS_CHOICES)[0],
+                    department=self.random.choice(DEPARTMENTS),
+                    image=self.random.choice(self.images) if self.images else None,
+                )
+                for i in range(count)
+            ],
+            batch_size=1000,
+        )
+        positions = []
+        for person in people:
+            for _ in range(self.random.randint(1, 2)):
+                start = self.date_between(2012, 2025)
+                end = None
+                if self.random.random() < 0.5:
+                    end = start + datetime.timedelta(days=self.random.randint(90, 1500))
+                positions.append(
+                    Position(
+                        person=person,
+                        title=self.random.choice(titles),
+                        start_date=start,
+                        end_date=end,
+                    )
+                )
+        Position.objects.bulk_create(positions, batch_size=1000)
+        # profile pages for staff and some of everyone else
+        profiles = bulk_add_children(
+            self.sections["people"],
+            [
+                Profile(
+                    title=str(person),
+                    slug="%sprofile-%05d" % (SLUG_PREFIX, i),
+                    person=person,
+                    image=person.image,
+                    body=self.body(),
+                    first_published_at=self.datetime_between(2012, 2024),
+                )
+                for i, person in enumerate(people)
+                if person.cdh_staff or self.random.random() < 0.2
+            ],
+        )
+        self.log(
+            "Created %d people with %d positions and %d profiles"
+            % (len(people), len(positions), len(profiles))
+        )
+        return people
+
+    def make_projects(self, count):
+        grant_types = [
+            GrantType.objects.get_or_create(grant_type=name)[0]
+            for name in ["Seed", "Dataset Curation", "Sponsored Project"]
+        ]
+        roles = [
+            Role.objects.get_or_create(title=title)[0]
+            for title in ["Project Director", "Project Manager", "Project Team Member"]
+        ]
+        projects = bulk_add_children(
+            self.sections["projects"],
+            [
+                Project(
+                    title=self.title(),
+                    slug="%sproject-%05d" % (SLUG_PREFIX, i),
+                    body=self.body(),
+                    short_description=self.title(4, 10),
+                    cdh_built=self.random.random() < 0.3,
+                    working_group=self.random.random() < 0.1,
+                    hero_image=self.random.choice(self.images) if self.images else None,
+                    first_published_at=self.datetime_between(2012, 2024),
+                )
+                for i in range(count)
+            ],
+        )
+        grants = []
+        memberships = []
+        for project in projects:
+            start = self.date_between(2012, 2025)
+            for _ in range(self.random.randint(1, 3)):
+                end = start + datetime.timedelta(days=364)
+                grants.append(
+                    Grant(
+                        project=project,
+                        grant_type=self.random.choice(grant_types),
+                        start_date=start,
+                        end_date=end,
+                    )
+                )
+                start = end + datetime.timedelta(days=1)
+            for person in self.random.sample(
+                self.people, min(self.random.randint(2, 8), len(self.people))
+            ):
+                memberships.append(
+                    Membership(
+                        project=project,
+                        person=person,
+                        role=self.random.choice(roles),
+                        start_date=grants[-1].start_date,
+                        end_date=grants[-1].end_date,
+                    )
+                )
+        Grant.objects.bulk_create(grants, batch_size=1000)
+        Membership.objects.bulk_create(memberships, batch_size=1000)
+        self.log(
+            "Created %d projects with %d grants and %d memberships"
+            % (len(projects), len(grants), len(memberships))
+        )
+
+    def make_events(self, count):
+        types = [
+            EventType.objects.get_or_create(name=name)[0]
+            for name in ["Workshop", "Lecture", "Reading Group", "Conference"]
+        ]
+        locations = [
+            Location.objects.get_or_create(name=name, defaults={"short_name": name})[0]
+            for name in ["CDH Classroom", "Lewis Library", "Generated Hall"]
+        ]
+        events = []
+        for i in range(count):
+            start = self.datetime_between(2015, 2030)
+            events.append(
+                Event(
+                    title=self.title(),
+                    slug="%sevent-%05d" % (SLUG_PREFIX, i),
+                    body=self.body(),
+                    start_time=start,
+                    end_time=start
+                    + datetime.timedelta(hours=self.random.choice([1, 1.5, 2, 3, 26])),
+                    type=self.random.choice(types),
+                    location=self.random.choice(locations),
+                    image=self.random.choice(self.images) if self.images else None,
+                    first_published_at=start - datetime.timedelta(days=30),
+                )
+            )
+        events = bulk_add_children(self.sections["events"], events)
+        speakers = [
+            Speaker(event=event, person=person)
+            for event in events
+            for person in self.random.sample(
+                self.people, min(self.random.randint(0, 3), len(self.people))
+            )
+        ]
+        Speaker.objects.bulk_create(speakers, batch_size=1000)
+        self.log("Created %d events with %d speakers" % (len(events), len(speakers)))
+
+    def make_posts(self, count):
+        posts = bulk_add_children(
+            self.sections["blog"],
+            [
+                BlogPost(
+                    title=self.title(),
+                    slug="%spost-%05d" % (SLUG_PREFIX, i),
+                    body=self.body(),
+                    image=self.random.choice(self.images) if self.images else None,
+                    first_published_at=self.datetime_between(2012, 2025),
+                )
+                for i in range(count)
+            ],
+        )
+        authors = [
+            Author(post=post, person=person, sort_order=order)
+            for post in posts
+            for order, person in enumerate(
+                self.random.sample(
+                    self.people, min(self.random.randint(1, 3), len(self.people))
+                )
+            )
+        ]
+        Author.objects.bulk_create(authors, batch_size=1000)
+        self.log("Created %d blog posts with %d authors" % (len(posts), len(authors)))
@@ -0,0 +1,56 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from cdhweb.pages.schedule import next_boundary, process_boundaries
+
+
+class Command(BaseCommand):
+    """Invalidate cached data for content that has changed with the date or
+    time (e.g. positions that have started or site alerts that have
+    expired) since the last run. Runs continuously, waking at the next
+    boundary, unless --once is specified."""
+
+    help = __doc__
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Check and invalidate once, then exit (e.g. when run from cron)",
+        )
+        parser.add_argument(
+            "--max-wait",
+            type=int,
+            default=60 * 60,
+            help="Maximum time to sleep between checks, in seconds, so that "
+            "new or edited content is picked up (default: %(default)s)",
+        )
+
+    def handle(self, *args, **options):
+        self.verbosity = options["verbosity"]
+        while True:
+            self.run()
+            if options["once"]:
+                break
+            now = timezone.now()
+            upcoming = next_boundary(now)
+            wait = options["max_wait"]
+            if upcoming is not None:
+                wait = min(wait, max((upcoming - now).total_seconds(), 1))
+            time.sleep(wait)
+
+    def run(self):
+        crossed = process_boundaries()
+        if self.verbosity:
+            names = sorted(set(boundary.name for boundary in crossed))
+            self.stdout.write(
+                "Invalidated: %s" % (", ".join(names) or "nothing"),
+                style_func=self.style.SUCCESS,
+            )
+        if self.verbosity > 1:
+            upcoming = next_boundary()
+            self.stdout.write(
+                "Next boundary: %s" % (upcoming.isoformat() if upcoming else "none")
+            )
@@ -0,0 +1,48 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from wagtail.embeds.models import Embed
+from wagtail.models import Page
+
+from cdhweb.pages.embeds import page_embed_values, prefetch_embeds, refresh_embeds
+
+
+class Command(BaseCommand):
+    """Refetch stored embeds that are older than a maximum age, so that
+    pages never fetch embeds while being viewed. Embeds that can't be
+    fetched keep their stored content. Run periodically, e.g. from cron."""
+
+    help = __doc__
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--max-age",
+            type=int,
+            default=7,
+            help="Refresh embeds fetched more than this many days ago "
+            "(default: %(default)s); 0 to refresh all embeds",
+        )
+        parser.add_argument(
+            "--pages",
+            action="store_true",
+            help="Also fetch embeds in live pages that haven't been fetched yet",
+        )
+
+    def handle(self, *args, **options):
+        if options["pages"]:
+            fetched = prefetch_embeds(self.iter_page_embeds(), timeout=None)
+            self.stdout.write("Fetched %d new embeds" % fetched)
+
+        embeds = Embed.objects.all()
+        if options["max_age"]:
+            cutoff = timezone.now() - timedelta(days=options["max_age"])
+            embeds = embeds.filter(last_updated__lt=cutoff)
+        embeds = list(embeds.only("hash", "url", "max_width"))
+        updated = refresh_embeds(embeds)
+        self.stdout.write("Refreshed %d of %d embeds" % (updated, len(embeds)))
+
+    def iter_page_embeds(self):
+        """Embed values in StreamFields of all live pages."""
+        for page in Page.objects.live().specific().iterator(chunk_size=100):
+            yield from page_embed_values(page)
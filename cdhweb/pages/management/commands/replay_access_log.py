@@ -0,0 +1,108 @@
+import json
+import sys
+from itertools import chain, islice
+
+from django.core.management.base import BaseCommand, CommandError
+
+from cdhweb.pages.replay import ALL, Replayer, open_log, parse_log, summarize
+
+
+class Command(BaseCommand):
+    """Replay anonymous GET requests from gunicorn access logs against a
+    server, and report latency percentiles, throughput and error rate for
+    each route family. Point it at a local or staging server, not
+    production."""
+
+    help = __doc__
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "logfiles",
+            nargs="+",
+            help="Access log files to replay, in order; - for standard input, "
+            "and .gz files are decompressed",
+        )
+        parser.add_argument(
+            "--url",
+            default="http://localhost:8000",
+            help="Server to send requests to (default: %(default)s)",
+        )
+        parser.add_argument(
+            "--host", help="Host header to send, e.g. the production hostname"
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=4,
+            help="Maximum number of requests in progress (default: %(default)s)",
+        )
+        parser.add_argument(
+            "--speedup",
+            type=float,
+            default=1,
+            help="Speed up logged request timing by this factor; 0 to send "
+            "requests as fast as possible (default: %(default)s)",
+        )
+        parser.add_argument("--limit", type=int, help="Only replay this many requests")
+        parser.add_argument(
+            "--timeout",
+            type=float,
+            default=30,
+            help="Request timeout in seconds (default: %(default)s)",
+        )
+        parser.add_argument("--output", help="Save the summary as JSON to this file")
+
+    def handle(self, *args, **options):
+        if options["concurrency"] < 1:
+            raise CommandError("Concurrency must be at least 1")
+        if options["speedup"] < 0:
+            raise CommandError("Speedup can't be negative")
+
+        logs = [open_log(filename) for filename in options["logfiles"]]
+        entries = parse_log(chain.from_iterable(logs))
+        if options["limit"]:
+            entries = islice(entries, options["limit"])
+        replayer = Replayer(
+            options["url"],
+            concurrency=options["concurrency"],
+            speedup=options["speedup"],
+            host=options["host"],
+            timeout=options["timeout"],
+        )
+        try:
+            results, elapsed = replayer.replay(entries)
+        finally:
+            for log in logs:
+                if log is not sys.stdin:
+                    log.close()
+        if not results:
+            raise CommandError("No anonymous GET requests found to replay")
+
+        summary = summarize(results, elapsed)
+        self.stdout.write("Replayed %d requests in %.1f s" % (len(results), elapsed))
+        self.stdout.write(
+            "%-10s %7s %9s %9s %9s %8s %7s"
+            % ("family", "count", "p50 ms", "p95 ms", "p99 ms", "req/s", "errors")
+        )
+        for family, stats in summary.items():
+            if family != ALL:
+                self.report(family, stats)
+        self.report(ALL, summary[ALL])
+
+        if options["output"]:
+            with open(options["output"], "w") as outfile:
+                json.dump({"elapsed": elapsed, "families": summary}, outfile, indent=2)
+
+    def report(self, family, stats):
+        self.stdout.write(
+            "%-10s %7d %9.1f %9.1f %9.1f %8.1f %6.1f%%"
+            % (
+                family,
+                stats["count"],
+                stats["p50"],
+                stats["p95"],
+                stats["p99"],
+                stats["throughput"] or 0,
+                stats["error_rate"] * 100,
+            )
+        )
@@ -0,0 +1,87 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from cdhweb.pages.benchmarks import get_benchmarks, results_to_json, run_benchmarks
+
+
+class Command(BaseCommand):
+    """Render page types and other views, reporting wall time, SQL query
+    count and response size. Fails if any view makes more queries than its
+    budget. Use with a dataset created by generate_dataset."""
+
+    help = __doc__
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "names",
+            nargs="*",
+            help="Only run benchmarks with names starting with these values",
+        )
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=3,
+            help="Number of timed requests per benchmark (default: %(default)s)",
+        )
+        parser.add_argument(
+            "--cold",
+            action="store_true",
+            help="Clear the cache before each request; query budgets are "
+            "not checked. Don't use with a shared production cache!",
+        )
+        parser.add_argument("--output", help="Save results as JSON to this file")
+        parser.add_argument(
+            "--compare", help="JSON results from a previous run to compare with"
+        )
+
+    def handle(self, *args, **options):
+        benchmarks = get_benchmarks()
+        if options["names"]:
+            benchmarks = [
+                b
+                for b in benchmarks
+                if any(b.name.startswith(name) for name in options["names"])
+            ]
+        previous = {}
+        if options["compare"]:
+            with open(options["compare"]) as infile:
+                previous = {r["name"]: r for r in json.load(infile)["results"]}
+
+        results = run_benchmarks(
+            benchmarks, repeat=options["repeat"], cold=options["cold"]
+        )
+        for result in results:
+            self.report(result, previous.get(result.benchmark.name))
+
+        if options["output"]:
+            with open(options["output"], "w") as outfile:
+                json.dump(results_to_json(results), outfile, indent=2)
+
+        failed = [
+            result.benchmark.name
+            for result in results
+            if result.over_budget or result.status != 200
+        ]
+        if failed:
+            raise CommandError("Failed benchmarks: %s" % ", ".join(failed))
+
+    def report(self, result, previous=None):
+        data = result.as_dict()
+        line = "%-32s %3d  %4d/%-4d queries  %8d bytes  %8.1f ms" % (
+            data["name"],
+            data["status"],
+            data["queries"],
+            data["budget"],
+            data["bytes"],
+            data["time_ms"]["median"],
+        )
+        if previous:
+            line += "  (%+.1f ms, %+d queries)" % (
+                data["time_ms"]["median"] - previous["time_ms"]["median"],
+                data["queries"] - previous["queries"],
+            )
+        if result.over_budget or result.status != 200:
+            self.stdout.write(line, style_func=self.style.ERROR)
+        else:
+            self.stdout.write(line)
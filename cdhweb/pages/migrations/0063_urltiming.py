@@ -0,0 +1,28 @@
+# Generated by Django 5.0.14 on 2026-10-19 17:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cdhpages', '0062_requestprofile'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UrlTiming',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('url', models.TextField(unique=True)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('total_ms', models.FloatField(default=0)),
+                ('max_ms', models.FloatField(default=0)),
+                ('sql_count', models.PositiveIntegerField(default=0)),
+                ('updated', models.DateTimeField()),
+            ],
+            options={
+                'ordering': ['-max_ms'],
+            },
+        ),
+    ]
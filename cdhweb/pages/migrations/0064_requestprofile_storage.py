@@ -0,0 +1,19 @@
+# Generated by Django 5.0.14 on 2026-10-19 18:06
+
+import cdhweb.pages.profiling
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cdhpages', '0063_urltiming'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='requestprofile',
+            name='file',
+            field=models.FileField(storage=cdhweb.pages.profiling.ProfileStorage(), upload_to=''),
+        ),
+    ]
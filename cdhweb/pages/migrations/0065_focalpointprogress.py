@@ -0,0 +1,24 @@
+# Generated by Django 5.0.14 on 2026-10-19 18:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cdhpages', '0064_requestprofile_storage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FocalPointProgress',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_image_id', models.PositiveIntegerField()),
+                ('updated', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'focal point progress',
+            },
+        ),
+    ]
@@ -1,3 +1,6 @@
+from django.apps import apps
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
 from django.db import models
 from django.utils.functional import cached_property
 from wagtail.admin.panels import (
@@ -166,6 +169,9 @@ class SidebarNavigationMixin(models.Model):
 
 
 class OpenGraphMixin(models.Model):
+    #: filter spec for the open graph preview image
+    og_image_spec = "fill-1200x627"
+
     class Meta:
         abstract = True
 
@@ -175,5 +181,110 @@ class OpenGraphMixin(models.Model):
         if not image:
             return get_default_preview_img_url()
 
-        rendition = image.get_rendition("fill-1200x627")
+        rendition = image.get_rendition(self.og_image_spec)
         return absolutize_url(rendition.url)
+
+
+class DatedChildPageMixin:
+    """Mixin for pages served by a ``dated_child`` route on their parent
+    landing page (e.g. ``/events/2014/03/my-event/``), instead of at their
+    path in the page tree.
+
+    URLs are generated from the page's own tree path, date and slug; the
+    only other information needed is the type of the parent page, which is
+    cached by parent path, so generating URLs does not query for the parent.
+    Use :meth:`urls_for` to generate URLs for many pages at once.
+    """
+
+    #: how long to cache the parent page type for a path
+    parent_route_cache_timeout = 60 * 60 * 24
+
+    def get_dated_route_kwargs(self):
+        """Keyword arguments for the parent ``dated_child`` route, or None
+        if the page can't be served by date (e.g. no date is set)."""
+        raise NotImplementedError
+
+    @property
+    def parent_url_path(self):
+        # url paths end with the page slug and a trailing slash
+        return self.url_path[: -len(self.slug) - 1]
+
+    @staticmethod
+    def parent_route_cache_key(url_path):
+        return "dated-parent-route-%s" % url_path
+
+    @classmethod
+    def get_parent_routes(cls, url_paths):
+        """Parent page model labels, keyed on parent url path, for the
+        specified paths; the label is empty for parent pages without a
+        ``dated_child`` route. Retrieved from the cache, with a single query
+        for any paths not yet cached."""
+        url_paths = set(url_paths)
+        cached = cache.get_many([cls.parent_route_cache_key(p) for p in url_paths])
+        routes = {}
+        missing = []
+        for url_path in url_paths:
+            label = cached.get(cls.parent_route_cache_key(url_path))
+            if label is None:
+                missing.append(url_path)
+            else:
+                routes[url_path] = label
+
+        if missing:
+            found = {}
+            for url_path, content_type_id in Page.objects.filter(
+                url_path__in=missing
+            ).values_list("url_path", "content_type_id"):
+                model = ContentType.objects.get_for_id(content_type_id).model_class()
+                has_route = hasattr(model, "get_resolver")
+                found[url_path] = model._meta.label if has_route else ""
+            cache.set_many(
+                {cls.parent_route_cache_key(p): label for p, label in found.items()},
+                cls.parent_route_cache_timeout,
+            )
+            routes.update(found)
+        return routes
+
+    def get_parent_route_model(self):
+        """Parent page model, if it has a ``dated_child`` route."""
+        label = getattr(self, "_parent_route", None)
+        if label is None:
+            label = self.get_parent_routes([self.parent_url_path]).get(
+                self.parent_url_path, ""
+            )
+        return apps.get_model(label) if label else None
+
+    def get_url_parts(self, request=None, *args, **kwargs):
+        url_parts = super().get_url_parts(request, *args, **kwargs)
+        # NOTE url parts can be None when the page is not routable, e.g.
+        # immediately on page creation
+        route_kwargs = self.get_dated_route_kwargs()
+        if not url_parts or route_kwargs is None:
+            return url_parts
+
+        # if for some reason we don't have a landing-page-style parent,
+        # use the default url
+        parent_model = self.get_parent_route_model()
+        if parent_model is None:
+            return url_parts
+
+        site_id, root_url, page_path = url_parts
+        # the parent's url is this page's url without the slug
+        parent_path = page_path[: -len(self.slug) - 1]
+        subpage_path = parent_model.get_resolver().reverse(
+            "dated_child", **route_kwargs
+        )
+        return site_id, root_url, parent_path + subpage_path
+
+    @classmethod
+    def urls_for(cls, pages, request=None):
+        """Generate urls for a list or queryset of pages, looking up the
+        types of their parent pages in bulk. Returns a dictionary of urls
+        keyed on page id."""
+        pages = list(pages)
+        routes = cls.get_parent_routes(page.parent_url_path for page in pages)
+        urls = {}
+        for page in pages:
+            page._parent_route = routes.get(page.parent_url_path, "")
+            urls[page.pk] = page.get_url(request)
+        return urls
@@ -3,6 +3,7 @@ from urllib.parse import urlparse, urlunparse
 
 import bleach
 from django.apps import apps
+from django.conf import settings
 from django.core.exceptions import ValidationError
 from django.db import models
 from django.template.defaultfilters import striptags, truncatechars_html
@@ -24,6 +25,7 @@ from wagtail.snippets.models import register_snippet
 from wagtailcodeblock.blocks import CodeBlock
 
 from cdhweb.pages import snippets  # noqa needed for import order
+from cdhweb.pages.profiling import ProfileStorage
 
 from .blocks.accordion_block import AccordionBlock
 from .blocks.article_index_block import ArticleTileBlock
@@ -604,3 +606,67 @@ class PurpleMode(BaseGenericSetting):
 
     class Meta:
         verbose_name = "Purple Site Setting"
+
+
+class RequestProfile(models.Model):
+    """Sampling profile of a single request, saved by
+    :class:`~cdhweb.pages.profiling.ProfilingMiddleware` as a speedscope
+    file."""
+
+    created = models.DateTimeField(auto_now_add=True)
+    method = models.CharField(max_length=10)
+    path = models.TextField()
+    status = models.PositiveSmallIntegerField()
+    duration_ms = models.FloatField()
+    samples = models.PositiveIntegerField()
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        null=True,
+        on_delete=models.SET_NULL,
+        related_name="+",
+    )
+    file = models.FileField(storage=ProfileStorage())
+
+    class Meta:
+        ordering = ["-created"]
+
+    def __str__(self):
+        return "%s %s" % (self.method, self.path)
+
+    def delete(self, *args, **kwargs):
+        """Remove the profile file along with the profile."""
+        self.file.delete(save=False)
+        return super().delete(*args, **kwargs)
+
+
+class UrlTiming(models.Model):
+    """Request timing totals for one url, for the slow urls report; updated
+    by :class:`~cdhweb.pages.timing.ServerTimingMiddleware`."""
+
+    url = models.TextField(unique=True)
+    count = models.PositiveIntegerField(default=0)
+    total_ms = models.FloatField(default=0)
+    max_ms = models.FloatField(default=0)
+    sql_count = models.PositiveIntegerField(default=0)
+    updated = models.DateTimeField()
+
+    class Meta:
+        ordering = ["-max_ms"]
+
+    def __str__(self):
+        return self.url
+
+
+class FocalPointProgress(models.Model):
+    """The last image examined by the ``detect_focal_points`` manage command,
+    so that later runs only look at new images; a single row, saved by
+    :func:`~cdhweb.pages.focal_points.process_new_images`."""
+
+    last_image_id = models.PositiveIntegerField()
+    updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = "focal point progress"
+
+    def __str__(self):
+        return "Images up to %d" % self.last_image_id
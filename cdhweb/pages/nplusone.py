@@ -0,0 +1,186 @@
+"""
+Detection of "N+1" query patterns: the same SQL statement run over and over
+with different parameters, typically once per item in a listing.
+
+:class:`NPlusOneDetector` fingerprints each statement run while it is
+active, counting repeats and the call sites they come from: the innermost
+line of cdhweb code and the template being rendered, if any. Statements
+repeated more than the threshold are logged to the ``cdhweb.nplusone``
+logger, or raised as :class:`NPlusOneError`. Use it in tests as a context
+manager::
+
+    with NPlusOneDetector(threshold=2, raise_error=True):
+        client.get(url)
+
+:class:`NPlusOneMiddleware` checks a sample of requests in production; it is
+only used when the ``NPLUSONE_SAMPLE_RATE`` setting (the fraction of
+requests to check) is set. ``NPLUSONE_THRESHOLD`` (default 10) sets the
+number of repeats allowed, and ``NPLUSONE_RAISE`` makes detected patterns
+raise errors instead of being logged.
+"""
+
+import json
+import logging
+import random
+import re
+import sys
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from cdhweb.pages.timing import iter_call_sites
+
+logger = logging.getLogger("cdhweb.nplusone")
+
+#: default number of times a statement may be repeated
+DEFAULT_THRESHOLD = 10
+
+# lists of placeholders or literals in IN clauses, numbers and strings
+IN_LIST_RE = re.compile(r"\bIN \((?:[^()']|'[^']*')+\)", re.IGNORECASE)
+NUMBER_RE = re.compile(r"\b\d+(?:\.\d+)?\b")
+STRING_RE = re.compile(r"'(?:[^']|'')*'")
+WHITESPACE_RE = re.compile(r"\s+")
+
+
+def fingerprint(sql):
+    """Normalize a SQL statement so that statements differing only in
+    literal values or the length of ``IN`` lists are identical."""
+    sql = STRING_RE.sub("?", sql)
+    sql = IN_LIST_RE.sub("IN (...)", sql)
+    sql = NUMBER_RE.sub("?", sql)
+    return WHITESPACE_RE.sub(" ", sql).strip()
+
+
+class NPlusOneError(Exception):
+    """Raised when statements are repeated more than the threshold."""
+
+    def __init__(self, repeated):
+        self.repeated = repeated
+        super().__init__(
+            "Repeated queries:\n%s" % "\n".join(str(query) for query in repeated)
+        )
+
+
+class RepeatedQuery:
+    """A SQL fingerprint, the number of times it was run, and counts of the
+    call sites that ran it."""
+
+    def __init__(self, fingerprint):
+        self.fingerprint = fingerprint
+        self.count = 0
+        self.sites = Counter()
+
+    def __str__(self):
+        sites = "".join(
+            "\n    %d× %s" % (count, site) for site, count in self.sites.most_common()
+        )
+        return "%d× %s%s" % (self.count, self.fingerprint, sites)
+
+    def as_dict(self):
+        return {
+            "sql": self.fingerprint,
+            "count": self.count,
+            "sites": [
+                {"site": site, "count": count}
+                for site, count in self.sites.most_common()
+            ],
+        }
+
+
+def call_site():
+    """Description of the code and template that ran the current query."""
+    code = template = None
+    for kind, site in iter_call_sites(sys._getframe(2)):
+        if kind == "code" and code is None:
+            code = site
+        elif kind == "template" and template is None:
+            template = site
+        if code and template:
+            break
+    if template:
+        return "%s (template %s)" % (code or "other", template)
+    return code or "other"
+
+
+class NPlusOneDetector:
+    """Context manager that counts repeated SQL statements on all database
+    connections, and logs or raises an error on exit for statements run
+    more than ``threshold`` times.
+
+    :param threshold: number of times a statement may run; defaults to
+        the ``NPLUSONE_THRESHOLD`` setting or :data:`DEFAULT_THRESHOLD`
+    :param raise_error: raise :class:`NPlusOneError` instead of logging;
+        defaults to the ``NPLUSONE_RAISE`` setting
+    :param label: description for log messages, e.g. the request path
+    """
+
+    def __init__(self, threshold=None, raise_error=None, label=""):
+        if threshold is None:
+            threshold = getattr(settings, "NPLUSONE_THRESHOLD", DEFAULT_THRESHOLD)
+        if raise_error is None:
+            raise_error = getattr(settings, "NPLUSONE_RAISE", False)
+        self.threshold = threshold
+        self.raise_error = raise_error
+        self.label = label
+        self.queries = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        """Database execute wrapper that records the statement."""
+        key = fingerprint(sql)
+        query = self.queries.get(key)
+        if query is None:
+            query = self.queries[key] = RepeatedQuery(key)
+        query.count += 1
+        query.sites[call_site()] += 1
+        return execute(sql, params, many, context)
+
+    def __enter__(self):
+        self.stack = ExitStack()
+        for connection in connections.all():
+            self.stack.enter_context(connection.execute_wrapper(self))
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stack.close()
+        if exc_type is None:
+            self.check()
+
+    @property
+    def repeated(self):
+        """Statements run more than the threshold, most repeated first."""
+        return sorted(
+            (query for query in self.queries.values() if query.count > self.threshold),
+            key=lambda query: query.count,
+            reverse=True,
+        )
+
+    def check(self):
+        """Log or raise an error for repeated statements."""
+        repeated = self.repeated
+        if not repeated:
+            return
+        if self.raise_error:
+            raise NPlusOneError(repeated)
+        for query in repeated:
+            data = {"label": self.label, **query.as_dict()}
+            logger.warning(json.dumps(data), extra={"nplusone": data})
+
+
+class NPlusOneMiddleware:
+    """Check a random sample of requests for repeated queries. Only used
+    when the ``NPLUSONE_SAMPLE_RATE`` setting is set."""
+
+    def __init__(self, get_response):
+        self.sample_rate = getattr(settings, "NPLUSONE_SAMPLE_RATE", 0)
+        if not self.sample_rate:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if random.random() >= self.sample_rate:
+            return self.get_response(request)
+        with NPlusOneDetector(label="%s %s" % (request.method, request.path)):
+            return self.get_response(request)
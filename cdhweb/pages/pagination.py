@@ -0,0 +1,109 @@
+"""
+Keyset ("seek") pagination.
+
+Rather than counting all results and skipping an ever-growing number of
+rows with ``OFFSET``, each page is found by filtering on the sort values of
+the last item on the previous page, so any page costs the same as the first
+(a single indexed query, with no ``COUNT``). Pages are identified by opaque
+cursors instead of page numbers.
+"""
+
+import base64
+import json
+
+from django.core.paginator import InvalidPage
+from django.db.models import Q
+
+
+class InvalidCursor(InvalidPage):
+    """Raised when a pagination cursor can't be decoded."""
+
+
+class KeysetPage:
+    """One page of results from a :class:`KeysetPaginator`."""
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class KeysetPaginator:
+    """Paginate a queryset by the values of a field (e.g. a date), using
+    the primary key to break ties.
+
+    :param queryset: queryset to paginate
+    :param per_page: number of items per page
+    :param order_by: field to sort on; prefix with ``-`` for descending
+    """
+
+    def __init__(self, queryset, per_page, order_by):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.descending = order_by.startswith("-")
+        self.field = order_by.lstrip("-")
+
+    def encode_cursor(self, obj, direction):
+        """Opaque cursor for the page before (``direction="p"``) or after
+        (``"n"``) an object."""
+        value = self.queryset.model._meta.get_field(self.field).value_to_string(obj)
+        data = json.dumps([direction, value, obj.pk], separators=(",", ":"))
+        return base64.urlsafe_b64encode(data.encode()).decode().rstrip("=")
+
+    def decode_cursor(self, cursor):
+        """Direction, sort value and primary key from a cursor."""
+        try:
+            data = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+            direction, value, pk = json.loads(data)
+            if direction not in ("n", "p"):
+                raise ValueError
+            field = self.queryset.model._meta.get_field(self.field)
+            return direction, field.to_python(value), int(pk)
+        except Exception:
+            raise InvalidCursor("Invalid cursor")
+
+    def page(self, cursor=None):
+        """Get the first page, or the page indicated by a cursor."""
+        queryset = self.queryset
+        forward = True
+        if cursor:
+            direction, value, pk = self.decode_cursor(cursor)
+            forward = direction == "n"
+            # later in the sort order when moving forward, earlier if back
+            lookup = "lt" if self.descending == forward else "gt"
+            queryset = queryset.filter(
+                Q(**{"%s__%s" % (self.field, lookup): value})
+                | Q(**{self.field: value, "pk__%s" % lookup: pk})
+            )
+
+        descending = self.descending == forward
+        order = ["-%s" % self.field, "-pk"] if descending else [self.field, "pk"]
+        # get one extra item to find out if there are more
+        items = list(queryset.order_by(*order)[: self.per_page + 1])
+        more = len(items) > self.per_page
+        items = items[: self.per_page]
+        if not forward:
+            items.reverse()
+
+        next_cursor = previous_cursor = None
+        if items:
+            if more or not forward:
+                next_cursor = self.encode_cursor(items[-1], "n")
+            if cursor and (more or forward):
+                previous_cursor = self.encode_cursor(items[0], "p")
+        return KeysetPage(items, next_cursor, previous_cursor)
@@ -0,0 +1,222 @@
+"""
+On-demand sampling profiles of individual requests.
+
+When the ``REQUEST_PROFILING`` setting is enabled, :class:`ProfilingMiddleware`
+profiles requests made by staff users that ask for it, either with a
+``_profile`` query parameter (for a logged-in staff user) or with an
+``X-Profile-Token`` header containing a signed token from the request
+profiles report in the wagtail admin (for load testing tools and scripts
+without a session).
+
+Profiling uses a :class:`Sampler` thread that records the call stack of the
+thread serving the request at a fixed interval, so it adds little overhead
+to the request itself and can be used in production. Profiles are saved as
+:class:`~cdhweb.pages.models.RequestProfile` objects with a file in the
+`speedscope <https://www.speedscope.app/>`_ format, which shows the time
+spent in ``Page.serve``, building context and rendering templates as a
+flame graph.
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+#: query parameter that triggers profiling for logged-in staff users
+PROFILE_PARAM = "_profile"
+#: request header with a signed token that triggers profiling
+PROFILE_HEADER = "X-Profile-Token"
+#: response header with the id of the saved profile
+PROFILE_ID_HEADER = "X-Profile-Id"
+#: salt for profiling tokens
+TOKEN_SALT = "cdhweb.pages.profiling"
+#: number of seconds a profiling token is valid
+TOKEN_MAX_AGE = 24 * 60 * 60
+#: seconds between samples
+SAMPLE_INTERVAL = 0.001
+#: number of profiles kept; older profiles are removed
+MAX_PROFILES = 100
+
+SPEEDSCOPE_SCHEMA = "https://www.speedscope.app/file-format-schema.json"
+
+
+@deconstructible
+class ProfileStorage(FileSystemStorage):
+    """Storage for profile files under the ``REQUEST_PROFILE_ROOT`` setting,
+    outside the publicly served media directory, since profiles include
+    file paths and full request urls. Files have no public url; they are
+    only served by the staff-only
+    :class:`~cdhweb.pages.views.RequestProfileDownloadView`."""
+
+    # read from settings on every use, so changes (e.g. in tests) apply
+    @property
+    def base_location(self):
+        return settings.REQUEST_PROFILE_ROOT
+
+    @property
+    def location(self):
+        return os.path.abspath(self.base_location)
+
+    @property
+    def base_url(self):
+        return None
+
+
+def make_token(user):
+    """Signed token that triggers profiling for requests with the
+    ``X-Profile-Token`` header."""
+    return signing.dumps(user.get_username(), salt=TOKEN_SALT)
+
+
+def token_user(token):
+    """Staff user for a profiling token, or None if the token is invalid,
+    expired or not for an active staff user."""
+    try:
+        username = signing.loads(token, salt=TOKEN_SALT, max_age=TOKEN_MAX_AGE)
+    except signing.BadSignature:
+        return None
+    User = get_user_model()
+    return User._default_manager.filter(
+        is_active=True, is_staff=True, **{User.USERNAME_FIELD: username}
+    ).first()
+
+
+class Sampler(threading.Thread):
+    """Thread that samples the call stack of another thread until stopped,
+    collecting the samples in speedscope's sampled profile format: a list
+    of unique frames, and for each sample the indexes of the frames on the
+    stack (outermost first) and the time since the previous sample."""
+
+    def __init__(self, thread_id, interval=SAMPLE_INTERVAL):
+        super().__init__(name="profiling-sampler", daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stopped = threading.Event()
+        self.frames = []
+        self.frame_index = {}
+        self.samples = []
+        self.weights = []
+
+    def frame_id(self, code):
+        key = (code.co_filename, code.co_firstlineno, code.co_qualname)
+        index = self.frame_index.get(key)
+        if index is None:
+            index = self.frame_index[key] = len(self.frames)
+            self.frames.append(
+                {"name": code.co_qualname, "file": key[0], "line": key[1]}
+            )
+        return index
+
+    def sample(self, frame):
+        stack = []
+        while frame is not None:
+            stack.append(self.frame_id(frame.f_code))
+            frame = frame.f_back
+        stack.reverse()
+        return stack
+
+    def run(self):
+        last = time.perf_counter()
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            now = time.perf_counter()
+            if frame is not None:
+                self.samples.append(self.sample(frame))
+                self.weights.append((now - last) * 1000)
+            last = now
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+    def speedscope(self, name):
+        """Samples as a speedscope file."""
+        return {
+            "$schema": SPEEDSCOPE_SCHEMA,
+            "name": name,
+            "exporter": "cdhweb",
+            "activeProfileIndex": 0,
+            "shared": {"frames": self.frames},
+            "profiles": [
+                {
+                    "type": "sampled",
+                    "name": name,
+                    "unit": "milliseconds",
+                    "startValue": 0,
+                    "endValue": sum(self.weights),
+                    "samples": self.samples,
+                    "weights": self.weights,
+                }
+            ],
+        }
+
+
+def save_profile(request, response, sampler, duration_ms, user):
+    """Save a request profile and remove the oldest beyond
+    :data:`MAX_PROFILES`."""
+    # avoid circular import
+    from cdhweb.pages.models import RequestProfile
+
+    name = "%s %s" % (request.method, request.get_full_path())
+    profile = RequestProfile(
+        method=request.method,
+        path=request.get_full_path(),
+        status=response.status_code,
+        duration_ms=duration_ms,
+        samples=len(sampler.samples),
+        user=user,
+    )
+    content = json.dumps(sampler.speedscope(name), separators=(",", ":"))
+    profile.file.save(
+        "%s.speedscope.json" % uuid.uuid4().hex, ContentFile(content), save=True
+    )
+    for old in RequestProfile.objects.all()[MAX_PROFILES:]:
+        old.delete()
+    return profile
+
+
+class ProfilingMiddleware:
+    """Profile requests from staff users that ask for it with a
+    ``_profile`` query parameter or an ``X-Profile-Token`` header. Only
+    used when the ``REQUEST_PROFILING`` setting is enabled; must come after
+    authentication middleware."""
+
+    def __init__(self, get_response):
+        if not getattr(settings, "REQUEST_PROFILING", False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def get_profile_user(self, request):
+        """User to profile the request for, or None."""
+        if PROFILE_PARAM in request.GET and request.user.is_staff:
+            return request.user
+        token = request.headers.get(PROFILE_HEADER)
+        if token:
+            return token_user(token)
+
+    def __call__(self, request):
+        user = self.get_profile_user(request)
+        if user is None:
+            return self.get_response(request)
+
+        sampler = Sampler(threading.get_ident())
+        start = time.perf_counter()
+        sampler.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            sampler.stop()
+        duration_ms = (time.perf_counter() - start) * 1000
+        profile = save_profile(request, response, sampler, duration_ms, user)
+        response[PROFILE_ID_HEADER] = str(profile.pk)
+        return response
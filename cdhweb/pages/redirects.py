@@ -0,0 +1,171 @@
+"""
+Redirects resolved from an in-memory table instead of the database.
+
+All of wagtail's :class:`~wagtail.contrib.redirects.models.Redirect` objects
+(imported, added in the admin or created automatically when a page's slug
+changes) are compiled into a dictionary keyed on the normalised old path.
+Apps can also register prefixes with the ``register_redirect_prefixes``
+wagtail hook, which should return a dictionary of path prefixes (e.g.
+``"/updates/"``) and functions returning a dictionary of the last path
+segment under that prefix (e.g. a slug) to the url to redirect to; any path
+starting with a prefix is matched by its last segment.
+
+The table is built on first use in each process and rebuilt when redirects
+or pages change, using a generation number stored in the cache (see
+:func:`cdhweb.pages.schedule.get_generation`), so resolving a redirect needs
+a cache lookup but no database queries.
+"""
+
+from urllib.parse import urlparse
+
+from django import http
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.encoding import uri_to_iri
+from wagtail import hooks
+from wagtail.contrib.redirects.models import Redirect
+from wagtail.models import Page, Site
+from wagtail.signals import (
+    page_published,
+    page_slug_changed,
+    page_unpublished,
+    post_page_move,
+)
+
+from cdhweb.pages.schedule import bump_generation, get_generation
+
+#: generation name for the redirect table
+REDIRECT_GENERATION = "redirects"
+
+
+class RedirectTable:
+    """In-memory table of redirects, as ``(url, permanent)`` tuples."""
+
+    def __init__(self):
+        self.generation = None
+        #: normalised path -> {site id or None: (url, permanent)}
+        self.paths = {}
+        #: path prefix -> {last path segment: url}
+        self.prefixes = {}
+
+    def build(self):
+        """Compile redirects and registered prefixes into the table."""
+        paths = {}
+        redirects = Redirect.objects.values_list(
+            "old_path",
+            "site_id",
+            "is_permanent",
+            "redirect_page_id",
+            "redirect_page_route_path",
+            "redirect_link",
+        )
+        redirects = list(redirects)
+        # resolve urls for all target pages at once
+        page_ids = set(r[3] for r in redirects if r[3])
+        pages = Page.objects.live().filter(pk__in=page_ids).specific()
+        page_urls = {page.pk: page.url for page in pages}
+
+        for old_path, site_id, permanent, page_id, route_path, link in redirects:
+            if page_id:
+                link = page_urls.get(page_id)
+                if link and route_path:
+                    link = link.rstrip("/") + route_path
+            if link:
+                paths.setdefault(old_path, {})[site_id] = (link, permanent)
+
+        prefixes = {}
+        for fn in hooks.get_hooks("register_redirect_prefixes"):
+            for prefix, get_urls in fn().items():
+                prefixes.setdefault(prefix, {}).update(get_urls())
+
+        self.paths = paths
+        self.prefixes = prefixes
+
+    def refresh(self):
+        """Rebuild the table if redirects have changed since it was built."""
+        generation = get_generation(REDIRECT_GENERATION)
+        if generation != self.generation:
+            self.build()
+            self.generation = generation
+
+    def resolve(self, path, request=None):
+        """Find the redirect for a path, as a ``(url, permanent)`` tuple,
+        or None. The site for the request is only looked up when there
+        are site-specific redirects for the path."""
+        self.refresh()
+        path = Redirect.normalise_path(path)
+        by_site = self.paths.get(path)
+        if by_site:
+            if len(by_site) > 1 or None not in by_site:
+                site = Site.find_for_request(request) if request else None
+                site_id = site.pk if site else None
+                if site_id in by_site:
+                    return by_site[site_id]
+            if None in by_site:
+                return by_site[None]
+
+        for prefix, urls in self.prefixes.items():
+            if path.startswith(prefix):
+                url = urls.get(urlparse(path).path.rsplit("/", 1)[-1])
+                if url:
+                    return (url, True)
+        return None
+
+
+#: table used by :class:`RedirectMiddleware`
+redirect_table = RedirectTable()
+
+
+def get_redirect(request, path):
+    """Redirect for a path from the redirect table, trying the path
+    unencoded if not found."""
+    if "\0" in path:
+        return None
+    return redirect_table.resolve(path, request) or redirect_table.resolve(
+        uri_to_iri(path), request
+    )
+
+
+class RedirectMiddleware(MiddlewareMixin):
+    """Replacement for wagtail's redirect middleware using the in-memory
+    :data:`redirect_table`."""
+
+    def process_response(self, request, response):
+        # only redirect urls that aren't found
+        if response.status_code != 404:
+            return response
+
+        path = Redirect.normalise_path(request.get_full_path())
+        redirect = get_redirect(request, path)
+        if redirect is None:
+            path_without_query = urlparse(path).path
+            if path == path_without_query:
+                return response
+            redirect = get_redirect(request, path_without_query)
+            if redirect is None:
+                return response
+
+        url, permanent = redirect
+        if permanent:
+            return http.HttpResponsePermanentRedirect(url)
+        return http.HttpResponseRedirect(url)
+
+
+@receiver(post_save, sender=Redirect)
+@receiver(post_delete, sender=Redirect)
+@receiver(page_published)
+@receiver(page_unpublished)
+@receiver(page_slug_changed)
+@receiver(post_page_move)
+def rebuild_redirects(sender, **kwargs):
+    """Handler to rebuild the redirect table when redirects change, or
+    pages that could be redirect targets change url or status."""
+    bump_generation(REDIRECT_GENERATION)
+
+
+@receiver(post_delete)
+def rebuild_redirects_page_deleted(sender, instance, **kwargs):
+    # post_delete can't be connected for all page types at once
+    if isinstance(instance, Page):
+        bump_generation(REDIRECT_GENERATION)
@@ -0,0 +1,281 @@
+"""
+Garbage collection of image renditions.
+
+Wagtail creates a rendition (a database row and a resized file) the first
+time an image is displayed with a filter spec, and never removes it, so
+renditions accumulate for images that are no longer displayed (removed from
+pages, or on pages that have been unpublished), for specs that are no
+longer used, and for focal points that have since changed. The
+``collect_renditions`` manage command removes them:
+
+- the live specs are those in the image tags of all templates, plus specs
+  used in code, which apps register with the ``register_rendition_specs``
+  wagtail hook (a function returning a list of specs);
+- the live images are those referenced by published pages (including
+  images in StreamField blocks and rich text) and by other content that
+  references images, such as people;
+- a rendition is kept if both its image and its spec are live and it was
+  generated with the image's current focal point; admin thumbnails
+  (:data:`ADMIN_SPECS`) are kept for all images;
+- other renditions are deleted in chunks, with their files, and rendition
+  files in storage that no rendition refers to are deleted too;
+- the number of renditions and files deleted and the storage reclaimed are
+  reported.
+
+Renditions that are deleted but still needed (e.g. for a draft being
+previewed) are generated again the next time they are displayed.
+"""
+
+import datetime
+import os
+from collections import Counter
+
+from django.apps import apps
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.template import Template, TemplateSyntaxError, engines
+from django.template.backends.django import DjangoTemplates
+from django.template.base import Origin
+from django.template.utils import get_app_template_dirs
+from django.utils import timezone
+from modelcluster.fields import ParentalKey
+from wagtail import hooks
+from wagtail.fields import RichTextField, StreamField
+from wagtail.images import get_image_model
+from wagtail.images.models import AbstractImage, AbstractRendition, Filter
+from wagtail.images.templatetags.wagtailimages_tags import ImageNode, SrcsetImageNode
+from wagtail.images.utils import to_svg_safe_spec
+from wagtail.models import DraftStateMixin, Page, ReferenceIndex
+
+#: specs for thumbnails in the admin image listing and choosers, kept for
+#: all images so that browsing images doesn't regenerate them
+ADMIN_SPECS = {"max-165x165"}
+#: files in the rendition folder modified more recently than this are kept,
+#: since a rendition's file is saved before its database row
+FILE_GRACE_PERIOD = datetime.timedelta(hours=1)
+#: reasons a rendition is deleted
+UNUSED_IMAGE = "unused image"
+RETIRED_SPEC = "retired spec"
+OUTDATED_FOCAL_POINT = "outdated focal point"
+
+
+def iter_template_files():
+    """Django template engines, with the path and name of each of their
+    template files."""
+    for engine in engines.all():
+        if not isinstance(engine, DjangoTemplates):
+            continue
+        for template_dir in list(engine.engine.dirs) + list(
+            get_app_template_dirs("templates")
+        ):
+            for root, _, files in os.walk(template_dir):
+                for filename in files:
+                    path = os.path.join(root, filename)
+                    yield engine, path, os.path.relpath(path, template_dir)
+
+
+def node_specs(node):
+    """Filter specs of the renditions generated by an image tag."""
+    if isinstance(node, SrcsetImageNode):
+        specs = Filter.expand_spec(node.filter_specs)
+    else:
+        specs = ["|".join(node.filter_specs)]
+    if node.preserve_svg:
+        specs += [to_svg_safe_spec(spec) for spec in specs]
+    return specs
+
+
+def template_specs():
+    """Filter specs in image tags in all templates."""
+    specs = set()
+    compiled = set()
+    for engine, path, name in iter_template_files():
+        if path in compiled:
+            continue
+        compiled.add(path)
+        try:
+            with open(path, encoding="utf-8") as template_file:
+                template = Template(
+                    template_file.read(),
+                    origin=Origin(path, name),
+                    engine=engine.engine,
+                )
+        except (TemplateSyntaxError, UnicodeDecodeError, OSError):
+            # not a template, or one that can't be compiled here
+            continue
+        for node in template.nodelist.get_nodes_by_type(ImageNode):
+            specs.update(node_specs(node))
+    return specs
+
+
+def get_live_specs():
+    """Filter specs used in templates and registered with the
+    ``register_rendition_specs`` hook."""
+    specs = template_specs()
+    for fn in hooks.get_hooks("register_rendition_specs"):
+        specs.update(fn())
+    return specs
+
+
+def references_images(model):
+    """Check if a (non-page) model may reference images; models with a
+    parental key are checked through their parent."""
+    if issubclass(model, (Page, AbstractImage, AbstractRendition)):
+        return False
+    image_model = get_image_model()
+    fields = model._meta.get_fields()
+    if any(isinstance(field, ParentalKey) for field in fields):
+        return False
+    return any(
+        (field.many_to_one and field.related_model is image_model)
+        or isinstance(field, (StreamField, RichTextField))
+        for field in fields
+    )
+
+
+def iter_live_objects():
+    """Published pages, and published content of other models that may
+    reference images."""
+    yield from Page.objects.live().specific().iterator(chunk_size=100)
+    for model in apps.get_models():
+        if not references_images(model):
+            continue
+        objects = model._default_manager.all()
+        if issubclass(model, DraftStateMixin):
+            objects = objects.filter(live=True)
+        yield from objects.iterator(chunk_size=100)
+
+
+def get_live_image_ids():
+    """Ids of images referenced by published content."""
+    content_type = ContentType.objects.get_for_model(get_image_model())
+    image_ids = set()
+    for obj in iter_live_objects():
+        # references in fields, StreamField blocks, rich text and child
+        # objects, found the same way as for wagtail's reference index
+        for (
+            content_type_id,
+            object_id,
+            *_,
+        ) in ReferenceIndex._extract_references_from_object(obj):
+            if content_type_id == content_type.id:
+                image_ids.add(int(object_id))
+    return image_ids
+
+
+class CollectionStats:
+    """Counts of renditions and files deleted, and storage reclaimed."""
+
+    def __init__(self):
+        self.examined = 0
+        self.deleted = Counter()
+        self.files = 0
+        self.size = 0
+
+    @property
+    def renditions(self):
+        return sum(self.deleted.values())
+
+
+class RenditionCollector:
+    """Delete renditions that aren't in the live set of images and specs,
+    and rendition files that have no rendition.
+
+    :param chunk_size: number of renditions to examine and delete at a time
+    :param dry_run: if True, report what would be deleted without deleting
+        anything
+    """
+
+    def __init__(self, chunk_size=1000, dry_run=False):
+        self.chunk_size = chunk_size
+        self.dry_run = dry_run
+        self.image_model = get_image_model()
+        self.rendition_model = self.image_model.get_rendition_model()
+        self.storage = self.rendition_model._meta.get_field("file").storage
+        self.stats = CollectionStats()
+        self.specs = None
+        self.image_ids = None
+        self.filters = {}
+
+    def run(self):
+        """Delete unused renditions and files; returns
+        :class:`CollectionStats`."""
+        self.specs = get_live_specs() | ADMIN_SPECS
+        self.image_ids = get_live_image_ids()
+        for chunk in self.iter_chunks():
+            self.collect(chunk)
+        self.collect_files()
+        return self.stats
+
+    def iter_chunks(self):
+        """Chunks of renditions, in id order."""
+        renditions = self.rendition_model.objects.order_by("pk").only(
+            "pk", "image_id", "filter_spec", "focal_point_key", "file"
+        )
+        while True:
+            chunk = list(renditions[: self.chunk_size])
+            if not chunk:
+                return
+            yield chunk
+            renditions = renditions.filter(pk__gt=chunk[-1].pk)
+
+    def get_filter(self, spec):
+        if spec not in self.filters:
+            self.filters[spec] = Filter(spec)
+        return self.filters[spec]
+
+    def orphan_reason(self, rendition, image):
+        """Why a rendition should be deleted, or None to keep it."""
+        if rendition.filter_spec not in self.specs:
+            return RETIRED_SPEC
+        if image.pk not in self.image_ids and rendition.filter_spec not in ADMIN_SPECS:
+            return UNUSED_IMAGE
+        # renditions for previous focal points duplicate the current one
+        if rendition.focal_point_key != self.get_filter(
+            rendition.filter_spec
+        ).get_cache_key(image):
+            return OUTDATED_FOCAL_POINT
+
+    def collect(self, renditions):
+        """Delete the unused renditions in a chunk, with their files."""
+        images = self.image_model.objects.only(
+            "focal_point_x", "focal_point_y", "focal_point_width", "focal_point_height"
+        ).in_bulk({rendition.image_id for rendition in renditions})
+        orphans = []
+        for rendition in renditions:
+            reason = self.orphan_reason(rendition, images[rendition.image_id])
+            if reason:
+                orphans.append(rendition.pk)
+                self.stats.deleted[reason] += 1
+                self.stats.size += self.file_size(rendition.file.name)
+        self.stats.examined += len(renditions)
+        if orphans and not self.dry_run:
+            # files are deleted and cached renditions purged by wagtail's
+            # signal handlers, once the chunk is committed
+            with transaction.atomic():
+                self.rendition_model.objects.filter(pk__in=orphans).delete()
+
+    def collect_files(self):
+        """Delete files in the rendition folder without a rendition."""
+        folder = os.path.dirname(self.rendition_model().get_upload_to("rendition"))
+        try:
+            _, filenames = self.storage.listdir(folder)
+        except FileNotFoundError:
+            return
+        current = set(self.rendition_model.objects.values_list("file", flat=True))
+        cutoff = timezone.now() - FILE_GRACE_PERIOD
+        for filename in filenames:
+            name = os.path.join(folder, filename)
+            if name in current or self.storage.get_modified_time(name) > cutoff:
+                continue
+            self.stats.files += 1
+            self.stats.size += self.file_size(name)
+            if not self.dry_run:
+                self.storage.delete(name)
+
+    def file_size(self, name):
+        try:
+            return self.storage.size(name)
+        except OSError:
+            # already missing
+            return 0
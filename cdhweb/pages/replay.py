@@ -0,0 +1,211 @@
+"""
+Load testing by replaying production access logs.
+
+Parses gunicorn access logs in the format configured in
+``docker/gunicorn.py``::
+
+    %(h)s %(l)s %(u)s %(t)s "%(r)s" %(s)s %(b)s "%(f)s" "%(a)s" "%({X-Forwarded-For}i)s"
+
+keeping anonymous GET requests for the public site, and replays them
+against a server with the same relative timing (optionally sped up) and a
+fixed number of concurrent connections. Latency percentiles, throughput and
+error rate are reported for each route family (pages, search, feeds, iCal,
+documents), so that changes to caching or queries can be checked against
+real traffic before they are deployed.
+
+Run with the ``replay_access_log`` manage command.
+"""
+
+import gzip
+import math
+import re
+import sys
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import requests
+
+# start of a log line; lines may have a prefix (e.g. from docker logs) and
+# application output is interleaved with access log lines
+LOG_LINE_RE = re.compile(
+    r"(?P<host>\S+) (?P<ident>\S+) (?P<user>\S+) \[(?P<time>[^\]]+)\] "
+    r'"(?P<method>[A-Z]+) (?P<path>\S+) [^"]*" (?P<status>\d{3}) '
+)
+LOG_TIME_FORMAT = "%d/%b/%Y:%H:%M:%S %z"
+
+#: paths that aren't part of the public site, or that require login
+EXCLUDED_PATHS = ("/admin/", "/cms/", "/accounts/", "/static/", "/media/", "/_500/")
+
+#: route families, in order of precedence; other paths are "pages"
+ROUTE_FAMILIES = [
+    ("search", re.compile(r"^/(search|opensearch-description)/")),
+    ("ical", re.compile(r"\.ics$")),
+    ("feeds", re.compile(r"^/(updates/(rss|atom)/|sitemap.*\.xml$|events/calendar)")),
+    ("documents", re.compile(r"^/documents/")),
+]
+PAGES = "pages"
+#: name for totals across all families
+ALL = "all"
+
+
+def route_family(path):
+    """Route family for a path: search, ical, feeds, documents or pages."""
+    path = path.split("?", 1)[0]
+    for family, regex in ROUTE_FAMILIES:
+        if regex.search(path):
+            return family
+    return PAGES
+
+
+class LogEntry:
+    """A request from the access log."""
+
+    def __init__(self, timestamp, path, status):
+        self.timestamp = timestamp
+        self.path = path
+        self.status = status
+        self.family = route_family(path)
+
+    def __repr__(self):
+        return "<LogEntry %s %s>" % (self.timestamp.isoformat(), self.path)
+
+
+def parse_log(lines):
+    """Generate a :class:`LogEntry` for each anonymous GET request to the
+    public site in access log lines; other lines are skipped."""
+    for line in lines:
+        match = LOG_LINE_RE.search(line)
+        if (
+            not match
+            or match["method"] != "GET"
+            or match["user"] != "-"
+            or not match["path"].startswith("/")
+            or match["path"].startswith(EXCLUDED_PATHS)
+        ):
+            continue
+        try:
+            logged = datetime.strptime(match["time"], LOG_TIME_FORMAT)
+        except ValueError:
+            continue
+        yield LogEntry(logged, match["path"], int(match["status"]))
+
+
+def open_log(filename):
+    """Open an access log for reading; ``-`` is standard input, and
+    gzipped logs (``.gz``) are decompressed."""
+    if filename == "-":
+        return sys.stdin
+    if filename.endswith(".gz"):
+        return gzip.open(filename, "rt", errors="replace")
+    return open(filename, errors="replace")
+
+
+class ReplayResult:
+    """Outcome of a replayed request; ``status`` is None if the request
+    failed (e.g. timed out or could not connect)."""
+
+    def __init__(self, entry, status, ms):
+        self.entry = entry
+        self.status = status
+        self.ms = ms
+
+    @property
+    def error(self):
+        return self.status is None or self.status >= 500
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a sorted list of values."""
+    if not values:
+        return None
+    rank = math.ceil(pct / 100 * len(values))
+    return values[max(rank, 1) - 1]
+
+
+def summarize(results, elapsed):
+    """Latency percentiles (in milliseconds), throughput (requests per
+    second over the whole replay) and error rate for each route family and
+    for all requests."""
+    families = defaultdict(list)
+    for result in results:
+        families[result.entry.family].append(result)
+        families[ALL].append(result)
+    summary = {}
+    for family, family_results in sorted(families.items()):
+        times = sorted(result.ms for result in family_results)
+        errors = sum(result.error for result in family_results)
+        summary[family] = {
+            "count": len(family_results),
+            "p50": percentile(times, 50),
+            "p95": percentile(times, 95),
+            "p99": percentile(times, 99),
+            "throughput": len(family_results) / elapsed if elapsed else None,
+            "errors": errors,
+            "error_rate": errors / len(family_results),
+        }
+    return summary
+
+
+class Replayer:
+    """Replays log entries against a server.
+
+    :param base_url: server to send requests to, e.g. ``http://localhost:8000``
+    :param concurrency: maximum number of requests in progress at once
+    :param speedup: factor to speed up the logged timing by; 0 sends
+        requests as fast as concurrency allows
+    :param host: ``Host`` header to send, e.g. the production hostname
+    :param timeout: request timeout in seconds
+    """
+
+    def __init__(self, base_url, concurrency=4, speedup=1, host=None, timeout=30):
+        self.base_url = base_url.rstrip("/")
+        self.concurrency = concurrency
+        self.speedup = speedup
+        self.headers = {"Host": host} if host else {}
+        self.timeout = timeout
+        self.local = threading.local()
+
+    @property
+    def session(self):
+        # one session (and connection pool) per worker thread
+        if not hasattr(self.local, "session"):
+            self.local.session = requests.Session()
+        return self.local.session
+
+    def send(self, entry):
+        start = time.perf_counter()
+        try:
+            response = self.session.get(
+                # not urljoin, which would treat paths like //x as hosts
+                self.base_url + entry.path,
+                headers=self.headers,
+                timeout=self.timeout,
+                allow_redirects=False,
+            )
+            status = response.status_code
+        except requests.RequestException:
+            status = None
+        return ReplayResult(entry, status, (time.perf_counter() - start) * 1000)
+
+    def replay(self, entries):
+        """Send requests for log entries at their logged times relative to
+        the first entry, divided by the speedup. Returns a list of
+        :class:`ReplayResult` and the elapsed time in seconds."""
+        futures = []
+        start = time.perf_counter()
+        first = None
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            for entry in entries:
+                if first is None:
+                    first = entry.timestamp
+                if self.speedup:
+                    offset = (entry.timestamp - first).total_seconds() / self.speedup
+                    delay = start + offset - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                futures.append(executor.submit(self.send, entry))
+        elapsed = time.perf_counter() - start
+        return [future.result() for future in futures], elapsed
@@ -0,0 +1,199 @@
+"""
+Scheduled invalidation of cached data that depends on the current date.
+
+Some content changes without being edited: positions, project memberships
+and grants become current or past, and site alerts are displayed for a
+window of time. Each of these is described by a
+:class:`TimeBoundary` (a date or datetime field on a model, and what to
+invalidate when a value in that field is reached). Apps register their
+boundaries with the ``register_time_boundaries`` wagtail hook, which should
+return a list of :class:`TimeBoundary` objects.
+
+The ``invalidate_time_boundaries`` manage command finds boundaries crossed
+since it last ran and invalidates the affected cache keys; it can run
+once (e.g. from cron) or as a worker that sleeps until the next boundary.
+
+Cached data that depends on a boundary can either use one of its
+``cache_keys``, or include :func:`get_generation` for the boundary in its
+cache key or ETag; the generation changes every time the boundary is
+crossed.
+"""
+
+import datetime
+import logging
+
+from django.apps import apps
+from django.core.cache import cache
+from django.db import models
+from django.utils import timezone
+from wagtail import hooks
+
+logger = logging.getLogger(__name__)
+
+#: cache key for the time the scheduler last ran
+LAST_RUN_CACHE_KEY = "time-boundaries-last-run"
+
+
+class TimeBoundary:
+    """Times when data that depends on the date or time changes, based on
+    the values of a date or datetime field.
+
+    :param name: name of the boundary; boundaries with the same name share a
+        generation (see :func:`get_generation`)
+    :param model: model label, e.g. ``"people.Position"``
+    :param field: name of a date or datetime field on the model
+    :param days_after: if set, the boundary is at the start of the day this
+        many days after the (local) date of the field value, for data that is
+        current by date (e.g. 1 for an end date that is inclusive); if not
+        set, the boundary is the exact datetime value
+    :param cache_keys: cache keys to delete when the boundary is crossed
+    :param callbacks: functions to call when the boundary is crossed
+    """
+
+    def __init__(
+        self, name, model, field, days_after=None, cache_keys=(), callbacks=()
+    ):
+        self.name = name
+        self.model = model
+        self.field = field
+        self.days_after = days_after
+        self.cache_keys = list(cache_keys)
+        self.callbacks = list(callbacks)
+
+    def __repr__(self):
+        return "<TimeBoundary %s: %s.%s>" % (self.name, self.model, self.field)
+
+    def get_queryset(self):
+        return apps.get_model(self.model)._default_manager.all()
+
+    @property
+    def by_date(self):
+        return self.days_after is not None
+
+    def _lookup(self):
+        # field lookup to compare with; compare local dates for datetimes
+        # when the boundary is by date
+        field = apps.get_model(self.model)._meta.get_field(self.field)
+        if self.by_date and isinstance(field, models.DateTimeField):
+            return "%s__date" % self.field
+        return self.field
+
+    def _value_range(self, since, until):
+        # filter for values with boundaries after since and up to until
+        lookup = self._lookup()
+        if self.by_date:
+            offset = datetime.timedelta(days=self.days_after)
+            return {
+                "%s__gt" % lookup: timezone.localdate(since) - offset,
+                "%s__lte" % lookup: timezone.localdate(until) - offset,
+            }
+        return {"%s__gt" % lookup: since, "%s__lte" % lookup: until}
+
+    def crossed(self, since, now):
+        """Check if the boundary was crossed after ``since``, up to ``now``."""
+        return self.get_queryset().filter(**self._value_range(since, now)).exists()
+
+    def next_after(self, now):
+        """The next time this boundary will be crossed after ``now``, or
+        None if there are no future boundaries."""
+        lookup = self._lookup()
+        if self.by_date:
+            today = timezone.localdate(now)
+            after = today - datetime.timedelta(days=self.days_after)
+        else:
+            after = now
+        value = (
+            self.get_queryset()
+            .filter(**{"%s__gt" % lookup: after})
+            .order_by(self.field)
+            .values_list(self.field, flat=True)
+            .first()
+        )
+        if value is None or not self.by_date:
+            return value
+        if isinstance(value, datetime.datetime):
+            value = timezone.localdate(value)
+        # start of the day when the change takes effect
+        return timezone.make_aware(
+            datetime.datetime.combine(
+                value + datetime.timedelta(days=self.days_after), datetime.time()
+            )
+        )
+
+
+def generation_cache_key(name):
+    return "time-boundary-generation-%s" % name
+
+
+def get_generation(name):
+    """Current generation for a named boundary; changes every time the
+    boundary is crossed. Include in cache keys or ETags for data that
+    depends on the boundary."""
+    key = generation_cache_key(name)
+    # start from the current time, so that a generation is never reused
+    # if the cache is cleared
+    cache.add(key, int(timezone.now().timestamp()), None)
+    return cache.get(key)
+
+
+def bump_generation(name):
+    """Advance the generation for a name, e.g. when the content it covers
+    is published, so cached data keyed on the previous generation is no
+    longer used."""
+    key = generation_cache_key(name)
+    cache.set(key, get_generation(name) + 1, None)
+
+
+def get_time_boundaries():
+    """All boundaries registered with the ``register_time_boundaries``
+    hook."""
+    boundaries = []
+    for fn in hooks.get_hooks("register_time_boundaries"):
+        boundaries.extend(fn())
+    return boundaries
+
+
+def invalidate(boundaries):
+    """Invalidate cached data for the specified boundaries: delete their
+    cache keys, advance their generations and run their callbacks (once
+    each, even if shared by several boundaries)."""
+    cache_keys = []
+    callbacks = []
+    names = []
+    for boundary in boundaries:
+        cache_keys.extend(k for k in boundary.cache_keys if k not in cache_keys)
+        callbacks.extend(cb for cb in boundary.callbacks if cb not in callbacks)
+        if boundary.name not in names:
+            names.append(boundary.name)
+
+    cache.delete_many(cache_keys)
+    for name in names:
+        bump_generation(name)
+    for callback in callbacks:
+        try:
+            callback()
+        except Exception:
+            # don't let one failure prevent other invalidation
+            logger.exception("Error invalidating time boundary data")
+
+
+def process_boundaries(now=None):
+    """Invalidate data for all boundaries crossed since the last run, and
+    record the time of this run. If there is no record of a previous run,
+    everything is invalidated. Returns the list of crossed boundaries."""
+    now = now or timezone.now()
+    since = cache.get(LAST_RUN_CACHE_KEY)
+    boundaries = get_time_boundaries()
+    if since is not None:
+        boundaries = [b for b in boundaries if b.crossed(since, now)]
+    invalidate(boundaries)
+    cache.set(LAST_RUN_CACHE_KEY, now, None)
+    return boundaries
+
+
+def next_boundary(now=None):
+    """The next time any registered boundary will be crossed, or None."""
+    now = now or timezone.now()
+    times = [b.next_after(now) for b in get_time_boundaries()]
+    times = [t for t in times if t is not None]
+    return min(times) if times else None
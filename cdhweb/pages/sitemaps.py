@@ -0,0 +1,217 @@
+"""
+Segmented sitemaps, prebuilt as static XML files.
+
+The site is split into one sitemap per section (general pages, projects,
+people, events and updates). Rather than walking the page tree on every
+request, the XML for each section is rendered ahead of time and written to
+storage; when a page is published, unpublished, moved or deleted only the
+sitemaps for the sections it and any live pages below it belong to (and
+the sitemap index) are regenerated, since the urls of pages below a page
+change with its slug or parent.
+
+Use the ``build_sitemaps`` manage command to (re)generate all sections.
+"""
+
+import logging
+import threading
+
+from django.apps import apps
+from django.contrib.contenttypes.models import ContentType
+from django.contrib.sitemaps.views import SitemapIndexItem
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Max
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+from django.template.loader import render_to_string
+from django.urls import reverse
+from wagtail.contrib.sitemaps import Sitemap
+from wagtail.models import Page
+from wagtail.signals import page_published, page_unpublished, post_page_move
+
+from cdhweb.pages.utils import absolutize_url
+
+logger = logging.getLogger(__name__)
+
+#: storage directory for generated sitemap files
+SITEMAP_DIR = "sitemaps"
+
+# sections waiting to be regenerated when a transaction is committed, for
+# each thread; left over sections from a rolled back transaction are only
+# regenerated unnecessarily
+pending = threading.local()
+
+
+class SectionSitemap(Sitemap):
+    """Wagtail :class:`~wagtail.contrib.sitemaps.Sitemap` restricted to
+    the page types that make up one section of the site."""
+
+    #: page models included in this section, as ``app_label.ModelName``
+    page_types = []
+
+    @classmethod
+    def get_page_models(cls):
+        return [apps.get_model(label) for label in cls.page_types]
+
+    def filter_pages(self, pages):
+        return pages.type(*self.get_page_models())
+
+    def items(self):
+        return self.filter_pages(super().items())
+
+
+class ProjectsSitemap(SectionSitemap):
+    page_types = ["projects.Project"]
+
+
+class PeopleSitemap(SectionSitemap):
+    page_types = ["people.Profile"]
+
+
+class EventsSitemap(SectionSitemap):
+    page_types = ["events.Event"]
+
+
+class UpdatesSitemap(SectionSitemap):
+    page_types = ["blog.BlogPost"]
+
+
+class PagesSitemap(SectionSitemap):
+    """Sitemap for everything not covered by one of the other sections."""
+
+    def filter_pages(self, pages):
+        excluded = []
+        for sitemap in SITEMAPS.values():
+            if sitemap is not PagesSitemap:
+                excluded.extend(sitemap.get_page_models())
+        return pages.not_type(*excluded)
+
+
+#: sitemap classes for each section of the site, keyed on section name
+SITEMAPS = {
+    "pages": PagesSitemap,
+    "projects": ProjectsSitemap,
+    "people": PeopleSitemap,
+    "events": EventsSitemap,
+    "updates": UpdatesSitemap,
+}
+
+
+def sitemap_filename(section=None):
+    """Storage path for the sitemap for a section, or for the sitemap
+    index if no section is specified."""
+    if section is None:
+        return "%s/sitemap.xml" % SITEMAP_DIR
+    return "%s/sitemap-%s.xml" % (SITEMAP_DIR, section)
+
+
+def section_for_model(model):
+    """Determine which sitemap section a page model belongs to."""
+    for section, sitemap in SITEMAPS.items():
+        if model is not None and issubclass(model, tuple(sitemap.get_page_models())):
+            return section
+    return "pages"
+
+
+def section_for_page(page):
+    """Determine which sitemap section a page belongs to."""
+    return section_for_model(page.specific_class)
+
+
+def sections_for_tree(page):
+    """Sitemap sections for a page and the live pages below it."""
+    sections = {section_for_page(page)}
+    content_types = (
+        Page.objects.descendant_of(page)
+        .live()
+        .order_by()
+        .values_list("content_type", flat=True)
+        .distinct()
+    )
+    for content_type in content_types:
+        model = ContentType.objects.get_for_id(content_type).model_class()
+        sections.add(section_for_model(model))
+    return sections
+
+
+def _save(filename, content):
+    # storage backends won't overwrite an existing file, so remove first
+    if default_storage.exists(filename):
+        default_storage.delete(filename)
+    default_storage.save(filename, ContentFile(content.encode("utf-8")))
+
+
+def write_sitemap(section):
+    """Render the sitemap for one section and save it to storage."""
+    sitemap = SITEMAPS[section]()
+    # sections are well under the 50,000 url limit for a single sitemap
+    # file, so only the first page is needed
+    xml = render_to_string("sitemap.xml", {"urlset": sitemap.get_urls()})
+    _save(sitemap_filename(section), xml)
+
+
+def write_sitemap_index():
+    """Render the sitemap index, with last modification dates for each
+    section, and save it to storage."""
+    items = []
+    for section, sitemap in SITEMAPS.items():
+        last_mod = sitemap().items().aggregate(last_mod=Max("last_published_at"))
+        location = absolutize_url(
+            reverse(
+                "django.contrib.sitemaps.views.sitemap", kwargs={"section": section}
+            )
+        )
+        items.append(SitemapIndexItem(location, last_mod["last_mod"]))
+    xml = render_to_string("sitemap_index.xml", {"sitemaps": items})
+    _save(sitemap_filename(), xml)
+
+
+def write_sitemaps(sections=None):
+    """Regenerate the sitemaps for the specified sections (or all sections,
+    if none are specified) and the sitemap index."""
+    for section in sections or SITEMAPS.keys():
+        write_sitemap(section)
+    write_sitemap_index()
+
+
+def regenerate_on_commit(sections):
+    """Regenerate the sitemaps for a set of sections once the transaction
+    has been committed. Sections queued in the same transaction (e.g. for
+    every page in a deleted tree) are regenerated together, once each."""
+    if getattr(pending, "sections", None) is None:
+        pending.sections = set()
+    pending.sections.update(sections)
+    transaction.on_commit(regenerate_pending)
+
+
+def regenerate_pending():
+    """Regenerate the sitemaps for sections queued by
+    :func:`regenerate_on_commit`; the first callback to run for a
+    transaction regenerates all of them, and later ones do nothing."""
+    sections = [section for section in SITEMAPS if section in pending.sections]
+    pending.sections = set()
+    if not sections:
+        return
+    try:
+        write_sitemaps(sections)
+    except Exception:
+        # never let a sitemap failure block publishing
+        logger.exception("Error regenerating %s sitemaps", ", ".join(sections))
+
+
+@receiver(page_published)
+@receiver(page_unpublished)
+@receiver(post_page_move)
+def update_sitemap(sender, instance, **kwargs):
+    """Regenerate the sitemaps for the sections of a page and the live
+    pages below it when it is published, unpublished or moved."""
+    regenerate_on_commit(sections_for_tree(instance))
+
+
+@receiver(post_delete, sender=Page)
+def update_sitemap_on_delete(sender, instance, **kwargs):
+    """Regenerate the sitemap for the section of a live page when it is
+    deleted; pages below it are deleted (and handled) separately."""
+    if instance.live:
+        regenerate_on_commit({section_for_page(instance)})
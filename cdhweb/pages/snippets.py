@@ -1,5 +1,9 @@
+from django.core.cache import cache
 from django.core.exceptions import ValidationError
 from django.db import models
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
 from modelcluster.fields import ParentalKey
 from modelcluster.models import ClusterableModel
 from wagtail import blocks
@@ -367,3 +371,29 @@ class SiteAlert(models.Model):
     @property
     def alert_id(self):
         return f"alert_{self.id}"
+
+    #: cache key for the list of alerts currently displayed
+    cache_key = "site-alerts"
+    #: fallback cache timeout, in case scheduled invalidation isn't running
+    cache_timeout = 60 * 60
+
+    @classmethod
+    def get_current_alerts(cls):
+        """Alerts that should currently be displayed. Cached; invalidated
+        when alerts are edited and when display windows start or end
+        (see :mod:`cdhweb.pages.schedule`)."""
+        alerts = cache.get(cls.cache_key)
+        if alerts is None:
+            now = timezone.now()
+            alerts = list(
+                cls.objects.exclude(display_from__gt=now).exclude(display_until__lt=now)
+            )
+            cache.set(cls.cache_key, alerts, cls.cache_timeout)
+        return alerts
+
+
+@receiver(post_save, sender=SiteAlert)
+@receiver(post_delete, sender=SiteAlert)
+def clear_site_alerts(sender, **kwargs):
+    """Handler to clear cached site alerts when an alert is edited."""
+    cache.delete(SiteAlert.cache_key)
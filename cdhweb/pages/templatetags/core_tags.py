@@ -1,7 +1,6 @@
 from django import template
 from django.conf import settings
 from django.template.loader import render_to_string
-from django.utils import timezone
 
 from cdhweb.pages.snippets import (
     Footer,
@@ -194,12 +193,7 @@ def secondary_navigation():
 
 @register.inclusion_tag("includes/site_alert.html", takes_context=True)
 def site_alerts(context):
-    now = timezone.now()
-    site_alerts = (
-        SiteAlert.objects.all()
-        .exclude(display_from__gt=now)
-        .exclude(display_until__lt=now)
-    )
+    site_alerts = SiteAlert.get_current_alerts()
     data = {"site_alerts": site_alerts, "request": context.get("request")}
     return data
 
@@ -1,7 +1,11 @@
 import json
+import threading
+import time
 from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from operator import attrgetter
 from unittest.mock import Mock
+from urllib.parse import parse_qs, urlparse
 
 import pytest
 from django.utils import timezone
@@ -166,3 +170,76 @@ def lmod_list_view(lmod_objects):
     view = MyLastModifiedListView()
     view.get_queryset = Mock(return_value=MyModelQuerySet(lmod_objects))
     return view
+
+
+class StubEmbedHandler(BaseHTTPRequestHandler):
+    """Stub embed provider: an oEmbed endpoint at ``/oembed`` and a glitch
+    app at any other path. Urls containing ``slow`` respond after a second,
+    urls containing ``missing`` are not found, and urls containing
+    ``invalid`` have an invalid ``embed.json``."""
+
+    app_html = (
+        '<html><head><link rel="stylesheet" href="style.css"/></head>'
+        '<body><script src="app.js"></script></body></html>'
+    )
+
+    def do_GET(self):
+        self.server.paths.append(self.path)
+        if "slow" in self.path:
+            time.sleep(1)
+        url = urlparse(self.path)
+        if "missing" in self.path:
+            self.respond(404, "text/plain", "not found")
+        elif url.path == "/oembed":
+            embed_url = parse_qs(url.query)["url"][0]
+            oembed = {
+                "type": "video",
+                "title": "Video at %s" % embed_url,
+                "html": '<iframe src="%s"></iframe>' % embed_url,
+                "width": "640",
+                "height": 360,
+                "cache_age": 60,
+            }
+            self.respond(200, "application/json", json.dumps(oembed))
+        elif url.path.endswith("/embed.json"):
+            content = "invalid" if "invalid" in self.path else '{"title": "App"}'
+            self.respond(200, "application/json", content)
+        else:
+            self.respond(200, "text/html", self.app_html)
+
+    def respond(self, status, content_type, content):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content.encode())
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def embed_server(settings):
+    """Stub embed provider on a local port, configured as the oEmbed
+    provider for urls starting with ``http://video.example.com/``; the
+    server's ``url`` is its base url, and ``paths`` the paths requested."""
+    server = ThreadingHTTPServer(("localhost", 0), StubEmbedHandler)
+    server.url = "http://localhost:%d" % server.server_address[1]
+    server.paths = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    settings.WAGTAILEMBEDS_FINDERS = [
+        {
+            "class": "cdhweb.pages.embed_finders.OEmbedFinder",
+            "providers": [
+                {
+                    "endpoint": "%s/oembed" % server.url,
+                    "urls": [r"^http://video\.example\.com/"],
+                }
+            ],
+        },
+        {"class": "cdhweb.pages.embed_finders.GlitchHubEmbedFinder"},
+    ]
+    yield server
+    server.shutdown()
+    server.server_close()
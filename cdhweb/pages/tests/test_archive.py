@@ -0,0 +1,102 @@
+from datetime import date
+
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from cdhweb.blog.models import month_index
+from cdhweb.events.models import EventsLandingPage, get_semester, semester_index
+
+
+def test_get_semester():
+    assert get_semester(date(2020, 1, 1)) == "Spring"
+    assert get_semester(date(2020, 5, 31)) == "Spring"
+    assert get_semester(date(2020, 6, 1)) == "Summer"
+    assert get_semester(date(2020, 12, 31)) == "Fall"
+
+
+class TestEventSemesterIndex:
+    def test_periods(self, events):
+        assert semester_index.periods() == [
+            ((2017, 0, "Spring"), 1),
+            ((2018, 0, "Spring"), 1),
+            ((2019, 2, "Fall"), 1),
+            ((2099, 0, "Spring"), 1),
+        ]
+
+    def test_cached(self, events):
+        semester_index.periods()
+        with CaptureQueriesContext(connection) as queries:
+            semester_index.periods()
+        assert not queries
+        assert cache.get(semester_index.get_cache_key())
+
+    def test_publish(self, events, upcoming_event, django_capture_on_commit_callbacks):
+        semester_index.periods()
+        workshop = events["workshop"]
+        # moving an event to a different semester updates both counts
+        workshop.start_time = upcoming_event.start_time
+        key = semester_index.get_cache_key()
+        with django_capture_on_commit_callbacks(execute=True):
+            workshop.save_revision().publish()
+            # an index stored before the change is committed, e.g. by a
+            # concurrent request, is not used afterwards
+            semester_index.periods()
+            assert semester_index.get_cache_key() == key
+        assert semester_index.get_cache_key() != key
+        assert cache.get(semester_index.get_cache_key()) is None
+        periods = dict(semester_index.periods())
+        assert (2019, 2, "Fall") not in periods
+        assert periods[(2080, 0, "Spring")] == 2
+        # cached index matches one calculated from the database
+        assert semester_index.build() == cache.get(semester_index.get_cache_key())
+
+    def test_unpublish(self, events, django_capture_on_commit_callbacks):
+        semester_index.periods()
+        with django_capture_on_commit_callbacks(execute=True):
+            events["course"].unpublish()
+        assert (2017, 0, "Spring") not in dict(semester_index.periods())
+
+    def test_delete(self, events, django_capture_on_commit_callbacks):
+        semester_index.periods()
+        with django_capture_on_commit_callbacks(execute=True):
+            events["lecture"].delete()
+        assert (2018, 0, "Spring") not in dict(semester_index.periods())
+
+    def test_date_list(self, events):
+        assert EventsLandingPage().get_semester_date_list()[-1] == ("Spring", 2099, 1)
+
+
+class TestBlogMonthIndex:
+    def test_periods(self, blog_posts):
+        # most recent first
+        assert month_index.periods() == [
+            (date(2020, 11, 1), 1),
+            (date(2019, 3, 1), 1),
+            (date(2018, 5, 1), 1),
+        ]
+
+    def test_publish_unpublish(self, blog_posts, django_capture_on_commit_callbacks):
+        month_index.periods()
+        with django_capture_on_commit_callbacks(execute=True):
+            blog_posts["article"].unpublish()
+        assert date(2019, 3, 1) not in dict(month_index.periods())
+        # republishing keeps the original publication date
+        with django_capture_on_commit_callbacks(execute=True):
+            blog_posts["article"].save_revision().publish()
+        assert dict(month_index.periods())[date(2019, 3, 1)] == 1
+
+    def test_parent(
+        self, blog_posts, blog_link_page, homepage, django_capture_on_commit_callbacks
+    ):
+        # periods are listed for the children of a page
+        assert month_index.periods(parent=blog_link_page) == month_index.periods()
+        assert month_index.periods(parent=homepage) == []
+        other = blog_link_page.copy(
+            update_attrs={"title": "other", "slug": "other"}, recursive=False
+        )
+        with django_capture_on_commit_callbacks(execute=True):
+            blog_posts["article"].move(other, pos="last-child")
+        assert month_index.periods(parent=other) == [(date(2019, 3, 1), 1)]
+        assert date(2019, 3, 1) not in dict(month_index.periods(parent=blog_link_page))
+        assert len(month_index.periods()) == 3
@@ -0,0 +1,100 @@
+import json
+from unittest.mock import patch
+
+import pytest
+from django.core.management import call_command
+from django.core.management.base import CommandError
+
+from cdhweb.pages.benchmarks import (
+    Benchmark,
+    BenchmarkResult,
+    get_benchmarks,
+    page_benchmark,
+    results_to_json,
+    run_benchmark,
+    run_benchmarks,
+)
+from cdhweb.pages.models import ContentPage
+
+
+def test_page_benchmark(content_page):
+    (benchmark,) = page_benchmark("content", ContentPage.objects.all(), 10, "?q=a")
+    assert benchmark.url == content_page.url + "?q=a"
+    assert benchmark.budget == 10
+    content_page.unpublish()
+    assert page_benchmark("content", ContentPage.objects.all(), 10) == []
+
+
+def test_result():
+    benchmark = Benchmark("home", "/", 10)
+    result = BenchmarkResult(benchmark, 200, 12, 1024, [0.02, 0.01, 0.03])
+    assert result.over_budget
+    assert result.median == 0.02
+    assert result.as_dict() == {
+        "name": "home",
+        "url": "/",
+        "status": 200,
+        "queries": 12,
+        "budget": 10,
+        "bytes": 1024,
+        "cold": False,
+        "time_ms": {"min": 10.0, "median": 20.0, "max": 30.0},
+    }
+    # budgets aren't checked for cold requests
+    assert not BenchmarkResult(benchmark, 200, 12, 1024, [0.01], cold=True).over_budget
+
+
+def test_run_benchmark(homepage):
+    result = run_benchmark(Benchmark("home", homepage.url, 100), repeat=2)
+    assert result.status == 200
+    assert len(result.times) == 2
+    assert 0 < result.queries <= 100
+    assert result.size > 0
+    assert results_to_json([result])["results"] == [result.as_dict()]
+
+
+def test_benchmarks_within_budget(homepage, content_page):
+    call_command("generate_dataset", scale=0.005, images=2, verbosity=0)
+    benchmarks = get_benchmarks()
+    names = [benchmark.name for benchmark in benchmarks]
+    for name in [
+        "home",
+        "content-page",
+        "search",
+        "people-staff",
+        "profile",
+        "projects",
+        "projects-built",
+        "project",
+        "events",
+        "events-semester",
+        "event",
+        "events-ical",
+        "blog",
+        "blog-post",
+        "blog-rss",
+    ]:
+        assert name in names
+    for result in run_benchmarks(benchmarks, repeat=1):
+        assert result.status == 200, result.benchmark
+        assert not result.over_budget, result.as_dict()
+
+
+def test_run_benchmarks_command(homepage, content_page, tmp_path, capsys):
+    output = tmp_path / "results.json"
+    call_command("run_benchmarks", "home", repeat=1, output=str(output))
+    results = json.loads(output.read_text())["results"]
+    assert [result["name"] for result in results] == ["home"]
+    assert "home" in capsys.readouterr().out
+
+    # compare with previous results
+    call_command("run_benchmarks", "home", repeat=1, compare=str(output))
+    assert "queries)" in capsys.readouterr().out
+
+    # fails when over budget
+    with patch(
+        "cdhweb.pages.management.commands.run_benchmarks.get_benchmarks",
+        return_value=[Benchmark("home", homepage.url, 0)],
+    ):
+        with pytest.raises(CommandError, match="Failed benchmarks: home"):
+            call_command("run_benchmarks", repeat=1)
@@ -0,0 +1,55 @@
+from unittest.mock import patch
+
+from django.core.management import call_command
+from wagtail.models import Page
+
+from cdhweb.blog.models import BlogPost
+from cdhweb.events.models import Event
+from cdhweb.pages.management.commands.generate_dataset import SLUG_PREFIX
+from cdhweb.people.models import Person, PersonCategory, Profile
+from cdhweb.projects.models import Membership, Project
+
+
+def generated_slugs(model):
+    return list(
+        model.objects.filter(slug__startswith=SLUG_PREFIX)
+        .order_by("slug")
+        .values_list("slug", "title")
+    )
+
+
+def test_generate_dataset(homepage, capsys, django_capture_on_commit_callbacks):
+    call_command("generate_dataset", scale=0.005, images=2)
+    assert "Created 25 people" in capsys.readouterr().out
+    assert Person.objects.count() == 25
+    assert Project.objects.live().count() == 4
+    assert Event.objects.live().count() == 15
+    assert BlogPost.objects.live().count() == 10
+    assert Membership.objects.exists()
+    assert PersonCategory.objects.exists()
+    assert Profile.objects.live().filter(person__isnull=False).exists()
+    assert Page.find_problems() == ([], [], [], [], [])
+    post = BlogPost.objects.first()
+    assert post.body[1].block_type == "image"
+    assert post.url.startswith("/updates/%d/" % post.first_published_at.year)
+
+    # re-running with the same seed replaces the data with the same content
+    titles = generated_slugs(Event)
+    # as if committed, so that refreshes queued on save have run
+    with django_capture_on_commit_callbacks(execute=True):
+        call_command("generate_dataset", scale=0.005, images=2)
+    assert Person.objects.count() == 25
+    assert generated_slugs(Event) == titles
+    assert Page.find_problems() == ([], [], [], [], [])
+
+    # people categories are refreshed once, without marking them changed
+    # for every deleted object
+    with patch.object(PersonCategory, "refresh") as refresh, patch(
+        "cdhweb.people.models.bump_generation"
+    ) as bump_generation:
+        with django_capture_on_commit_callbacks(execute=True):
+            call_command("generate_dataset", clear=True)
+    refresh.assert_called_once()
+    bump_generation.assert_not_called()
+    assert not Person.objects.exists()
+    assert not Event.objects.exists()
@@ -0,0 +1,140 @@
+import pytest
+from django.contrib.auth.models import Group
+from django.core.files.base import ContentFile
+from django.utils.http import http_date
+from wagtail.models import Collection, CollectionViewRestriction
+
+from cdhweb.pages.documents import RangeNotSatisfiable, parse_range
+from cdhweb.pages.models import LocalAttachment
+
+CONTENT = b"0123456789" * 10
+
+
+@pytest.fixture
+def document(db, settings, tmp_path):
+    settings.MEDIA_ROOT = tmp_path
+    document = LocalAttachment(title="Report")
+    document.file.save("report.pdf", ContentFile(CONTENT), save=False)
+    document._set_file_hash()
+    document.save()
+    return document
+
+
+@pytest.mark.parametrize(
+    "header,expected",
+    [
+        (None, None),
+        ("bytes=0-9", (0, 9)),
+        ("bytes=90-", (90, 99)),
+        ("bytes=95-200", (95, 99)),
+        ("bytes=-5", (95, 99)),
+        ("bytes=-500", (0, 99)),
+        # multiple, invalid or other unit ranges are ignored
+        ("bytes=0-1,5-6", None),
+        ("bytes=9-1", None),
+        ("items=0-1", None),
+        ("bytes=-", None),
+    ],
+)
+def test_parse_range(header, expected):
+    assert parse_range(header, 100) == expected
+
+
+@pytest.mark.parametrize("header", ["bytes=100-", "bytes=-0"])
+def test_parse_range_not_satisfiable(header):
+    with pytest.raises(RangeNotSatisfiable):
+        parse_range(header, 100)
+
+
+class TestDocumentServeView:
+    def test_serve(self, client, document):
+        response = client.get(document.url)
+        assert response.status_code == 200
+        assert b"".join(response.streaming_content) == CONTENT
+        assert response["Content-Type"] == "application/pdf"
+        assert response["Content-Disposition"] == document.content_disposition
+        assert response["Content-Length"] == "100"
+        assert response["Accept-Ranges"] == "bytes"
+        assert response["ETag"] == '"%s"' % document.file_hash
+        assert response["Cache-Control"] == "public, max-age=2592000"
+
+    def test_wrong_filename(self, client, document):
+        response = client.get("/documents/%d/other.pdf" % document.pk)
+        assert response.status_code == 404
+
+    def test_range(self, client, document):
+        response = client.get(document.url, HTTP_RANGE="bytes=10-19")
+        assert response.status_code == 206
+        assert b"".join(response.streaming_content) == CONTENT[10:20]
+        assert response["Content-Range"] == "bytes 10-19/100"
+        assert response["Content-Length"] == "10"
+        assert response["Content-Type"] == "application/pdf"
+
+    def test_range_not_satisfiable(self, client, document):
+        response = client.get(document.url, HTTP_RANGE="bytes=200-")
+        assert response.status_code == 416
+        assert response["Content-Range"] == "bytes */100"
+
+    def test_if_range(self, client, document):
+        etag = '"%s"' % document.file_hash
+        response = client.get(document.url, HTTP_RANGE="bytes=0-4", HTTP_IF_RANGE=etag)
+        assert response.status_code == 206
+        # a different version of the file is served in full
+        response = client.get(
+            document.url, HTTP_RANGE="bytes=0-4", HTTP_IF_RANGE='"old"'
+        )
+        assert response.status_code == 200
+        response = client.get(
+            document.url, HTTP_RANGE="bytes=0-4", HTTP_IF_RANGE=http_date(0)
+        )
+        assert response.status_code == 200
+
+    def test_conditional(self, client, document):
+        response = client.get(document.url)
+        response = client.get(document.url, HTTP_IF_NONE_MATCH=response["ETag"])
+        assert response.status_code == 304
+        assert response["Cache-Control"] == "public, max-age=2592000"
+        last_modified = client.get(document.url)["Last-Modified"]
+        response = client.get(document.url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        assert response.status_code == 304
+
+    def test_x_accel_redirect(self, client, document, settings):
+        settings.SENDFILE_HEADER = "X-Accel-Redirect"
+        response = client.get(document.url)
+        assert response.status_code == 200
+        assert response["X-Accel-Redirect"] == "/protected-media/%s" % (
+            document.file.name
+        )
+        assert response.content == b""
+        assert response["Content-Type"] == "application/pdf"
+        assert response["Content-Disposition"] == document.content_disposition
+        settings.SENDFILE_URL = "/internal/"
+        response = client.get(document.url)
+        assert response["X-Accel-Redirect"] == "/internal/%s" % document.file.name
+
+    def test_x_sendfile(self, client, document, settings):
+        settings.SENDFILE_HEADER = "X-Sendfile"
+        response = client.get(document.url)
+        assert response["X-Sendfile"] == document.file.path
+        assert response.content == b""
+
+    def test_restricted(self, client, document, django_user_model):
+        collection = Collection.get_first_root_node().add_child(name="Private")
+        restriction = CollectionViewRestriction.objects.create(
+            collection=collection,
+            restriction_type=CollectionViewRestriction.GROUPS,
+        )
+        group = Group.objects.create(name="Staff")
+        restriction.groups.add(group)
+        document.collection = collection
+        document.save()
+
+        # access is checked before serving
+        response = client.get(document.url)
+        assert response.status_code == 302
+        user = django_user_model.objects.create_user("staff")
+        user.groups.add(group)
+        client.force_login(user)
+        response = client.get(document.url)
+        assert response.status_code == 200
+        assert response["Cache-Control"] == "private, no-cache"
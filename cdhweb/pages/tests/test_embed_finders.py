@@ -1,11 +1,50 @@
-from json import JSONDecodeError
-from unittest.mock import Mock, patch
-
 import pytest
-import requests
-from wagtail.embeds.exceptions import EmbedException
+from wagtail.embeds.exceptions import EmbedException, EmbedNotFoundException
+
+from cdhweb.pages import embed_finders
+from cdhweb.pages.embed_finders import GlitchHubEmbedFinder, OEmbedFinder
+
+
+@pytest.fixture
+def short_timeout(monkeypatch):
+    monkeypatch.setattr(embed_finders, "TIMEOUT", 0.2)
+
+
+def test_get_session():
+    # a single session is shared, to reuse connections
+    assert embed_finders.get_session() is embed_finders.get_session()
+
 
-from cdhweb.pages.embed_finders import GlitchHubEmbedFinder
+class TestOEmbedFinder:
+    def get_finder(self, embed_server):
+        return OEmbedFinder(
+            providers=[
+                {
+                    "endpoint": "%s/oembed" % embed_server.url,
+                    "urls": [r"^http://video\.example\.com/"],
+                }
+            ]
+        )
+
+    def test_find_embed(self, embed_server):
+        finder = self.get_finder(embed_server)
+        assert finder.accept("http://video.example.com/1")
+        embed = finder.find_embed("http://video.example.com/1", max_width=400)
+        assert embed["type"] == "video"
+        assert embed["html"] == '<iframe src="http://video.example.com/1"></iframe>'
+        assert embed["width"] == "640"
+        # stored embeds don't expire
+        assert "cache_until" not in embed
+        (path,) = embed_server.paths
+        assert "maxwidth=400" in path
+
+    def test_not_found(self, embed_server):
+        with pytest.raises(EmbedNotFoundException):
+            self.get_finder(embed_server).find_embed("http://video.example.com/missing")
+
+    def test_timeout(self, embed_server, short_timeout):
+        with pytest.raises(EmbedNotFoundException):
+            self.get_finder(embed_server).find_embed("http://video.example.com/slow")
 
 
 class TestGlitchHubEmbedFinder:
@@ -14,52 +53,27 @@ class TestGlitchHubEmbedFinder:
         assert GlitchHubEmbedFinder().accept("https://princeton-cdh.github.io/app/")
         assert not GlitchHubEmbedFinder().accept("youtube.com/foo")
 
-    test_html = """<html>
-    <head>
-        <link rel="stylesheet" type="text/css" href="mystyles.css"/>
-    </head>
-    <body>
-        <script src="myscript.js"></script>
-    </body>
-    </html>
-    """
-
-    @patch("cdhweb.pages.embed_finders.requests")
-    def test_find_embed(self, mockrequests):
-        # patch in actual request status codes
-        mockrequests.codes = requests.codes
+    def test_find_embed(self, embed_server):
         glitcher = GlitchHubEmbedFinder()
+        url = "%s/app/" % embed_server.url
+        embed_info = glitcher.find_embed(url)
+        assert sorted(embed_server.paths) == ["/app/", "/app/embed.json"]
+        # embed info from json
+        assert embed_info["title"] == "App"
+        # html from response content
+        assert embed_info["html"].startswith("<html>")
+        # relative links made absolute
+        assert 'href="%sstyle.css"' % url in embed_info["html"]
+        assert 'src="%sapp.js"' % url in embed_info["html"]
 
+    def test_errors(self, embed_server, short_timeout):
+        glitcher = GlitchHubEmbedFinder()
         # embed response fails
-        mockrequests.get.return_value.status_code = 404
         with pytest.raises(EmbedException):
-            glitcher.find_embed("http://test.glitch.me")
-        mockrequests.get.assert_called_with("http://test.glitch.me/embed.json")
-
-        # json request succeeeds but main url does not
-        mockrequests.get.side_effect = (Mock(status_code=200), Mock(status_code=500))
-        with pytest.raises(EmbedException):
-            glitcher.find_embed("http://test.glitch.me")
-        mockrequests.get.side_effect = None
-
+            glitcher.find_embed("%s/missing/" % embed_server.url)
         # json decode error
         with pytest.raises(EmbedException):
-            mockrequests.get.return_value.json.side_effect = JSONDecodeError
-            glitcher.find_embed("http://test.glitch.me")
-
-        mockrequests.get.return_value.json.side_effect = None
-
-        mockrequests.get.return_value.status_code = 200
-        mock_embed = {"title": "test glitch", "author_name": "me"}
-        mockrequests.get.return_value.json.return_value = mock_embed
-        mockrequests.get.return_value.content = self.test_html
-        embed_info = glitcher.find_embed("http://test.glitch.me")
-        mockrequests.get.assert_called_with("http://test.glitch.me")
-        # embed info from json
-        assert embed_info["title"] == mock_embed["title"]
-        assert embed_info["author_name"] == mock_embed["author_name"]
-        # html from response content
-        assert embed_info["html"].startswith("<html>")
-        # relative links made absolute
-        assert 'href="http://test.glitch.me/mystyles.css' in embed_info["html"]
-        assert 'src="http://test.glitch.me/myscript.js' in embed_info["html"]
+            glitcher.find_embed("%s/invalid/" % embed_server.url)
+        # timed out
+        with pytest.raises(EmbedException):
+            glitcher.find_embed("%s/slow/" % embed_server.url)
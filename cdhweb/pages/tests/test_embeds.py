@@ -0,0 +1,125 @@
+import json
+import time
+from datetime import timedelta
+
+from django.core.management import call_command
+from django.test import RequestFactory
+from django.utils import timezone
+from wagtail.embeds.blocks import EmbedValue
+from wagtail.embeds.embeds import get_embed, get_embed_hash
+from wagtail.embeds.models import Embed
+from wagtail.test.utils.form_data import nested_form_data, streamfield
+
+from cdhweb.pages import embeds
+from cdhweb.pages.models import ContentPage
+from cdhweb.pages.wagtail_hooks import prefetch_edited_page_embeds
+
+VIDEO_URL = "http://video.example.com/1"
+HOSTED_VIDEO_URL = "http://video.example.com/2"
+
+
+def add_embeds(page):
+    page.body = json.dumps(
+        [
+            {"type": "embed", "value": VIDEO_URL},
+            {
+                "type": "cdh_hosted_video",
+                "value": {
+                    "video_url": HOSTED_VIDEO_URL,
+                    "accessibility_description": "a video",
+                },
+            },
+        ]
+    )
+    page.save_revision().publish()
+
+
+def test_page_embed_values(content_page):
+    add_embeds(content_page)
+    page = ContentPage.objects.get(pk=content_page.pk)
+    urls = [value.url for value in embeds.page_embed_values(page)]
+    assert urls == [VIDEO_URL, HOSTED_VIDEO_URL]
+
+
+def test_form_embed_values():
+    data = nested_form_data({"body": streamfield([("embed", VIDEO_URL)])})
+    values = list(embeds.form_embed_values(ContentPage, data, {}))
+    assert [value.url for value in values] == [VIDEO_URL]
+
+
+class TestPrefetchEmbeds:
+    def test_prefetch(self, db, embed_server):
+        values = [EmbedValue(VIDEO_URL), EmbedValue(HOSTED_VIDEO_URL)]
+        assert embeds.prefetch_embeds(values) == 2
+        embed = Embed.objects.get(hash=get_embed_hash(VIDEO_URL))
+        assert embed.title == "Video at %s" % VIDEO_URL
+        assert embed.width == 640
+        assert embed.cache_until is None
+        assert len(embed_server.paths) == 2
+
+        # stored embeds are used by wagtail and not fetched again
+        assert get_embed(VIDEO_URL) == embed
+        assert embeds.prefetch_embeds(values) == 0
+        assert len(embed_server.paths) == 2
+
+    def test_concurrent(self, db, embed_server):
+        values = [EmbedValue("http://video.example.com/slow/%d" % i) for i in range(3)]
+        start = time.perf_counter()
+        assert embeds.prefetch_embeds(values) == 3
+        # each request takes a second
+        assert time.perf_counter() - start < 2
+
+    def test_timeout(self, db, embed_server):
+        values = [
+            EmbedValue(VIDEO_URL),
+            EmbedValue("http://video.example.com/slow"),
+        ]
+        start = time.perf_counter()
+        assert embeds.prefetch_embeds(values, timeout=0.5) == 1
+        assert time.perf_counter() - start < 1
+        assert Embed.objects.get().url == VIDEO_URL
+
+    def test_failure(self, db, embed_server, caplog):
+        values = [EmbedValue("http://video.example.com/missing")]
+        assert embeds.prefetch_embeds(values) == 0
+        assert not Embed.objects.exists()
+        assert "Failed to fetch embed" in caplog.text
+
+    def test_edit_page_hook(self, content_page, embed_server):
+        data = nested_form_data(
+            {"title": "Updated", "body": streamfield([("embed", VIDEO_URL)])}
+        )
+        request = RequestFactory().post("/", data)
+        prefetch_edited_page_embeds(request, content_page)
+        assert Embed.objects.get().url == VIDEO_URL
+
+
+class TestRefreshEmbeds:
+    def make_embed(self, url, days_old):
+        embed = Embed.objects.create(
+            hash=get_embed_hash(url), url=url, type="video", html="stale"
+        )
+        last_updated = timezone.now() - timedelta(days=days_old)
+        Embed.objects.filter(pk=embed.pk).update(last_updated=last_updated)
+        return embed
+
+    def test_command(self, db, embed_server, capsys):
+        old = self.make_embed(VIDEO_URL, 10)
+        recent = self.make_embed(HOSTED_VIDEO_URL, 1)
+        broken = self.make_embed("http://video.example.com/missing", 10)
+        call_command("refresh_embeds", max_age=7)
+        assert "Refreshed 1 of 2 embeds" in capsys.readouterr().out
+        old.refresh_from_db()
+        assert old.html == '<iframe src="%s"></iframe>' % VIDEO_URL
+        # not old enough to refresh
+        recent.refresh_from_db()
+        assert recent.html == "stale"
+        # failed embeds are kept
+        broken.refresh_from_db()
+        assert broken.html == "stale"
+
+    def test_command_pages(self, content_page, embed_server, capsys):
+        add_embeds(content_page)
+        call_command("refresh_embeds", pages=True)
+        assert "Fetched 2 new embeds" in capsys.readouterr().out
+        assert Embed.objects.count() == 2
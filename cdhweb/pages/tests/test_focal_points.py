@@ -0,0 +1,146 @@
+from io import BytesIO
+
+import pytest
+from django.core.cache import cache
+from django.core.files.images import ImageFile
+from django.core.management import call_command
+from PIL import Image as PILImage
+from PIL import ImageDraw
+from wagtail.images.models import Image
+from wagtail_factories import ImageFactory
+
+from cdhweb.pages import focal_points
+from cdhweb.pages.focal_points import (
+    detect_focal_points,
+    get_images,
+    get_last_image,
+    process_new_images,
+    save_focal_point,
+    set_last_image,
+    suggest_focal_point,
+)
+
+
+def image_data(size=(2000, 1500), box=(800, 600, 1200, 900)):
+    """PNG data for a white image with a black rectangle, which has
+    features (its corners) but no faces."""
+    image = PILImage.new("RGB", size, "white")
+    if box:
+        ImageDraw.Draw(image).rectangle(box, fill="black")
+    data = BytesIO()
+    image.save(data, "PNG")
+    return data.getvalue()
+
+
+def make_image(**kwargs):
+    return ImageFactory(file=ImageFile(BytesIO(image_data(**kwargs)), name="test.png"))
+
+
+class TestSuggestFocalPoint:
+    def test_features(self):
+        pk, rect = suggest_focal_point(1, image_data())
+        assert pk == 1
+        # around the rectangle, in the coordinates of the original image
+        assert rect.centroid_x == pytest.approx(1000, abs=10)
+        assert rect.centroid_y == pytest.approx(750, abs=10)
+        assert rect.width == pytest.approx(400 * 1.2, abs=20)
+        assert rect.height == pytest.approx(300 * 1.2, abs=20)
+
+    def test_downscaled(self, monkeypatch):
+        # detection runs on a smaller copy of the image
+        sizes = []
+        pillow_image = focal_points.PillowImage
+
+        def record_size(image):
+            sizes.append(image.size)
+            return pillow_image(image)
+
+        monkeypatch.setattr(focal_points, "PillowImage", record_size)
+        suggest_focal_point(1, image_data())
+        assert sizes == [(800, 600)]
+
+    def test_minimum_size(self):
+        _, rect = suggest_focal_point(1, image_data(box=(990, 740, 1010, 760)))
+        assert rect.width == rect.height == 100
+
+    def test_nothing_detected(self):
+        assert suggest_focal_point(1, image_data(box=None)) == (1, None)
+
+    def test_invalid(self, caplog):
+        assert focal_points.safe_suggest_focal_point(1, b"not an image") == (1, None)
+        assert "Error detecting focal point for image 1" in caplog.text
+
+
+class TestSaveFocalPoint:
+    def test_save(self, db):
+        image = make_image()
+        _, rect = suggest_focal_point(image.pk, image_data())
+        fill = image.get_rendition("fill-100x100")
+        resized = image.get_rendition("max-100x100")
+        assert save_focal_point(image.pk, rect)
+        image.refresh_from_db()
+        assert image.focal_point_x == round(rect.centroid_x)
+        assert image.focal_point_width == round(rect.width)
+        # cropped renditions are regenerated with the new focal point
+        assert list(image.renditions.all()) == [resized]
+        assert image.get_rendition("fill-100x100").focal_point_key != (
+            fill.focal_point_key
+        )
+
+    def test_existing_focal_point(self, db):
+        image = make_image()
+        image.focal_point_x = image.focal_point_y = 10
+        image.focal_point_width = image.focal_point_height = 20
+        image.save()
+        _, rect = suggest_focal_point(image.pk, image_data())
+        assert not save_focal_point(image.pk, rect)
+        image.refresh_from_db()
+        assert image.focal_point_x == 10
+
+
+class TestDetectFocalPoints:
+    @pytest.mark.parametrize("workers", [1, 2])
+    def test_detect(self, db, workers):
+        make_image()
+        make_image(box=None)
+        make_image()
+        assert detect_focal_points(get_images(), workers) == (3, 2)
+        images = Image.objects.order_by("pk")
+        assert [image.has_focal_point() for image in images] == [True, False, True]
+
+    def test_skipped(self, db):
+        # missing files and vector images
+        missing = make_image()
+        svg = make_image()
+        missing.file.delete(save=False)
+        Image.objects.filter(pk=svg.pk).update(file="original_images/test.svg")
+        assert detect_focal_points(get_images()) == (0, 0)
+
+    def test_new_images(self, db):
+        first = make_image()
+        assert process_new_images() == (1, 1)
+        assert get_last_image() == first.pk
+        # images checked before are skipped
+        make_image(box=None)
+        assert process_new_images() == (1, 0)
+        assert process_new_images() == (0, 0)
+        # progress is kept in the database, not the cache
+        cache.clear()
+        assert process_new_images() == (0, 0)
+        make_image()
+        assert process_new_images() == (1, 1)
+
+
+class TestCommand:
+    def test_all(self, db, capsys):
+        make_image()
+        make_image(box=None)
+        set_last_image(Image.objects.last().pk)
+        call_command("detect_focal_points", all=True, workers=1)
+        assert "Saved focal points for 1 of 2 images" in capsys.readouterr().out
+
+    def test_once(self, db, capsys):
+        make_image()
+        call_command("detect_focal_points", once=True, workers=1)
+        assert "Saved focal points for 1 of 1 images" in capsys.readouterr().out
+        assert Image.objects.get().has_focal_point()
@@ -0,0 +1,81 @@
+from datetime import datetime
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils.timezone import get_default_timezone
+
+from cdhweb.blog.models import BlogLandingPage, BlogPost
+from cdhweb.events.models import Event, EventsLandingPage, EventType
+
+
+@pytest.fixture
+def events_landing_page(db, homepage):
+    landing = EventsLandingPage(title="Events", slug="events")
+    homepage.add_child(instance=landing)
+    return landing
+
+
+@pytest.fixture
+def blog_landing_page(db, homepage):
+    landing = BlogLandingPage(title="Updates", slug="updates")
+    homepage.add_child(instance=landing)
+    return landing
+
+
+def add_event(landing, slug, start_time):
+    event = Event(
+        title=slug,
+        slug=slug,
+        start_time=start_time,
+        end_time=start_time,
+        type=EventType.objects.get_or_create(name="Workshop")[0],
+    )
+    landing.add_child(instance=event)
+    return event
+
+
+class TestDatedChildPageMixin:
+    def test_event_url(self, events_landing_page):
+        jan15 = datetime(2015, 1, 15, tzinfo=get_default_timezone())
+        event = add_event(events_landing_page, "my-event", jan15)
+        assert event.get_url() == "/events/2015/01/my-event/"
+
+    def test_local_date(self, events_landing_page):
+        # late in the day locally, but the next month in UTC
+        jan31 = datetime(2015, 1, 31, 22, tzinfo=get_default_timezone())
+        event = add_event(events_landing_page, "late-event", jan31)
+        assert event.get_url() == "/events/2015/01/late-event/"
+
+    def test_blog_url(self, blog_landing_page):
+        post = BlogPost(title="news", slug="news")
+        blog_landing_page.add_child(instance=post)
+        # not dated until published
+        assert post.get_url() == "/updates/news/"
+        post.first_published_at = datetime(2019, 3, 4, tzinfo=get_default_timezone())
+        assert post.get_url() == "/updates/2019/03/04/news/"
+
+    def test_no_route(self, workshop):
+        # parent without a dated route uses the default url
+        assert workshop.get_url() == "/events/%s/" % workshop.slug
+
+    def test_cached_parent(self, events_landing_page):
+        jan15 = datetime(2015, 1, 15, tzinfo=get_default_timezone())
+        event = add_event(events_landing_page, "my-event", jan15)
+        url = event.get_url()
+        event = Event.objects.get(pk=event.pk)
+        with CaptureQueriesContext(connection) as queries:
+            assert event.get_url() == url
+        assert not queries
+
+    def test_urls_for(self, events_landing_page):
+        for month in range(1, 6):
+            start = datetime(2015, month, 1, 12, tzinfo=get_default_timezone())
+            add_event(events_landing_page, "event-%d" % month, start)
+        events = Event.objects.order_by("start_time")
+        with CaptureQueriesContext(connection) as queries:
+            urls = Event.urls_for(events)
+        # events, cached site root paths, and one lookup for the parent type
+        assert len(queries) <= 3
+        assert urls[events[0].pk] == "/events/2015/01/event-1/"
+        assert urls[events[4].pk] == "/events/2015/05/event-5/"
@@ -0,0 +1,131 @@
+from datetime import date
+
+from django.db import connection
+from django.db.models import Prefetch
+from django.test.utils import CaptureQueriesContext
+
+from cdhweb.blog.models import Author
+from cdhweb.events.models import Speaker
+from cdhweb.events.wagtail_hooks import EventAdmin
+from cdhweb.pages.modeladmin import StreamingExportMixin
+from cdhweb.people.models import Person, Position, Title
+from cdhweb.people.wagtail_hooks import TitleAdmin
+
+
+def export(client, url, export_format="csv"):
+    """Request an export and consume the streamed response; returns the
+    content and the number of queries performed."""
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get(url, {"export": export_format})
+        content = b"".join(response.streaming_content)
+    assert response.status_code == 200
+    return content, len(queries)
+
+
+def listing_queries(client, url):
+    """Request a listing page and return the number of queries performed."""
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get(url)
+    assert response.status_code == 200
+    return len(queries)
+
+
+class TestStreamingExportMixin:
+    def test_get_export_prefetch(self):
+        speakers = Prefetch("speakers", queryset=Speaker.objects.all())
+        admin = StreamingExportMixin()
+        admin.export_prefetch = {
+            "speaker_list": [speakers, "speakers__person"],
+            "tags": ["tags"],
+            "other": ["tags"],
+        }
+        # only lookups for requested columns, without duplicates
+        assert admin.get_export_prefetch(["title", "speaker_list"]) == [
+            speakers,
+            "speakers__person",
+        ]
+        assert admin.get_export_prefetch(["tags", "other"]) == ["tags"]
+
+
+class TestStreamingExport:
+    def test_events_csv(self, admin_client, lecture, workshop):
+        url = "/cms/events/event/"
+        content, num_queries = export(admin_client, url)
+        content = content.decode()
+        assert lecture.title in content
+        assert lecture.speaker_list in content
+        assert content.splitlines()[0].startswith("Title,Type,")
+
+        # more speakers doesn't change the number of queries
+        for speaker in Person.objects.all():
+            workshop.speakers.add(Speaker(person=speaker))
+        workshop.save()
+        assert export(admin_client, url)[1] == num_queries
+
+    def test_events_xlsx(self, admin_client, lecture):
+        content, _ = export(admin_client, "/cms/events/event/", "xlsx")
+        # xlsx files are zip archives
+        assert content.startswith(b"PK")
+
+    def test_people_csv(self, admin_client, staffer, grad_pi, faculty_pi):
+        url = "/cms/people/person/"
+        # first request populates cached site root paths used for profile urls
+        export(admin_client, url)
+        content, num_queries = export(admin_client, url)
+        content = content.decode()
+        assert str(staffer.most_recent_title) in content
+        assert str(grad_pi.latest_grant) in content
+        # query count is the same for more people
+        Person.objects.create(first_name="another", last_name="person")
+        assert export(admin_client, url)[1] == num_queries
+
+    def test_export_columns(self):
+        # all export columns can be looked up on the model
+        for field in EventAdmin.list_export:
+            assert hasattr(EventAdmin.model, field)
+
+    def test_blogposts_csv(self, admin_client, article):
+        content, _ = export(admin_client, "/cms/blog/blogpost/")
+        assert article.author_list in content.decode()
+
+
+class TestListQueryMixin:
+    def test_events(self, admin_client, events):
+        url = "/cms/events/event/"
+        listing_queries(admin_client, url)
+        num_queries = listing_queries(admin_client, url)
+        # more speakers doesn't change the number of queries
+        for event in events.values():
+            for person in Person.objects.all():
+                event.speakers.add(Speaker(person=person))
+            event.save()
+        assert listing_queries(admin_client, url) == num_queries
+
+    def test_people(self, admin_client, staffer, postdoc):
+        url = "/cms/people/person/"
+        listing_queries(admin_client, url)
+        num_queries = listing_queries(admin_client, url)
+        title = Title.objects.create(title="Tester")
+        for i in range(3):
+            person = Person.objects.create(first_name="person %d" % i)
+            Position.objects.create(person=person, title=title, start_date=date.today())
+        assert listing_queries(admin_client, url) == num_queries
+
+    def test_blogposts(self, admin_client, blog_posts, staffer, postdoc):
+        url = "/cms/blog/blogpost/"
+        listing_queries(admin_client, url)
+        num_queries = listing_queries(admin_client, url)
+        for post in blog_posts.values():
+            Author.objects.create(post=post, person=postdoc)
+        assert listing_queries(admin_client, url) == num_queries
+
+    def test_titles(self, rf, admin_client, staffer, postdoc):
+        url = "/cms/people/title/"
+        listing_queries(admin_client, url)
+        num_queries = listing_queries(admin_client, url)
+        Title.objects.create(title="Another title")
+        assert listing_queries(admin_client, url) == num_queries
+        # annotated count matches the model method
+        title_admin = TitleAdmin()
+        for title in title_admin.get_queryset(rf.get(url)):
+            assert title_admin.num_people(title) == title.num_people()
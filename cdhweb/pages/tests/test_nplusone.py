@@ -0,0 +1,100 @@
+import json
+import logging
+
+import pytest
+from django.core.exceptions import MiddlewareNotUsed
+from django.template import engines
+from wagtail.models import Page
+
+from cdhweb.pages.nplusone import (
+    NPlusOneDetector,
+    NPlusOneError,
+    NPlusOneMiddleware,
+    fingerprint,
+)
+
+
+def get_page_titles(pks):
+    titles = []
+    for pk in pks:
+        titles.append(Page.objects.get(pk=pk).title)
+    return titles
+
+
+def test_fingerprint():
+    assert fingerprint(
+        "SELECT *  FROM t\n WHERE id IN (%s, %s, %s) AND name = 'a''b' LIMIT 21"
+    ) == fingerprint("SELECT * FROM t WHERE id IN (%s) AND name = 'c' LIMIT 1")
+    # table aliases and column names with digits are unchanged
+    assert fingerprint('SELECT "U0"."id" FROM t U0') == 'SELECT "U0"."id" FROM t U0'
+
+
+class TestNPlusOneDetector:
+    def test_repeated(self, db):
+        pks = list(Page.objects.values_list("pk", flat=True))
+        with NPlusOneDetector(threshold=len(pks) - 1) as detector:
+            get_page_titles(pks)
+        (query,) = detector.repeated
+        assert query.count == len(pks)
+        (site,) = query.sites
+        assert site.startswith("pages/tests/test_nplusone.py:")
+        assert site.endswith(" get_page_titles")
+
+    def test_threshold(self, db):
+        pks = list(Page.objects.values_list("pk", flat=True))
+        with NPlusOneDetector(threshold=len(pks), raise_error=True) as detector:
+            get_page_titles(pks)
+        assert detector.repeated == []
+
+    def test_raise(self, db):
+        pks = list(Page.objects.values_list("pk", flat=True))
+        with pytest.raises(NPlusOneError, match="get_page_titles") as err:
+            with NPlusOneDetector(threshold=1, raise_error=True):
+                get_page_titles(pks)
+        assert err.value.repeated[0].count == len(pks)
+
+    def test_log(self, db, caplog):
+        pks = list(Page.objects.values_list("pk", flat=True))
+        with caplog.at_level(logging.WARNING, logger="cdhweb.nplusone"):
+            with NPlusOneDetector(threshold=1, label="test"):
+                get_page_titles(pks)
+        (record,) = caplog.records
+        data = json.loads(record.getMessage())
+        assert data["label"] == "test"
+        assert data["count"] == len(pks)
+        assert data["sites"][0]["count"] == len(pks)
+        assert record.nplusone == data
+
+    def test_template_call_site(self, db):
+        template = engines["django"].from_string(
+            "{% for page in pages %}\n{{ page.get_parent.title }}{% endfor %}"
+        )
+        pages = list(Page.objects.filter(depth__gt=1))
+        with NPlusOneDetector(threshold=0) as detector:
+            template.render({"pages": pages})
+        (query,) = detector.repeated
+        # innermost cdhweb code is the test, rendering line 2 of the template
+        (site,) = query.sites
+        assert site.startswith("pages/tests/test_nplusone.py:")
+        assert site.endswith(" test_template_call_site (template <string>:2)")
+
+    def test_settings(self, settings):
+        settings.NPLUSONE_THRESHOLD = 3
+        settings.NPLUSONE_RAISE = True
+        detector = NPlusOneDetector()
+        assert detector.threshold == 3
+        assert detector.raise_error
+
+
+class TestNPlusOneMiddleware:
+    def test_not_used(self, settings):
+        settings.NPLUSONE_SAMPLE_RATE = 0
+        with pytest.raises(MiddlewareNotUsed):
+            NPlusOneMiddleware(lambda request: None)
+
+    def test_sampled(self, settings, client, homepage):
+        settings.NPLUSONE_SAMPLE_RATE = 1
+        settings.NPLUSONE_THRESHOLD = 0
+        settings.NPLUSONE_RAISE = True
+        with pytest.raises(NPlusOneError):
+            client.get(homepage.url)
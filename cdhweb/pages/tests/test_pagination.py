@@ -0,0 +1,59 @@
+import pytest
+
+from cdhweb.blog.models import BlogPost
+from cdhweb.pages.pagination import InvalidCursor, KeysetPaginator
+
+
+@pytest.fixture
+def posts(blog_posts):
+    # give two posts the same date, to check that ties are broken by id
+    article = blog_posts["article"]
+    feature = blog_posts["project_feature"]
+    feature.first_published_at = article.first_published_at
+    feature.save()
+    return BlogPost.objects.order_by("-first_published_at", "-pk")
+
+
+class TestKeysetPaginator:
+    def test_pages(self, posts):
+        expected = list(posts)
+        paginator = KeysetPaginator(BlogPost.objects.all(), 1, "-first_published_at")
+        page = paginator.page()
+        assert page.object_list == expected[:1]
+        assert not page.has_previous()
+        found = list(page)
+        while page.has_next():
+            page = paginator.page(page.next_cursor)
+            found.extend(page)
+        assert found == expected
+        # last page links back but not forward
+        assert page.has_previous()
+        assert not page.has_next()
+
+    def test_previous(self, posts):
+        expected = list(posts)
+        paginator = KeysetPaginator(BlogPost.objects.all(), 2, "-first_published_at")
+        second = paginator.page(paginator.page().next_cursor)
+        assert second.object_list == expected[2:]
+        first = paginator.page(second.previous_cursor)
+        assert first.object_list == expected[:2]
+        assert first.has_next()
+        assert first.next_cursor
+
+    def test_ascending(self, posts):
+        expected = list(reversed(posts))
+        paginator = KeysetPaginator(BlogPost.objects.all(), 2, "first_published_at")
+        first = paginator.page()
+        assert first.object_list == expected[:2]
+        assert paginator.page(first.next_cursor).object_list == expected[2:]
+
+    def test_single_page(self, posts):
+        page = KeysetPaginator(BlogPost.objects.all(), 10, "-first_published_at").page()
+        assert len(page) == 3
+        assert not page.has_other_pages()
+
+    @pytest.mark.parametrize("cursor", ["bogus", "WyJ4IiwxLDJd", "W10"])
+    def test_invalid_cursor(self, posts, cursor):
+        paginator = KeysetPaginator(BlogPost.objects.all(), 2, "-first_published_at")
+        with pytest.raises(InvalidCursor):
+            paginator.page(cursor)
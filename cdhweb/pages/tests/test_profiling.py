@@ -0,0 +1,135 @@
+import json
+import threading
+import time
+
+import pytest
+from django.core.exceptions import MiddlewareNotUsed
+from django.urls import reverse
+
+from cdhweb.pages import profiling
+from cdhweb.pages.models import RequestProfile
+
+
+@pytest.fixture
+def profile_storage(settings, tmp_path_factory):
+    """Enable profiling and store profiles in a temporary directory,
+    separate from the temporary media directory."""
+    settings.REQUEST_PROFILING = True
+    settings.REQUEST_PROFILE_ROOT = tmp_path_factory.mktemp("profiles")
+    return settings.REQUEST_PROFILE_ROOT
+
+
+def busy(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+class TestSampler:
+    def test_speedscope(self):
+        sampler = profiling.Sampler(threading.get_ident())
+        sampler.start()
+        busy(0.05)
+        sampler.stop()
+        assert sampler.samples
+
+        data = sampler.speedscope("test")
+        assert data["$schema"] == profiling.SPEEDSCOPE_SCHEMA
+        (profile,) = data["profiles"]
+        assert profile["type"] == "sampled"
+        assert len(profile["samples"]) == len(profile["weights"])
+        assert profile["endValue"] == pytest.approx(sum(profile["weights"]))
+        # stacks are outermost first, ending in the function being run
+        frames = data["shared"]["frames"]
+        names = {frames[stack[-1]]["name"] for stack in profile["samples"]}
+        assert "busy" in names
+
+
+class TestTokens:
+    def test_token_user(self, admin_user):
+        assert profiling.token_user(profiling.make_token(admin_user)) == admin_user
+        assert profiling.token_user("invalid") is None
+
+    def test_not_staff(self, django_user_model):
+        user = django_user_model.objects.create_user("editor")
+        assert profiling.token_user(profiling.make_token(user)) is None
+
+
+class TestProfilingMiddleware:
+    def test_disabled(self, settings):
+        settings.REQUEST_PROFILING = False
+        with pytest.raises(MiddlewareNotUsed):
+            profiling.ProfilingMiddleware(lambda request: None)
+
+    def test_not_requested(self, profile_storage, admin_client, homepage):
+        response = admin_client.get(homepage.url)
+        assert profiling.PROFILE_ID_HEADER not in response
+        assert not RequestProfile.objects.exists()
+
+    def test_not_staff(self, profile_storage, client, homepage):
+        response = client.get(homepage.url, {profiling.PROFILE_PARAM: ""})
+        assert response.status_code == 200
+        assert not RequestProfile.objects.exists()
+
+    def test_param(self, settings, profile_storage, admin_client, admin_user, homepage):
+        response = admin_client.get(homepage.url, {profiling.PROFILE_PARAM: ""})
+        assert response.status_code == 200
+        profile = RequestProfile.objects.get()
+        assert response[profiling.PROFILE_ID_HEADER] == str(profile.pk)
+        assert profile.method == "GET"
+        assert profile.path == "%s?%s=" % (homepage.url, profiling.PROFILE_PARAM)
+        assert profile.status == 200
+        assert profile.user == admin_user
+        with profile.file.open() as profile_file:
+            data = json.load(profile_file)
+        assert data["profiles"][0]["samples"]
+        assert profile.file.path.startswith(str(profile_storage))
+        # not under the publicly served media directory, and with no url
+        assert not profile.file.path.startswith(str(settings.MEDIA_ROOT))
+        with pytest.raises(ValueError):
+            profile.file.url
+
+    def test_header(self, profile_storage, client, admin_user, homepage):
+        token = profiling.make_token(admin_user)
+        client.get(homepage.url, headers={profiling.PROFILE_HEADER: token})
+        assert RequestProfile.objects.get().user == admin_user
+
+    def test_max_profiles(self, profile_storage, admin_client, homepage, monkeypatch):
+        monkeypatch.setattr(profiling, "MAX_PROFILES", 1)
+        admin_client.get(homepage.url, {profiling.PROFILE_PARAM: ""})
+        first = RequestProfile.objects.get()
+        admin_client.get(homepage.url, {profiling.PROFILE_PARAM: ""})
+        assert RequestProfile.objects.get() != first
+        assert len(list(profile_storage.iterdir())) == 1
+
+
+class TestRequestProfilesReportView:
+    def test_report(self, profile_storage, admin_client, homepage):
+        admin_client.get(homepage.url, {profiling.PROFILE_PARAM: ""})
+        profile = RequestProfile.objects.get()
+        url = reverse("request_profiles_report")
+        response = admin_client.get(url)
+        assert response.status_code == 200
+        assert list(response.context["profiles"]) == [profile]
+        assert response.context["token"]
+
+        response = admin_client.get(
+            reverse("request_profile_download", args=[profile.pk])
+        )
+        assert response["Content-Disposition"].startswith("attachment")
+        assert json.loads(b"".join(response.streaming_content))["profiles"]
+
+        # invalid ids don't delete anything
+        response = admin_client.post(url, {"profile": "x"})
+        assert response.status_code == 400
+        assert RequestProfile.objects.exists()
+
+        response = admin_client.post(url, {"profile": profile.pk})
+        assert response.status_code == 302
+        assert not RequestProfile.objects.exists()
+
+    def test_staff_only(self, client, django_user_model):
+        user = django_user_model.objects.create_user("editor", password="pass")
+        client.force_login(user)
+        response = client.get(reverse("request_profiles_report"))
+        assert response.status_code == 302
@@ -0,0 +1,125 @@
+import json
+from datetime import timedelta
+
+import pytest
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from wagtail.images.models import Rendition
+from wagtail_factories import ImageFactory
+
+from cdhweb.pages import renditions
+from cdhweb.pages.renditions import (
+    ADMIN_SPECS,
+    OUTDATED_FOCAL_POINT,
+    RETIRED_SPEC,
+    UNUSED_IMAGE,
+    RenditionCollector,
+    get_live_image_ids,
+    get_live_specs,
+    template_specs,
+)
+from cdhweb.people.models import Person
+
+
+def test_template_specs():
+    specs = template_specs()
+    # site templates, including several filters and format conversion
+    assert {"fill-400x222", "fill-1000x563|format-webp", "max-310x240"} <= specs
+    # wagtail admin templates
+    assert ADMIN_SPECS <= specs
+
+
+def test_registered_specs():
+    assert "fill-1200x627" in get_live_specs()
+
+
+class TestLiveImageIds:
+    def test_pages(self, content_page):
+        feed_image, block_image, homepage_image = ImageFactory.create_batch(3)
+        content_page.feed_image = feed_image
+        content_page.body = json.dumps(
+            [{"type": "image", "value": {"image": block_image.pk, "caption": ""}}]
+        )
+        content_page.save_revision().publish()
+        live = get_live_image_ids()
+        assert {feed_image.pk, block_image.pk} <= live
+        # unpublished pages don't count
+        content_page.unpublish()
+        live = get_live_image_ids()
+        assert feed_image.pk not in live and block_image.pk not in live
+        assert content_page.get_parent().get_parent().specific.hero_image_id in live
+
+    def test_people(self, db):
+        image = ImageFactory()
+        Person.objects.create(first_name="Jane", last_name="Doe", image=image)
+        assert get_live_image_ids() == {image.pk}
+
+
+class TestRenditionCollector:
+    @pytest.fixture
+    def live_image(self, media_root, homepage):
+        image = homepage.hero_image
+        image.file.save("image.png", ImageFactory.build().file)
+        return image
+
+    def test_collect(self, live_image, django_capture_on_commit_callbacks):
+        unused_image = ImageFactory()
+        outdated = live_image.get_rendition("fill-500x278")
+        live_image.focal_point_x = live_image.focal_point_y = 5
+        live_image.focal_point_width = live_image.focal_point_height = 10
+        live_image.save()
+        kept = [
+            live_image.get_rendition("fill-500x278"),
+            live_image.get_rendition("fill-1000x563|format-webp"),
+            live_image.get_rendition("max-165x165"),
+            # admin thumbnails are kept for all images
+            unused_image.get_rendition("max-165x165"),
+        ]
+        retired = live_image.get_rendition("fill-401x222")
+        unused = unused_image.get_rendition("fill-400x222")
+
+        with django_capture_on_commit_callbacks(execute=True):
+            stats = RenditionCollector(chunk_size=2).run()
+        assert stats.examined == 7
+        assert stats.deleted == {
+            RETIRED_SPEC: 1,
+            UNUSED_IMAGE: 1,
+            OUTDATED_FOCAL_POINT: 1,
+        }
+        assert stats.size > 0
+        assert set(Rendition.objects.all()) == set(kept)
+        storage = retired.file.storage
+        assert not storage.exists(retired.file.name)
+        assert not storage.exists(unused.file.name)
+        assert not storage.exists(outdated.file.name)
+        assert storage.exists(kept[0].file.name)
+
+    def test_dry_run(self, live_image):
+        rendition = live_image.get_rendition("fill-401x222")
+        stats = RenditionCollector(dry_run=True).run()
+        assert stats.deleted == {RETIRED_SPEC: 1}
+        assert Rendition.objects.filter(pk=rendition.pk).exists()
+
+    def test_files(self, live_image, monkeypatch):
+        rendition = live_image.get_rendition("fill-400x222")
+        storage = rendition.file.storage
+        name = storage.save("images/orphan.png", ContentFile(b"orphan"))
+        # new files are kept, in case their rendition is being created
+        stats = RenditionCollector().run()
+        assert stats.files == 0
+        monkeypatch.setattr(renditions, "FILE_GRACE_PERIOD", timedelta(0))
+        stats = RenditionCollector().run()
+        assert stats.files == 1
+        assert not storage.exists(name)
+        assert storage.exists(rendition.file.name)
+
+
+def test_command(db, media_root, capsys):
+    ImageFactory().get_rendition("max-165x165|format-webp")
+    call_command("collect_renditions", dry_run=True)
+    output = capsys.readouterr().out
+    assert "Retired spec: 1" in output
+    assert "Would delete 1 of 1 renditions and 0 files" in output
+    call_command("collect_renditions")
+    assert "Deleted 1 of 1 renditions" in capsys.readouterr().out
+    assert not Rendition.objects.exists()
@@ -0,0 +1,136 @@
+import gzip
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from django.core.management import call_command
+from django.core.management.base import CommandError
+
+from cdhweb.pages import replay
+
+LOG_LINES = [
+    '10.0.0.1 - - [19/Oct/2026:10:00:00 +0000] "GET /events/ HTTP/1.1" 200 '
+    '5120 "-" "Mozilla/5.0" "203.0.113.1"',
+    # prefixed by docker logs
+    'web-1  | 10.0.0.1 - - [19/Oct/2026:10:00:00 +0000] "GET /search/?q=data '
+    'HTTP/1.1" 200 2048 "-" "Mozilla/5.0" "203.0.113.2"',
+    '10.0.0.1 - - [19/Oct/2026:10:00:01 +0000] "GET /error/ HTTP/1.1" 500 0 '
+    '"-" "Mozilla/5.0" "203.0.113.3"',
+    # skipped: application output, POST, authenticated, admin
+    "[2026-10-19 10:00:01 +0000] [7] [INFO] Booting worker with pid: 7",
+    '10.0.0.1 - - [19/Oct/2026:10:00:01 +0000] "POST /search/ HTTP/1.1" 403 0 '
+    '"-" "Mozilla/5.0" "-"',
+    '10.0.0.1 - editor [19/Oct/2026:10:00:01 +0000] "GET /events/ HTTP/1.1" '
+    '200 0 "-" "Mozilla/5.0" "-"',
+    '10.0.0.1 - - [19/Oct/2026:10:00:02 +0000] "GET /cms/pages/ HTTP/1.1" 200 '
+    '0 "-" "Mozilla/5.0" "-"',
+]
+
+
+class Handler(BaseHTTPRequestHandler):
+    """Responds with an error for /error/ and success for anything else."""
+
+    def do_GET(self):
+        self.send_response(500 if self.path.startswith("/error/") else 200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield "http://127.0.0.1:%d" % server.server_address[1]
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.mark.parametrize(
+    "path,family",
+    [
+        ("/", "pages"),
+        ("/events/2026/10/talk/", "pages"),
+        ("/search/?q=data", "search"),
+        ("/events/calendar.ics?type=talk", "ical"),
+        ("/events/2026/10/talk.ics", "ical"),
+        ("/updates/rss/", "feeds"),
+        ("/sitemap-events.xml", "feeds"),
+        ("/documents/12/report.pdf", "documents"),
+    ],
+)
+def test_route_family(path, family):
+    assert replay.route_family(path) == family
+
+
+def test_parse_log():
+    entries = list(replay.parse_log(LOG_LINES))
+    assert [entry.path for entry in entries] == [
+        "/events/",
+        "/search/?q=data",
+        "/error/",
+    ]
+    assert [entry.family for entry in entries] == ["pages", "search", "pages"]
+    assert entries[2].status == 500
+    assert (entries[2].timestamp - entries[0].timestamp).total_seconds() == 1
+
+
+def test_percentile():
+    values = list(range(1, 101))
+    assert replay.percentile(values, 50) == 50
+    assert replay.percentile(values, 99) == 99
+    assert replay.percentile([5], 95) == 5
+    assert replay.percentile([], 50) is None
+
+
+def test_replay(server_url):
+    replayer = replay.Replayer(server_url, concurrency=2, speedup=10)
+    results, elapsed = replayer.replay(replay.parse_log(LOG_LINES))
+    assert [result.status for result in results] == [200, 200, 500]
+    # logged requests span one second, sped up ten times
+    assert elapsed >= 0.1
+
+    summary = replay.summarize(results, elapsed)
+    assert summary["all"]["count"] == 3
+    assert summary["pages"]["errors"] == 1
+    assert summary["pages"]["error_rate"] == 0.5
+    assert summary["search"]["error_rate"] == 0
+    assert summary["search"]["p50"] == results[1].ms
+
+
+def test_replay_connection_error():
+    replayer = replay.Replayer("http://127.0.0.1:1", timeout=1)
+    (result,), _ = replayer.replay(replay.parse_log(LOG_LINES[:1]))
+    assert result.status is None
+    assert result.error
+
+
+def test_command(server_url, tmp_path, capsys):
+    logfile = tmp_path / "access.log.gz"
+    with gzip.open(logfile, "wt") as outfile:
+        outfile.write("\n".join(LOG_LINES))
+    output = tmp_path / "summary.json"
+    call_command(
+        "replay_access_log",
+        str(logfile),
+        url=server_url,
+        speedup=0,
+        limit=2,
+        output=str(output),
+    )
+    stdout = capsys.readouterr().out
+    assert "Replayed 2 requests" in stdout
+    assert "search" in stdout
+    summary = json.loads(output.read_text())
+    assert summary["families"]["all"]["count"] == 2
+
+
+def test_command_no_requests(tmp_path):
+    logfile = tmp_path / "access.log"
+    logfile.write_text(LOG_LINES[3])
+    with pytest.raises(CommandError):
+        call_command("replay_access_log", str(logfile))
@@ -0,0 +1,129 @@
+from datetime import datetime, timedelta
+from unittest.mock import Mock, patch
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.utils import timezone
+from django.utils.timezone import get_default_timezone
+
+from cdhweb.pages.schedule import (
+    LAST_RUN_CACHE_KEY,
+    TimeBoundary,
+    get_generation,
+    get_time_boundaries,
+    invalidate,
+    next_boundary,
+    process_boundaries,
+)
+from cdhweb.pages.snippets import SiteAlert
+
+
+def local_datetime(*args):
+    return datetime(*args, tzinfo=get_default_timezone())
+
+
+class TestTimeBoundary:
+    def test_crossed_by_date(self, staffer):
+        # staffer's first position ended 2018-03-01; no longer current
+        # from the start of the next day
+        boundary = TimeBoundary("people", "people.Position", "end_date", 1)
+        assert boundary.crossed(
+            local_datetime(2018, 3, 1, 12), local_datetime(2018, 3, 2, 0, 1)
+        )
+        assert not boundary.crossed(
+            local_datetime(2018, 3, 1, 0), local_datetime(2018, 3, 1, 23, 59)
+        )
+        assert not boundary.crossed(
+            local_datetime(2018, 3, 2, 0, 1), local_datetime(2018, 3, 5)
+        )
+
+    def test_crossed_datetime(self, db):
+        display_until = local_datetime(2020, 5, 1, 9, 30)
+        SiteAlert.objects.create(message="closed", display_until=display_until)
+        boundary = TimeBoundary("site-alerts", "cdhpages.SiteAlert", "display_until")
+        assert boundary.crossed(display_until - timedelta(minutes=1), display_until)
+        assert not boundary.crossed(display_until, local_datetime(2020, 6, 1))
+
+    def test_next_after(self, staffer):
+        boundary = TimeBoundary("people", "people.Position", "start_date", 0)
+        # second position starts 2018-03-02
+        assert boundary.next_after(local_datetime(2018, 1, 1)) == local_datetime(
+            2018, 3, 2
+        )
+        assert boundary.next_after(local_datetime(2018, 3, 2, 12)) is None
+
+    def test_next_after_datetime_by_date(self, workshop):
+        # workshop ends 2019-10-05; past from the start of the next day
+        boundary = TimeBoundary("events", "events.Event", "end_time", 1)
+        assert boundary.next_after(local_datetime(2019, 10, 5, 20)) == local_datetime(
+            2019, 10, 6
+        )
+
+
+def test_get_time_boundaries():
+    names = set(boundary.name for boundary in get_time_boundaries())
+    assert names == {"people", "site-alerts"}
+
+
+def test_invalidate():
+    callback = Mock()
+    cache.set("a", 1)
+    cache.set("b", 2)
+    generation = get_generation("test")
+    invalidate(
+        [
+            TimeBoundary("test", "people.Position", "start_date", 0, ["a"], [callback]),
+            TimeBoundary("test", "people.Position", "end_date", 1, ["b"], [callback]),
+        ]
+    )
+    assert cache.get("a") is None and cache.get("b") is None
+    # shared callback is only called once
+    callback.assert_called_once()
+    assert get_generation("test") != generation
+
+
+@patch("cdhweb.pages.schedule.get_time_boundaries")
+def test_process_boundaries(mock_get_boundaries, staffer):
+    callback = Mock()
+    boundary = TimeBoundary(
+        "people", "people.Position", "end_date", 1, callbacks=[callback]
+    )
+    mock_get_boundaries.return_value = [boundary]
+    # no previous run: everything is invalidated
+    assert process_boundaries(local_datetime(2018, 2, 1)) == [boundary]
+    assert cache.get(LAST_RUN_CACHE_KEY) == local_datetime(2018, 2, 1)
+    callback.reset_mock()
+    assert process_boundaries(local_datetime(2018, 2, 15)) == []
+    callback.assert_not_called()
+    assert process_boundaries(local_datetime(2018, 3, 2, 1)) == [boundary]
+    callback.assert_called_once()
+    assert next_boundary(local_datetime(2018, 3, 2, 1)) is None
+
+
+class TestSiteAlerts:
+    def test_cached(self, db):
+        alert = SiteAlert.objects.create(message="hello")
+        assert SiteAlert.get_current_alerts() == [alert]
+        # editing an alert clears the cache
+        alert.display_from = timezone.now() + timedelta(days=1)
+        alert.save()
+        assert SiteAlert.get_current_alerts() == []
+
+    def test_display_window(self, db):
+        display_from = timezone.now() + timedelta(minutes=5)
+        alert = SiteAlert.objects.create(message="soon", display_from=display_from)
+        process_boundaries()
+        assert SiteAlert.get_current_alerts() == []
+        # once the window starts, the scheduler clears the cached list
+        later = display_from + timedelta(seconds=1)
+        with patch("django.utils.timezone.now", return_value=later):
+            process_boundaries()
+            assert SiteAlert.get_current_alerts() == [alert]
+
+
+def test_command(db, capsys):
+    call_command("invalidate_time_boundaries", once=True, verbosity=2)
+    output = capsys.readouterr().out
+    assert "Invalidated:" in output
+    assert "Next boundary:" in output
+    assert cache.get(LAST_RUN_CACHE_KEY)
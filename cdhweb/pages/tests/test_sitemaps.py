@@ -0,0 +1,169 @@
+from unittest.mock import patch
+
+import pytest
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.urls import reverse
+
+from cdhweb.pages import sitemaps
+from cdhweb.pages.sitemaps import (
+    SITEMAPS,
+    EventsSitemap,
+    PagesSitemap,
+    UpdatesSitemap,
+    section_for_page,
+    sitemap_filename,
+    write_sitemap,
+    write_sitemap_index,
+    write_sitemaps,
+)
+
+
+@pytest.fixture(autouse=True)
+def no_pending_sections():
+    """discard sections queued by earlier tests, whose transactions were
+    never committed"""
+    sitemaps.pending.sections = set()
+
+
+@pytest.fixture
+def sitemap_storage(settings, tmp_path):
+    """write generated sitemaps to a temporary media directory"""
+    settings.MEDIA_ROOT = tmp_path
+    return tmp_path
+
+
+def test_sitemap_filename():
+    assert sitemap_filename() == "sitemaps/sitemap.xml"
+    assert sitemap_filename("events") == "sitemaps/sitemap-events.xml"
+
+
+def test_section_for_page(content_page, derrida, staffer_profile, workshop, article):
+    assert section_for_page(content_page) == "pages"
+    assert section_for_page(derrida) == "projects"
+    assert section_for_page(staffer_profile) == "people"
+    assert section_for_page(workshop) == "events"
+    assert section_for_page(article) == "updates"
+
+
+class TestSectionSitemaps:
+    def test_section_items(self, content_page, workshop, article):
+        assert list(EventsSitemap().items()) == [workshop]
+        assert list(UpdatesSitemap().items()) == [article]
+
+    def test_pages_section(self, content_page, workshop, article):
+        # general pages section excludes pages in other sections
+        items = list(PagesSitemap().items())
+        assert content_page in items
+        assert workshop not in items
+        assert article not in items
+
+
+class TestWriteSitemaps:
+    def test_write_sitemap(self, sitemap_storage, workshop, article):
+        write_sitemap("events")
+        xml = default_storage.open(sitemap_filename("events")).read().decode()
+        assert "<loc>%s</loc>" % workshop.get_full_url() in xml
+        assert article.get_full_url() not in xml
+
+    def test_overwrite(self, sitemap_storage, workshop):
+        write_sitemap("events")
+        workshop.unpublish()
+        write_sitemap("events")
+        xml = default_storage.open(sitemap_filename("events")).read().decode()
+        assert workshop.get_full_url() not in xml
+        # replaced the existing file instead of saving a copy
+        assert len(list((sitemap_storage / "sitemaps").iterdir())) == 1
+
+    def test_write_sitemap_index(self, sitemap_storage, workshop):
+        write_sitemap_index()
+        xml = default_storage.open(sitemap_filename()).read().decode()
+        for section in SITEMAPS:
+            assert "sitemap-%s.xml</loc>" % section in xml
+
+    def test_build_sitemaps_command(self, sitemap_storage, workshop):
+        call_command("build_sitemaps", verbosity=0)
+        for section in SITEMAPS:
+            assert default_storage.exists(sitemap_filename(section))
+        assert default_storage.exists(sitemap_filename())
+
+    @patch("cdhweb.pages.sitemaps.write_sitemaps")
+    def test_regenerate_on_publish(
+        self, mock_write_sitemaps, django_capture_on_commit_callbacks, workshop
+    ):
+        with django_capture_on_commit_callbacks(execute=True):
+            workshop.save_revision().publish()
+        # only the affected section is regenerated
+        mock_write_sitemaps.assert_called_once_with(["events"])
+
+        mock_write_sitemaps.reset_mock()
+        with django_capture_on_commit_callbacks(execute=True):
+            workshop.unpublish()
+        mock_write_sitemaps.assert_called_once_with(["events"])
+
+    @patch("cdhweb.pages.sitemaps.write_sitemaps")
+    def test_regenerate_on_parent_change(
+        self, mock_write_sitemaps, django_capture_on_commit_callbacks, events
+    ):
+        # urls of pages below a page change with its slug
+        parent = events["workshop"].get_parent().specific
+        parent.slug = "happenings"
+        with django_capture_on_commit_callbacks(execute=True):
+            parent.save_revision().publish()
+        mock_write_sitemaps.assert_called_once_with(["pages", "events"])
+
+    @patch("cdhweb.pages.sitemaps.write_sitemaps")
+    def test_regenerate_on_move(
+        self,
+        mock_write_sitemaps,
+        django_capture_on_commit_callbacks,
+        article,
+        blog_link_page,
+    ):
+        with django_capture_on_commit_callbacks(execute=True):
+            other = blog_link_page.copy(
+                update_attrs={"title": "other", "slug": "other"}, recursive=False
+            )
+        mock_write_sitemaps.reset_mock()
+        with django_capture_on_commit_callbacks(execute=True):
+            article.move(other, pos="last-child")
+        mock_write_sitemaps.assert_called_once_with(["updates"])
+
+    def test_regenerate_on_delete(
+        self, sitemap_storage, django_capture_on_commit_callbacks, events
+    ):
+        write_sitemaps()
+        parent = events["workshop"].get_parent()
+        with patch(
+            "cdhweb.pages.sitemaps.write_sitemaps", wraps=write_sitemaps
+        ) as mock_write_sitemaps:
+            with django_capture_on_commit_callbacks(execute=True):
+                parent.delete()
+        # each section is regenerated once for the whole tree
+        mock_write_sitemaps.assert_called_once_with(["pages", "events"])
+        xml = default_storage.open(sitemap_filename("events")).read().decode()
+        assert events["workshop"].get_full_url() not in xml
+
+
+class TestSitemapView:
+    def test_section(self, client, sitemap_storage, workshop):
+        # not generated yet; built on first request
+        response = client.get(reverse("sitemap-index"))
+        assert response.status_code == 200
+        assert response["Content-Type"] == "application/xml"
+        response = client.get("/sitemap-events.xml")
+        assert response.status_code == 200
+        assert workshop.get_full_url() in b"".join(response.streaming_content).decode()
+        assert default_storage.exists(sitemap_filename("events"))
+
+    @patch("cdhweb.pages.views.write_sitemap")
+    def test_prebuilt(self, mock_write_sitemap, client, sitemap_storage, workshop):
+        write_sitemap("events")
+        response = client.get("/sitemap-events.xml")
+        assert response.status_code == 200
+        # served from the existing file without regenerating
+        mock_write_sitemap.assert_not_called()
+
+    def test_unknown_section(self, db, client, sitemap_storage):
+        response = client.get("/sitemap-foo.xml")
+        assert response.status_code == 404
@@ -0,0 +1,176 @@
+import json
+import logging
+
+import pytest
+from django.contrib.auth.models import Permission
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+from django.template import Context, Template
+from django.urls import reverse
+from django.utils import timezone
+from wagtail.images import get_image_model
+from wagtail.images.tests.utils import get_test_image_file
+from wagtail.models import Page
+
+from cdhweb.pages import timing
+from cdhweb.pages.models import UrlTiming
+
+
+@pytest.fixture
+def timings():
+    """Measure timings outside of a request."""
+    timing.install()
+    timings = timing.RequestTimings()
+    token = timing.current_timings.set(timings)
+    yield timings
+    timing.current_timings.reset(token)
+
+
+def count_pages():
+    return Page.objects.count()
+
+
+class TestRequestTimings:
+    def test_server_timing(self):
+        timings = timing.RequestTimings()
+        timings.sql.add(12.34)
+        timings.cache_hits = 3
+        timings.cache_misses = 1
+        timings.stop()
+        header = timings.server_timing()
+        assert 'sql;dur=12.3;desc="1 queries"' in header
+        assert 'cache;dur=0.0;desc="3 hits, 1 misses"' in header
+        assert "total;dur=" in header
+
+    def test_sql_call_site(self, db, timings):
+        with connection.execute_wrapper(timing.time_query):
+            count_pages()
+        assert timings.sql.count == 1
+        (site,) = timings.sql_sites
+        assert site.startswith("pages/tests/test_timing.py:")
+        assert site.endswith("count_pages")
+
+    def test_cache(self, timings):
+        cache.set("cached", "value")
+        assert cache.get("cached") == "value"
+        assert cache.get("uncached", "default") == "default"
+        assert cache.get_many(["cached", "uncached"]) == {"cached": "value"}
+        assert timings.cache_hits == 2
+        assert timings.cache_misses == 2
+
+    def test_templates(self, timings):
+        template = Template(
+            "{% block content %}{% include 'cdhpages/blocks/rich_text.html' %}"
+            "{% endblock %}"
+        )
+        template.render(Context({}))
+        assert "cdhpages/blocks/rich_text.html" in timings.templates
+        assert timings.templates["<string>"].count == 1
+        assert timings.blocks["content"].count == 1
+        # nested templates aren't counted twice
+        assert timings.render_ms == pytest.approx(timings.templates["<string>"].ms)
+
+    def test_renditions(self, db, timings):
+        image = get_image_model().objects.create(
+            title="test", file=get_test_image_file()
+        )
+        image.get_rendition("fill-10x10")
+        image.get_rendition("fill-10x10")
+        assert timings.renditions.count == 1
+
+    def test_not_measured(self, db):
+        # wrappers do nothing when no request is being measured
+        timing.install()
+        assert cache.get("uncached") is None
+        assert timing.current_timings.get() is None
+
+
+class TestServerTimingMiddleware:
+    def test_disabled(self, settings, client, homepage):
+        settings.SERVER_TIMING = False
+        with pytest.raises(MiddlewareNotUsed):
+            timing.ServerTimingMiddleware(lambda request: None)
+        response = client.get(homepage.url)
+        assert "Server-Timing" not in response
+
+    def test_enabled(self, settings, client, homepage, caplog):
+        settings.SERVER_TIMING = True
+        with caplog.at_level(logging.INFO, logger="cdhweb.timing"):
+            response = client.get(homepage.url)
+        assert response.status_code == 200
+        assert "sql;dur=" in response["Server-Timing"]
+        assert "render;dur=" in response["Server-Timing"]
+        # django test template instrumentation still works
+        assert response.templates
+
+        (record,) = caplog.records
+        data = json.loads(record.getMessage())
+        assert data["path"] == homepage.url
+        assert data["status"] == 200
+        assert data["sql"]["count"] > 0
+        assert data["sql"]["sites"]
+        assert data["render"]["templates"]
+        assert record.timing == data
+
+        (row,) = timing.get_report()
+        assert row["url"] == homepage.url
+        assert row["count"] == 1
+        assert row["avg_ms"] == row["max_ms"]
+
+    def test_not_found(self, settings, client, homepage):
+        settings.SERVER_TIMING = True
+        client.get("/missing/")
+        assert not timing.get_report()
+        client.get(homepage.url)
+        client.get(homepage.url)
+        (row,) = timing.get_report()
+        assert row["count"] == 2
+        timing.clear_report()
+        assert not timing.get_report()
+
+    def test_report_limit(self, db, monkeypatch):
+        monkeypatch.setattr(timing, "REPORT_MAX_URLS", 2)
+        for i, path in enumerate(["/a/", "/b/", "/c/"]):
+            timings = timing.RequestTimings()
+            timings.total_ms = 10 * (i + 1)
+            timing.record_report(path, timings)
+        # the fastest url is dropped
+        assert [row["url"] for row in timing.get_report()] == ["/c/", "/b/"]
+
+    def test_report_max_age(self, db):
+        timing.record_report("/old/", timing.RequestTimings())
+        UrlTiming.objects.update(updated=timezone.now() - timing.REPORT_MAX_AGE)
+        assert not timing.get_report()
+        # removed when another url is added
+        timing.record_report("/new/", timing.RequestTimings())
+        assert list(UrlTiming.objects.values_list("url", flat=True)) == ["/new/"]
+
+
+class TestSlowUrlsReportView:
+    def test_report(self, settings, client, admin_client, homepage):
+        settings.SERVER_TIMING = True
+        client.get(homepage.url)
+        url = reverse("slow_urls_report")
+        response = admin_client.get(url, {"order": "avg"})
+        assert response.status_code == 200
+        assert response.context["order"] == "avg"
+        assert [row["url"] for row in response.context["rows"]] == [homepage.url]
+
+        response = admin_client.post(url)
+        assert response.status_code == 302
+        # only the request that cleared the report remains
+        assert [row["url"] for row in timing.get_report()] == [url]
+
+    def test_staff_only(self, client, django_user_model):
+        user = django_user_model.objects.create_user("editor", password="pass")
+        user.user_permissions.add(
+            Permission.objects.get(
+                content_type__app_label="wagtailadmin", codename="access_admin"
+            )
+        )
+        client.force_login(user)
+        response = client.get(reverse("slow_urls_report"))
+        # wagtail redirects to the dashboard when permission is denied
+        assert response.status_code == 302
+        assert response["Location"] == reverse("wagtailadmin_home")
@@ -0,0 +1,163 @@
+import json
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+
+from cdhweb.pages.management.commands.cleanup_migrated_content import (
+    MigratedContentCleanup,
+)
+from cdhweb.pages.models import ContentPage
+from cdhweb.pages.transforms import StreamTransform, TransformRunner, apply_transform
+
+MIGRATED_HTML = (
+    "<html><body>\n<p>\n  Some&nbsp;text with <span>a span</span>.</p>\n</body></html>"
+)
+
+
+class Uppercase(StreamTransform):
+    block_types = ["paragraph"]
+
+    def transform_value(self, block_type, value):
+        return value.upper()
+
+
+@pytest.fixture
+def migrated_pages(landing_page):
+    pages = []
+    for i in range(5):
+        page = ContentPage(
+            title="migrated %d" % i,
+            slug="migrated-%d" % i,
+            body=json.dumps(
+                [
+                    {"type": "migrated", "value": MIGRATED_HTML},
+                    {"type": "migrated", "value": "<p>second  block</p>"},
+                ]
+            ),
+        )
+        landing_page.add_child(instance=page)
+        page.save_revision().publish()
+        pages.append(page)
+    return pages
+
+
+def test_transform_stream():
+    stream = [
+        {"type": "paragraph", "value": "<p>text</p>", "id": "1"},
+        {"type": "migrated", "value": "<p>text</p>", "id": "2"},
+    ]
+    transformed = Uppercase().transform_stream(stream)
+    assert transformed[0] == {"type": "paragraph", "value": "<P>TEXT</P>", "id": "1"}
+    assert transformed[1] == stream[1]
+    # original data is unchanged
+    assert stream[0]["value"] == "<p>text</p>"
+
+
+def test_apply_transform():
+    rows = [
+        (1, "one", [{"type": "paragraph", "value": "a"}]),
+        (2, "two", [{"type": "migrated", "value": "b"}]),
+    ]
+    last_pk, results = apply_transform(Uppercase(), rows, diff=True)
+    assert last_pk == 2
+    # only changed pages are returned
+    assert [result.pk for result in results] == [1]
+    assert "-a\n+A" in results[0].diff
+
+
+def test_clean_html():
+    cleaned = MigratedContentCleanup().clean_html(MIGRATED_HTML)
+    assert cleaned == "<p>Some text with a span.</p>"
+
+
+class TestTransformRunner:
+    def test_run(self, migrated_pages, content_page):
+        revisions = [page.revisions.count() for page in migrated_pages]
+        stats = TransformRunner(MigratedContentCleanup(), chunk_size=2).run()
+        total = stats[-1]
+        assert total.changed == 5
+        assert total.examined >= 6
+        for page, count in zip(migrated_pages, revisions):
+            page.refresh_from_db()
+            # a single new revision, published
+            assert page.revisions.count() == count + 1
+            assert page.body[0].value.source == "<p>Some text with a span.</p>"
+            assert page.body[1].value.source == "<p>second block</p>"
+        # running again changes nothing
+        assert TransformRunner(MigratedContentCleanup()).run()[-1].changed == 0
+
+    def test_unpublished_changes(self, migrated_pages):
+        # a draft of a live page, and an unpublished page
+        live, draft = migrated_pages[:2]
+        live.title = "new title"
+        live.save_revision()
+        draft.unpublish()
+        output = StringIO()
+        stats = TransformRunner(MigratedContentCleanup(), stdout=output).run()
+        assert stats[-1].changed == 3
+        assert stats[-1].skipped == 2
+        assert "%d: skipped, has unpublished changes" % live.pk in output.getvalue()
+        # drafts are left as they are, to be cleaned up when edited
+        live.refresh_from_db()
+        assert live.body[0].value.source == MIGRATED_HTML
+        latest = live.get_latest_revision_as_object()
+        assert latest.title == "new title"
+        assert latest.body[0].value.source == MIGRATED_HTML
+
+    def test_dry_run(self, migrated_pages):
+        output = StringIO()
+        runner = TransformRunner(
+            MigratedContentCleanup(), dry_run=True, diff=True, stdout=output
+        )
+        assert runner.run()[-1].changed == 5
+        assert "+<p>Some text with a span.</p>" in output.getvalue()
+        migrated_pages[0].refresh_from_db()
+        assert migrated_pages[0].body[0].value.source == MIGRATED_HTML
+
+    def test_checkpoint(self, migrated_pages, tmp_path):
+        checkpoint = tmp_path / "checkpoint.json"
+        # previous run finished the first two pages
+        checkpoint.write_text(
+            json.dumps(
+                {
+                    "done": [],
+                    "last_pk": {"cdhpages.contentpage": migrated_pages[1].pk},
+                }
+            )
+        )
+        runner = TransformRunner(
+            MigratedContentCleanup(), chunk_size=2, checkpoint=str(checkpoint)
+        )
+        assert runner.run()[-1].changed == 3
+        migrated_pages[0].refresh_from_db()
+        assert migrated_pages[0].body[0].value.source == MIGRATED_HTML
+        # removed once complete
+        assert not checkpoint.exists()
+
+    def test_workers(self, migrated_pages):
+        runner = TransformRunner(MigratedContentCleanup(), chunk_size=2, workers=2)
+        assert runner.run()[-1].changed == 5
+        migrated_pages[4].refresh_from_db()
+        assert migrated_pages[4].body[1].value.source == "<p>second block</p>"
+
+    def test_warnings(self, landing_page):
+        page = ContentPage(
+            title="styled",
+            slug="styled",
+            body=json.dumps(
+                [{"type": "migrated", "value": '<p style="color: red">  red</p>'}]
+            ),
+        )
+        landing_page.add_child(instance=page)
+        output = StringIO()
+        runner = TransformRunner(MigratedContentCleanup(), stdout=output)
+        runner.run()
+        assert "cdhpages.ContentPage %d: inline styles" % page.pk in output.getvalue()
+
+
+def test_command(migrated_pages):
+    output = StringIO()
+    call_command("cleanup_migrated_content", noact=True, stdout=output)
+    assert "Total:" in output.getvalue()
+    assert "5 changed" in output.getvalue()
@@ -1,7 +1,8 @@
 import pytest
-from wagtail.models import Site
+from wagtail.models import Page, Site
 
-from cdhweb.pages.utils import absolutize_url
+from cdhweb.pages.models import ContentPage
+from cdhweb.pages.utils import absolutize_url, bulk_add_children
 
 
 @pytest.mark.django_db
@@ -13,3 +14,24 @@ def test_absolutize_url():
     # now uses wagtail site, can't set root url here
     local_path = "/foo/bar/"
     assert absolutize_url(local_path) == "http://localhost/foo/bar/"
+
+
+def test_bulk_add_children(landing_page, content_page):
+    pages = bulk_add_children(
+        landing_page,
+        [ContentPage(title="bulk %d" % i, slug="bulk-%d" % i) for i in range(3)],
+        batch_size=2,
+    )
+    landing_page.refresh_from_db()
+    assert landing_page.numchild == 4
+    # added after existing children, with valid tree paths
+    children = list(landing_page.get_children().specific())
+    assert children[0] == content_page
+    assert children[1:] == pages
+    assert Page.find_problems() == ([], [], [], [], [])
+    page = ContentPage.objects.get(slug="bulk-2")
+    assert page.live
+    assert page.url == landing_page.url + "bulk-2/"
+    # pages can have children added normally
+    page.add_child(instance=ContentPage(title="child", slug="child"))
+    assert page.get_children().count() == 1
@@ -0,0 +1,416 @@
+"""
+Per-request performance instrumentation.
+
+When the ``SERVER_TIMING`` setting is enabled, :class:`ServerTimingMiddleware`
+measures for each request:
+
+- SQL time and query count, grouped by call site: the innermost line of
+  cdhweb code, or the template being rendered, that ran the query;
+- cache hits and misses, and time spent reading from the cache;
+- render time for each template and template block;
+- time spent generating image renditions.
+
+Totals are sent as ``Server-Timing`` headers, which browser developer tools
+show with the request, and a structured (JSON) line with the details is
+logged to the ``cdhweb.timing`` logger, which can be sent to the same stream
+as the gunicorn access log. Totals for each url are also aggregated in the
+database for the slow urls report in the wagtail admin (not found responses
+are left out, so that probes for missing urls don't fill the report).
+
+Instrumentation is installed when the middleware is loaded, by wrapping
+template, cache and rendition methods; the wrappers only record anything
+while a request is being measured.
+"""
+
+import contextvars
+import datetime
+import json
+import logging
+import os
+import sys
+import time
+from collections import defaultdict
+from contextlib import ExitStack
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import IntegrityError, connections, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+from django.template.base import Template
+from django.template.loader_tags import BlockNode
+from django.utils import timezone
+from wagtail.images.models import AbstractImage
+
+from cdhweb.pages.models import UrlTiming
+
+logger = logging.getLogger("cdhweb.timing")
+
+#: maximum number of urls kept in the report; the fastest are dropped
+REPORT_MAX_URLS = 500
+#: urls that have not been requested for this long are dropped from the
+#: report
+REPORT_MAX_AGE = datetime.timedelta(days=7)
+#: number of call sites, templates and blocks included in log lines
+LOG_TOP = 10
+
+#: timings for the request being measured in the current thread or task
+current_timings = contextvars.ContextVar("current_timings", default=None)
+
+# source directory for cdhweb code, for identifying query call sites
+SOURCE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# modules whose frames are skipped when looking for call sites
+INSTRUMENTATION_FILES = {
+    __file__,
+    os.path.join(os.path.dirname(__file__), "nplusone.py"),
+}
+# sentinel to distinguish cache misses from cached values
+MISSING = object()
+
+
+def elapsed_ms(start):
+    return (time.perf_counter() - start) * 1000
+
+
+class Timer:
+    """Count and total time for one kind of operation."""
+
+    def __init__(self):
+        self.count = 0
+        self.ms = 0.0
+
+    def add(self, ms):
+        self.count += 1
+        self.ms += ms
+
+
+def top_timers(timers, key):
+    """The slowest :class:`Timer` entries in a dictionary, as a list of
+    dictionaries with ``key`` for the dictionary key."""
+    slowest = sorted(timers.items(), key=lambda item: item[1].ms, reverse=True)
+    return [
+        {key: name, "count": timer.count, "ms": round(timer.ms, 2)}
+        for name, timer in slowest[:LOG_TOP]
+    ]
+
+
+class RequestTimings:
+    """Measurements for a single request."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.total_ms = 0.0
+        self.sql = Timer()
+        self.sql_sites = defaultdict(Timer)
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.cache_ms = 0.0
+        self.in_cache = False
+        self.render_ms = 0.0
+        self.templates = defaultdict(Timer)
+        self.blocks = defaultdict(Timer)
+        self.renditions = Timer()
+        self.render_depth = 0
+
+    def stop(self):
+        self.total_ms = elapsed_ms(self.start)
+
+    def server_timing(self):
+        """Value for the ``Server-Timing`` header."""
+        return ", ".join(
+            [
+                'sql;dur=%.1f;desc="%d queries"' % (self.sql.ms, self.sql.count),
+                'cache;dur=%.1f;desc="%d hits, %d misses"'
+                % (self.cache_ms, self.cache_hits, self.cache_misses),
+                "render;dur=%.1f" % self.render_ms,
+                'renditions;dur=%.1f;desc="%d generated"'
+                % (self.renditions.ms, self.renditions.count),
+                "total;dur=%.1f" % self.total_ms,
+            ]
+        )
+
+    def as_dict(self):
+        return {
+            "total_ms": round(self.total_ms, 2),
+            "sql": {
+                "count": self.sql.count,
+                "ms": round(self.sql.ms, 2),
+                "sites": top_timers(self.sql_sites, "site"),
+            },
+            "cache": {
+                "hits": self.cache_hits,
+                "misses": self.cache_misses,
+                "ms": round(self.cache_ms, 2),
+            },
+            "render": {
+                "ms": round(self.render_ms, 2),
+                "templates": top_timers(self.templates, "template"),
+                "blocks": top_timers(self.blocks, "block"),
+            },
+            "renditions": {
+                "count": self.renditions.count,
+                "ms": round(self.renditions.ms, 2),
+            },
+        }
+
+
+def iter_call_sites(frame):
+    """Call sites on the stack, innermost first, starting from a frame:
+    ``("code", "path:line function")`` for cdhweb code (other than
+    instrumentation) and ``("template", "name:line")`` for template tags
+    and variables being rendered."""
+    while frame is not None:
+        code = frame.f_code
+        if code.co_name == "render_annotated":
+            # template node; nodes record the template and line they came from
+            node = frame.f_locals.get("self")
+            origin = getattr(node, "origin", None)
+            if origin is not None:
+                yield "template", "%s:%d" % (
+                    origin.template_name or "<string>",
+                    node.token.lineno,
+                )
+        elif (
+            code.co_filename.startswith(SOURCE_DIR)
+            and code.co_filename not in INSTRUMENTATION_FILES
+        ):
+            yield "code", "%s:%d %s" % (
+                os.path.relpath(code.co_filename, SOURCE_DIR),
+                frame.f_lineno,
+                code.co_name,
+            )
+        frame = frame.f_back
+
+
+def query_call_site():
+    """Label for the code that ran the current query: the innermost line of
+    cdhweb code, or the template being rendered if that is more recent."""
+    for kind, site in iter_call_sites(sys._getframe(2)):
+        return site if kind == "code" else "template %s" % site
+    return "other"
+
+
+def time_query(execute, sql, params, many, context):
+    """Database execute wrapper that records query time by call site."""
+    timings = current_timings.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        ms = elapsed_ms(start)
+        timings.sql.add(ms)
+        timings.sql_sites[query_call_site()].add(ms)
+
+
+def timed_template_render(render):
+    @wraps(render)
+    def timed_render(self, context):
+        timings = current_timings.get()
+        if timings is None:
+            return render(self, context)
+        start = time.perf_counter()
+        timings.render_depth += 1
+        try:
+            return render(self, context)
+        finally:
+            timings.render_depth -= 1
+            ms = elapsed_ms(start)
+            timings.templates[self.name or "<string>"].add(ms)
+            # nested templates (includes and extended templates) are
+            # counted in the total for the outermost template
+            if not timings.render_depth:
+                timings.render_ms += ms
+
+    timed_render.timed = True
+    return timed_render
+
+
+def timed_block_render(render):
+    @wraps(render)
+    def wrapper(self, context):
+        timings = current_timings.get()
+        if timings is None:
+            return render(self, context)
+        start = time.perf_counter()
+        try:
+            return render(self, context)
+        finally:
+            timings.blocks[self.name].add(elapsed_ms(start))
+
+    wrapper.timed = True
+    return wrapper
+
+
+def timed_generate_rendition_file(generate):
+    @wraps(generate)
+    def wrapper(self, *args, **kwargs):
+        timings = current_timings.get()
+        if timings is None:
+            return generate(self, *args, **kwargs)
+        start = time.perf_counter()
+        try:
+            return generate(self, *args, **kwargs)
+        finally:
+            timings.renditions.add(elapsed_ms(start))
+
+    wrapper.timed = True
+    return wrapper
+
+
+def timed_cache_get(get):
+    @wraps(get)
+    def wrapper(self, key, default=None, version=None):
+        timings = current_timings.get()
+        if timings is None or timings.in_cache:
+            return get(self, key, default, version)
+        start = time.perf_counter()
+        timings.in_cache = True
+        try:
+            value = get(self, key, MISSING, version)
+        finally:
+            timings.in_cache = False
+        timings.cache_ms += elapsed_ms(start)
+        if value is MISSING:
+            timings.cache_misses += 1
+            return default
+        timings.cache_hits += 1
+        return value
+
+    wrapper.timed = True
+    return wrapper
+
+
+def timed_cache_get_many(get_many):
+    @wraps(get_many)
+    def wrapper(self, keys, version=None):
+        timings = current_timings.get()
+        if timings is None or timings.in_cache:
+            return get_many(self, keys, version)
+        keys = list(keys)
+        start = time.perf_counter()
+        # the default implementation of get_many calls get for each key
+        timings.in_cache = True
+        try:
+            values = get_many(self, keys, version)
+        finally:
+            timings.in_cache = False
+        timings.cache_ms += elapsed_ms(start)
+        timings.cache_hits += len(values)
+        timings.cache_misses += len(keys) - len(values)
+        return values
+
+    wrapper.timed = True
+    return wrapper
+
+
+def install():
+    """Wrap template, block, rendition and cache methods to record timings
+    for measured requests. Methods that are already wrapped are left
+    alone, so this is safe to call more than once."""
+    methods = [
+        (Template, "_render", timed_template_render),
+        (BlockNode, "render", timed_block_render),
+        (AbstractImage, "generate_rendition_file", timed_generate_rendition_file),
+    ]
+    for alias in settings.CACHES:
+        backend = type(caches[alias])
+        methods.append((backend, "get", timed_cache_get))
+        methods.append((backend, "get_many", timed_cache_get_many))
+    for cls, name, timed in methods:
+        method = getattr(cls, name)
+        if not getattr(method, "timed", False):
+            setattr(cls, name, timed(method))
+
+
+def record_report(path, timings):
+    """Add request timings to the per-url totals for the slow urls report.
+    Totals are updated in the database with a single update query, so
+    concurrent requests are all counted; when a new url is added, urls that
+    have not been requested within :data:`REPORT_MAX_AGE` and the fastest
+    beyond :data:`REPORT_MAX_URLS` are removed."""
+    now = timezone.now()
+    totals = {
+        "count": F("count") + 1,
+        "total_ms": F("total_ms") + timings.total_ms,
+        "max_ms": Greatest("max_ms", Value(timings.total_ms)),
+        "sql_count": Greatest("sql_count", Value(timings.sql.count)),
+        "updated": now,
+    }
+    if UrlTiming.objects.filter(url=path).update(**totals):
+        return
+    try:
+        with transaction.atomic():
+            UrlTiming.objects.create(
+                url=path,
+                count=1,
+                total_ms=timings.total_ms,
+                max_ms=timings.total_ms,
+                sql_count=timings.sql.count,
+                updated=now,
+            )
+    except IntegrityError:
+        # added by a concurrent request
+        UrlTiming.objects.filter(url=path).update(**totals)
+        return
+    UrlTiming.objects.filter(updated__lt=now - REPORT_MAX_AGE).delete()
+    fastest = UrlTiming.objects.order_by("-max_ms").values_list("pk", flat=True)
+    UrlTiming.objects.filter(pk__in=list(fastest[REPORT_MAX_URLS:])).delete()
+
+
+def get_report(order="max_ms"):
+    """Per-url totals for the slow urls report, slowest first, ordered by
+    maximum time (``max_ms``), average time (``avg_ms``) or number of
+    requests (``count``)."""
+    return (
+        UrlTiming.objects.filter(updated__gte=timezone.now() - REPORT_MAX_AGE)
+        .annotate(avg_ms=F("total_ms") / F("count"))
+        .order_by("-%s" % order)
+        .values("url", "count", "total_ms", "max_ms", "avg_ms", "sql_count")
+    )
+
+
+def clear_report():
+    """Remove all totals from the slow urls report."""
+    UrlTiming.objects.all().delete()
+
+
+class ServerTimingMiddleware:
+    """Measure SQL, cache, template and rendition time for each request;
+    add ``Server-Timing`` headers, log the details and update the slow
+    urls report. Only used when the ``SERVER_TIMING`` setting is enabled;
+    should be first in the middleware list to include the time spent in
+    other middleware."""
+
+    def __init__(self, get_response):
+        if not getattr(settings, "SERVER_TIMING", False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        install()
+
+    def __call__(self, request):
+        timings = RequestTimings()
+        token = current_timings.set(timings)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(time_query))
+                response = self.get_response(request)
+        finally:
+            current_timings.reset(token)
+        timings.stop()
+
+        response["Server-Timing"] = timings.server_timing()
+        data = {
+            "method": request.method,
+            "path": request.path,
+            "status": response.status_code,
+            **timings.as_dict(),
+        }
+        logger.info(json.dumps(data), extra={"timing": data})
+        if response.status_code != 404:
+            record_report(request.path, timings)
+        return response
@@ -0,0 +1,335 @@
+"""
+Framework for bulk transformations of StreamField content.
+
+A :class:`StreamTransform` describes a change to the raw (JSON) data of a
+StreamField, one block at a time or for a whole stream. A
+:class:`TransformRunner` applies it to every page with that field:
+
+- pages are read in chunks of raw field data for each page type, in id
+  order, without instantiating page objects;
+- transformations run in a pool of worker processes, since they are
+  typically CPU-bound (e.g. regular expressions); the database is only
+  accessed from the main process;
+- each changed page gets a single new revision, published if the page is
+  live; pages with unpublished changes (drafts of live pages, or pages that
+  were never published or have been unpublished) are skipped and reported,
+  since the content read is not their latest version;
+- progress is recorded in a checkpoint file after every chunk, so an
+  interrupted run resumes where it stopped;
+- in dry-run mode nothing is saved, and unified diffs of the changes are
+  reported instead;
+- the number of pages examined and changed and the rate are reported for
+  each page type.
+
+Transforms must be defined at module level, so that they can be sent to
+worker processes.
+"""
+
+import difflib
+import json
+import multiprocessing
+import os
+import time
+from collections import deque
+from functools import partial
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from wagtail.models import get_page_models
+
+
+class StreamTransform:
+    """Base class for StreamField transformations. Subclasses should
+    implement :meth:`transform_value` to change the values of individual
+    blocks, or :meth:`transform_stream` to change the whole stream."""
+
+    #: name of the StreamField to transform
+    field = "body"
+    #: block types to transform; None for all block types
+    block_types = None
+
+    def transform_value(self, block_type, value):
+        """Transform the raw value of a single top-level block."""
+        return value
+
+    def transform_stream(self, stream):
+        """Transform raw stream data (a list of block dictionaries with
+        ``type`` and ``value``); returns the new list of blocks."""
+        transformed = []
+        for block in stream:
+            if self.block_types is None or block["type"] in self.block_types:
+                value = self.transform_value(block["type"], block["value"])
+                block = dict(block, value=value)
+            transformed.append(block)
+        return transformed
+
+    def warnings(self, stream):
+        """Messages about transformed stream data that may need attention
+        (e.g. content that couldn't be cleaned up automatically)."""
+        return []
+
+
+class TransformResult:
+    """The result of transforming one page's stream data."""
+
+    def __init__(self, pk, title, stream, warnings=None, diff=None):
+        self.pk = pk
+        self.title = title
+        self.stream = stream
+        self.warnings = warnings or []
+        self.diff = diff
+
+
+def stream_lines(stream):
+    """Lines of text for stream data, for comparing versions."""
+    lines = []
+    for block in stream:
+        lines.append("[%s]" % block["type"])
+        if isinstance(block["value"], str):
+            lines.extend(block["value"].splitlines())
+        else:
+            lines.extend(
+                json.dumps(block["value"], indent=2, sort_keys=True).splitlines()
+            )
+    return lines
+
+
+def apply_transform(transform, rows, diff=False):
+    """Apply a transform to a chunk of ``(pk, title, stream)`` rows.
+    Returns the id of the last row and a list of :class:`TransformResult`
+    for the rows that changed. Runs in worker processes."""
+    results = []
+    for pk, title, stream in rows:
+        transformed = transform.transform_stream(stream)
+        if transformed == stream:
+            continue
+        result = TransformResult(pk, title, transformed, transform.warnings(stream))
+        if diff:
+            result.diff = "\n".join(
+                difflib.unified_diff(
+                    stream_lines(stream),
+                    stream_lines(transformed),
+                    "page %s (before)" % pk,
+                    "page %s (after)" % pk,
+                    lineterm="",
+                )
+            )
+        results.append(result)
+    return rows[-1][0], results
+
+
+class TransformStats:
+    """Counts and timing for a transformation run."""
+
+    def __init__(self, label):
+        self.label = label
+        self.examined = 0
+        self.changed = 0
+        self.skipped = 0
+        self.errors = 0
+        self.start = time.monotonic()
+        self.elapsed = 0
+
+    def __str__(self):
+        rate = self.examined / self.elapsed if self.elapsed else 0
+        summary = "%s: %d pages examined, %d changed in %.1fs (%d pages/s)" % (
+            self.label,
+            self.examined,
+            self.changed,
+            self.elapsed,
+            rate,
+        )
+        if self.skipped:
+            summary += ", %d skipped with unpublished changes" % self.skipped
+        if self.errors:
+            summary += ", %d errors" % self.errors
+        return summary
+
+    def stop(self):
+        self.elapsed = time.monotonic() - self.start
+
+
+class TransformRunner:
+    """Apply a :class:`StreamTransform` to all pages with its field.
+
+    :param transform: the transform to apply
+    :param chunk_size: number of pages to read and transform at a time
+    :param workers: number of worker processes; if 1, transforms run in
+        the current process
+    :param checkpoint: path to a checkpoint file for resuming interrupted
+        runs; removed when the run completes
+    :param dry_run: if True, report changes without saving them
+    :param diff: if True, report unified diffs of changes
+    :param stdout: output stream for progress, diffs and warnings
+    """
+
+    def __init__(
+        self,
+        transform,
+        chunk_size=100,
+        workers=1,
+        checkpoint=None,
+        dry_run=False,
+        diff=False,
+        stdout=None,
+    ):
+        self.transform = transform
+        self.chunk_size = chunk_size
+        self.workers = workers
+        self.checkpoint = checkpoint
+        self.dry_run = dry_run
+        self.diff = diff
+        self.stdout = stdout
+        self.state = {"done": [], "last_pk": {}}
+        self.warnings = []
+        self.skipped = []
+
+    def write(self, message):
+        if self.stdout:
+            self.stdout.write(message)
+
+    def get_models(self):
+        """Page models with the transformed field."""
+        return [
+            model
+            for model in get_page_models()
+            if self.transform.field
+            in [field.name for field in model._meta.get_fields()]
+        ]
+
+    def load_checkpoint(self):
+        if self.checkpoint and os.path.exists(self.checkpoint):
+            with open(self.checkpoint) as checkpoint:
+                self.state = json.load(checkpoint)
+            self.write("Resuming from %s" % self.checkpoint)
+
+    def save_checkpoint(self):
+        if self.checkpoint and not self.dry_run:
+            # write and rename, so the checkpoint is never incomplete
+            tmp_path = "%s.tmp" % self.checkpoint
+            with open(tmp_path, "w") as checkpoint:
+                json.dump(self.state, checkpoint)
+            os.replace(tmp_path, self.checkpoint)
+
+    def iter_chunks(self, model, after=None):
+        """Chunks of ``(pk, title, stream data)`` for pages of a single type
+        (not including subclasses), in id order, after an optional id."""
+        pages = model.objects.exact_type(model).order_by("pk")
+        if after is not None:
+            pages = pages.filter(pk__gt=after)
+        while True:
+            rows = [
+                (pk, title, list(stream.raw_data))
+                for pk, title, stream in pages.values_list(
+                    "pk", "title", self.transform.field
+                )[: self.chunk_size]
+            ]
+            if not rows:
+                return
+            yield rows
+            pages = pages.filter(pk__gt=rows[-1][0])
+
+    def run(self):
+        """Apply the transform to all pages; returns a list of
+        :class:`TransformStats` for each page type, and the total."""
+        self.load_checkpoint()
+        worker = partial(apply_transform, self.transform, diff=self.diff)
+        pool = None
+        if self.workers > 1:
+            pool = multiprocessing.get_context("fork").Pool(self.workers)
+
+        total = TransformStats("Total")
+        all_stats = []
+        try:
+            for model in self.get_models():
+                label = model._meta.label_lower
+                if label in self.state["done"]:
+                    continue
+                stats = TransformStats(model._meta.label)
+                after = self.state["last_pk"].get(label)
+                if pool:
+                    # read chunks in this process, keeping a few queued for
+                    # each worker
+                    pending = deque()
+                    for rows in self.iter_chunks(model, after):
+                        pending.append((len(rows), pool.apply_async(worker, (rows,))))
+                        if len(pending) > self.workers * 2:
+                            count, result = pending.popleft()
+                            self.process(model, stats, count, *result.get())
+                    while pending:
+                        count, result = pending.popleft()
+                        self.process(model, stats, count, *result.get())
+                else:
+                    for rows in self.iter_chunks(model, after):
+                        self.process(model, stats, len(rows), *worker(rows))
+
+                stats.stop()
+                self.state["done"].append(label)
+                self.state["last_pk"].pop(label, None)
+                self.save_checkpoint()
+                if stats.examined:
+                    all_stats.append(stats)
+                    self.write(str(stats))
+                total.examined += stats.examined
+                total.changed += stats.changed
+                total.skipped += stats.skipped
+                total.errors += stats.errors
+        finally:
+            if pool:
+                pool.close()
+                pool.join()
+
+        if self.checkpoint and not self.dry_run and os.path.exists(self.checkpoint):
+            os.remove(self.checkpoint)
+        total.stop()
+        self.write(str(total))
+        return all_stats + [total]
+
+    def process(self, model, stats, count, last_pk, results):
+        """Report and save the results for a chunk of pages."""
+        stats.examined += count
+        # the content read is only the latest version of pages without
+        # unpublished changes; saving the others would replace the draft
+        drafts = set(
+            model.objects.filter(
+                pk__in=[result.pk for result in results], has_unpublished_changes=True
+            ).values_list("pk", flat=True)
+        )
+        for result in [result for result in results if result.pk in drafts]:
+            self.skipped.append((model, result))
+            self.write(
+                "%s %s: skipped, has unpublished changes"
+                % (model._meta.label, result.pk)
+            )
+        results = [result for result in results if result.pk not in drafts]
+        stats.skipped += len(drafts)
+        for result in results:
+            if self.diff and result.diff:
+                self.write(result.diff)
+            for warning in result.warnings:
+                self.warnings.append((model, result, warning))
+                self.write("%s %s: %s" % (model._meta.label, result.pk, warning))
+        if not self.dry_run:
+            stats.errors += self.save(model, results)
+        stats.changed += len(results)
+        self.state["last_pk"][model._meta.label_lower] = last_pk
+        self.save_checkpoint()
+
+    def save(self, model, results):
+        """Save a new revision with the transformed content for each page,
+        publishing it if the page is live. Returns the number of pages that
+        couldn't be saved."""
+        errors = 0
+        pages = model.objects.in_bulk([result.pk for result in results])
+        for result in results:
+            page = pages[result.pk]
+            setattr(page, self.transform.field, result.stream)
+            try:
+                with transaction.atomic():
+                    revision = page.save_revision()
+                    if page.live:
+                        revision.publish()
+            except ValidationError as err:
+                errors += 1
+                self.write("Error saving %s %s: %s" % (model._meta.label, page.pk, err))
+        return errors
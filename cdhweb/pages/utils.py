@@ -1,8 +1,11 @@
 from urllib.parse import urljoin
-from wagtail.models import Site
-from django.forms.widgets import TextInput
 
+from django.contrib.contenttypes.models import ContentType
+from django.db.models import F
+from django.forms.widgets import TextInput
 from django.templatetags.static import static
+from django.utils import timezone
+from wagtail.models import Page, Site
 
 
 def absolutize_url(local_url, request=None):
@@ -63,6 +66,23 @@ def get_first_of(instance, *fields, default=None):
     )
 
 
+def get_website_link(instance):
+    """
+    Return the first related link of type "Website" for `instance` (a person
+    or project), using prefetched related links where available.
+    """
+    if "related_links" in getattr(instance, "_prefetched_objects_cache", {}):
+        return next(
+            (
+                link
+                for link in instance.related_links.all()
+                if link.type.name == "Website"
+            ),
+            None,
+        )
+    return instance.related_links.filter(type__name="Website").first()
+
+
 def get_default_preview_img_url():
     from cdhweb.pages.models import PurpleMode
 
@@ -74,3 +94,58 @@ def get_default_preview_img_url():
         default_preview_img = "images/cdhlogo_square.jpg"
 
     return absolutize_url(static(default_preview_img))
+
+
+def bulk_add_children(parent, pages, batch_size=500):
+    """
+    Add unsaved pages of a single type as live children of `parent` in bulk.
+    Tree paths are allocated in one step and pages are inserted in batches,
+    instead of querying and saving each page as ``add_child`` does. No
+    revisions are created and no signals are sent, so anything normally
+    updated on publish (search index, cached indexes) must be refreshed
+    afterwards.
+    """
+    if not pages:
+        return pages
+    model = type(pages[0])
+    # reload to get the current number of children
+    parent = Page.objects.get(pk=parent.pk)
+    last_child = parent.get_last_child()
+    step = Page._str2int(last_child.path[-Page.steplen :]) if last_child else 0
+    content_type = ContentType.objects.get_for_model(model)
+    now = timezone.now()
+    for page in pages:
+        step += 1
+        page.depth = parent.depth + 1
+        page.path = Page._get_path(parent.path, page.depth, step)
+        page.numchild = 0
+        page.url_path = parent.url_path + page.slug + "/"
+        page.content_type = content_type
+        page.locale_id = parent.locale_id
+        page.draft_title = page.title
+        page.live = True
+        page.has_unpublished_changes = False
+        page.first_published_at = page.first_published_at or now
+        page.last_published_at = page.last_published_at or page.first_published_at
+
+    # multi-table inheritance isn't supported by bulk_create, so create base
+    # pages and then insert rows for the other tables with the same ids
+    page_fields = [f for f in Page._meta.local_concrete_fields if not f.primary_key]
+    tables = [m for m in reversed(model._meta.get_parent_list()) if m is not Page]
+    for i in range(0, len(pages), batch_size):
+        batch = pages[i : i + batch_size]
+        base_pages = Page.objects.bulk_create(
+            [
+                Page(**{f.attname: getattr(p, f.attname) for f in page_fields})
+                for p in batch
+            ]
+        )
+        for page, base_page in zip(batch, base_pages):
+            page.id = page.pk = base_page.pk
+        for table in tables + [model]:
+            table._base_manager._insert(batch, fields=table._meta.local_concrete_fields)
+        for page in batch:
+            page._state.adding = False
+
+    Page.objects.filter(pk=parent.pk).update(numchild=F("numchild") + len(pages))
+    return pages
@@ -1,13 +1,31 @@
 import operator
+import os
 
+from django.conf import settings
+from django.core.exceptions import PermissionDenied
+from django.core.files.storage import default_storage
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseBadRequest
+from django.shortcuts import get_object_or_404, redirect
 from django.utils.cache import get_conditional_response
 from django.views.generic import ListView, TemplateView
 from django.views.generic.base import View
 from django.views.generic.edit import FormMixin
+from wagtail import hooks
+from wagtail.documents import get_document_model
+from wagtail.documents.models import document_served
 from wagtail.models import Page
 from wagtail.search.utils import parse_query_string
 
+from cdhweb.pages import profiling, timing
+from cdhweb.pages.documents import serve_document_file
 from cdhweb.pages.forms import SiteSearchFilters, SiteSearchForm
+from cdhweb.pages.models import RequestProfile
+from cdhweb.pages.sitemaps import (
+    SITEMAPS,
+    sitemap_filename,
+    write_sitemap,
+    write_sitemap_index,
+)
 
 
 class LastModifiedMixin(View):
@@ -113,3 +131,145 @@ class OpenSearchDescriptionView(TemplateView):
 
     template_name = "cdhpages/opensearch_description.xml"
     content_type = "application/opensearchdescription+xml"
+
+
+class SitemapView(View):
+    """Serve a prebuilt sitemap file for a section of the site, or the
+    sitemap index if no section is specified. Sitemaps that haven't been
+    generated yet are built on first request."""
+
+    def get(self, request, section=None):
+        if section is not None and section not in SITEMAPS:
+            raise Http404("No sitemap for section %s" % section)
+
+        filename = sitemap_filename(section)
+        if not default_storage.exists(filename):
+            if section is None:
+                write_sitemap_index()
+            else:
+                write_sitemap(section)
+
+        return FileResponse(
+            default_storage.open(filename), content_type="application/xml"
+        )
+
+
+class DocumentServeView(View):
+    """Serve a document after the same access checks as wagtail's document
+    serve view, handing the file to the front-end server if configured;
+    see :mod:`cdhweb.pages.documents`."""
+
+    def get(self, request, document_id, document_filename):
+        Document = get_document_model()
+        document = get_object_or_404(Document, id=document_id)
+        if document.filename != document_filename:
+            raise Http404("This document does not match the given filename.")
+
+        # view restrictions and any other checks registered by apps
+        for fn in hooks.get_hooks("before_serve_document"):
+            result = fn(document, request)
+            if isinstance(result, HttpResponse):
+                return result
+        document_served.send(sender=Document, instance=document, request=request)
+
+        try:
+            path = document.file.path
+        except NotImplementedError:
+            # storage without local files
+            return redirect(document.file.url)
+        if not os.path.exists(path):
+            raise Http404("Document file not found")
+        return serve_document_file(request, document, path)
+
+
+class StaffRequiredMixin(View):
+    """Mixin for admin views that are only available to staff users."""
+
+    def dispatch(self, request, *args, **kwargs):
+        if not request.user.is_staff:
+            raise PermissionDenied
+        return super().dispatch(request, *args, **kwargs)
+
+
+class SlowUrlsReportView(StaffRequiredMixin, TemplateView):
+    """Staff-only wagtail admin report of the slowest urls, from totals
+    collected by :class:`~cdhweb.pages.timing.ServerTimingMiddleware`.
+    Posting to the report clears it."""
+
+    template_name = "cdhpages/slow_urls_report.html"
+    #: orderings for the report, by url parameter
+    orderings = {"max": "max_ms", "avg": "avg_ms", "count": "count"}
+    #: number of urls to display
+    limit = 100
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        order = self.request.GET.get("order")
+        if order not in self.orderings:
+            order = "max"
+        context.update(
+            {
+                "title": "Slow URLs",
+                "header_icon": "time",
+                "order": order,
+                "rows": timing.get_report(self.orderings[order])[: self.limit],
+                "enabled": getattr(settings, "SERVER_TIMING", False),
+            }
+        )
+        return context
+
+    def post(self, request, *args, **kwargs):
+        timing.clear_report()
+        return redirect(request.path)
+
+
+class RequestProfilesReportView(StaffRequiredMixin, ListView):
+    """Staff-only wagtail admin list of request profiles saved by
+    :class:`~cdhweb.pages.profiling.ProfilingMiddleware`, with instructions
+    and a token for profiling requests. Posting a profile id deletes that
+    profile; posting without one deletes all profiles."""
+
+    template_name = "cdhpages/request_profiles_report.html"
+    context_object_name = "profiles"
+
+    def get_queryset(self):
+        return RequestProfile.objects.select_related("user")
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context.update(
+            {
+                "title": "Request profiles",
+                "header_icon": "time",
+                "enabled": getattr(settings, "REQUEST_PROFILING", False),
+                "param": profiling.PROFILE_PARAM,
+                "header": profiling.PROFILE_HEADER,
+                "token": profiling.make_token(self.request.user),
+            }
+        )
+        return context
+
+    def post(self, request, *args, **kwargs):
+        profiles = RequestProfile.objects.all()
+        profile_id = request.POST.get("profile")
+        if profile_id:
+            if not profile_id.isdigit():
+                return HttpResponseBadRequest("Invalid profile id")
+            profiles = profiles.filter(pk=profile_id)
+        # delete individually to remove files
+        for profile in profiles:
+            profile.delete()
+        return redirect(request.path)
+
+
+class RequestProfileDownloadView(StaffRequiredMixin, View):
+    """Staff-only download of a request profile file."""
+
+    def get(self, request, pk):
+        profile = get_object_or_404(RequestProfile, pk=pk)
+        return FileResponse(
+            profile.file.open("rb"),
+            as_attachment=True,
+            filename="profile-%d.speedscope.json" % profile.pk,
+            content_type="application/json",
+        )
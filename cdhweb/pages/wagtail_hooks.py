@@ -1,8 +1,22 @@
 from django.templatetags.static import static
+from django.urls import path, reverse
 from django.utils.html import format_html
 from wagtail import hooks
+from wagtail.admin.menu import MenuItem
 from wagtail.contrib.redirects.models import Redirect
 
+from cdhweb.pages.benchmarks import Benchmark, page_benchmark
+from cdhweb.pages.embeds import prefetch_form_embeds
+from cdhweb.pages.mixin import OpenGraphMixin
+from cdhweb.pages.models import ContentPage, HomePage
+from cdhweb.pages.schedule import TimeBoundary
+from cdhweb.pages.snippets import SiteAlert
+from cdhweb.pages.views import (
+    RequestProfileDownloadView,
+    RequestProfilesReportView,
+    SlowUrlsReportView,
+)
+
 
 @hooks.register("insert_global_admin_css")
 def global_admin_css():
@@ -19,4 +33,100 @@ def register_exodus_log_action(actions):
     actions.register_action("cdhweb.exodus", "Exodus", "Migrated from cdhweb v2")
 
 
+@hooks.register("register_time_boundaries")
+def register_site_alert_boundaries():
+    """Update displayed site alerts when display windows start and end."""
+    return [
+        TimeBoundary(
+            "site-alerts", "cdhpages.SiteAlert", field, cache_keys=[SiteAlert.cache_key]
+        )
+        for field in ["display_from", "display_until"]
+    ]
+
+
+@hooks.register("before_create_page")
+def prefetch_created_page_embeds(request, parent_page, page_class):
+    """Fetch embeds in a new page concurrently before the form is
+    validated, rather than one at a time during validation."""
+    if request.method == "POST":
+        prefetch_form_embeds(page_class, request)
+
+
+@hooks.register("before_edit_page")
+def prefetch_edited_page_embeds(request, page):
+    """Fetch embeds in an edited page concurrently before the form is
+    validated, rather than one at a time during validation."""
+    if request.method == "POST":
+        prefetch_form_embeds(page.specific_class, request)
+
+
 # redirects automatically created by wagtail startind in wagtail 3.0
+
+
+@hooks.register("register_benchmarks")
+def register_page_benchmarks():
+    """Home page, a content page and site search."""
+    return [
+        *page_benchmark("home", HomePage.objects.all(), 20),
+        *page_benchmark("content-page", ContentPage.objects.all(), 30),
+        Benchmark("search", "/search/?q=data", 15),
+    ]
+
+
+@hooks.register("register_rendition_specs")
+def register_og_image_spec():
+    """Open graph preview images, generated in code rather than templates."""
+    return [OpenGraphMixin.og_image_spec]
+
+
+class StaffMenuItem(MenuItem):
+    """Admin menu item only shown to staff users."""
+
+    def is_shown(self, request):
+        return request.user.is_staff
+
+
+@hooks.register("register_admin_urls")
+def register_slow_urls_report_url():
+    return [
+        path(
+            "reports/slow-urls/",
+            SlowUrlsReportView.as_view(),
+            name="slow_urls_report",
+        ),
+    ]
+
+
+@hooks.register("register_reports_menu_item")
+def register_slow_urls_report_menu_item():
+    """Report of the slowest urls timed by the server timing middleware."""
+    return StaffMenuItem(
+        "Slow URLs", reverse("slow_urls_report"), icon_name="time", order=700
+    )
+
+
+@hooks.register("register_admin_urls")
+def register_request_profiles_urls():
+    return [
+        path(
+            "reports/request-profiles/",
+            RequestProfilesReportView.as_view(),
+            name="request_profiles_report",
+        ),
+        path(
+            "reports/request-profiles/<int:pk>/",
+            RequestProfileDownloadView.as_view(),
+            name="request_profile_download",
+        ),
+    ]
+
+
+@hooks.register("register_reports_menu_item")
+def register_request_profiles_menu_item():
+    """Sampling profiles of individual requests."""
+    return StaffMenuItem(
+        "Request profiles",
+        reverse("request_profiles_report"),
+        icon_name="time",
+        order=710,
+    )
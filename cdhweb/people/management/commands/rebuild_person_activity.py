@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from cdhweb.people.models import PersonActivity
+
+
+class Command(BaseCommand):
+    """Rebuild the index of blog posts, events and projects associated with
+    each person, used for recent activity on profile pages."""
+
+    help = __doc__
+
+    def handle(self, *args, **options):
+        PersonActivity.rebuild()
+        if options["verbosity"]:
+            self.stdout.write(
+                "Rebuilt person activity (%d entries)" % PersonActivity.objects.count(),
+                style_func=self.style.SUCCESS,
+            )
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from cdhweb.people.models import PersonCategory
+
+
+class Command(BaseCommand):
+    """Recalculate which people are listed on each people category page.
+    Run with --changed every few minutes (e.g. from cron), so that edits to
+    people, positions, memberships and grants are reflected."""
+
+    help = __doc__
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--changed",
+            action="store_true",
+            help="Only refresh if people, positions, memberships or grants "
+            "have changed since the last refresh",
+        )
+
+    def handle(self, *args, **options):
+        if options["changed"]:
+            refreshed = PersonCategory.refresh_if_changed()
+        else:
+            PersonCategory.refresh()
+            refreshed = True
+        if not options["verbosity"]:
+            return
+        if refreshed:
+            self.stdout.write(
+                "Refreshed people categories (%d entries)"
+                % PersonCategory.objects.count(),
+                style_func=self.style.SUCCESS,
+            )
+        else:
+            self.stdout.write("People categories are up to date")
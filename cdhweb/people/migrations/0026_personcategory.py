@@ -0,0 +1,31 @@
+# Generated by Django 5.0.14 on 2026-10-19 14:47
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('people', '0025_alter_peoplecategorypage_body_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PersonCategory',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('category', models.CharField(choices=[('staff', 'Staff'), ('past_staff', 'Past Staff'), ('students', 'Students'), ('alumni', 'Alumni'), ('affiliates', 'Affiliates'), ('past_affiliates', 'Past Affiliates'), ('executive_committee', 'Executive Committee'), ('sits_with_executive_committee', 'Sits with Executive Committee'), ('past executive committee', 'Past Executive Committee')], max_length=50)),
+                ('sort_order', models.PositiveIntegerField()),
+                ('person', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='categories', to='people.person')),
+            ],
+            options={
+                'ordering': ['category', 'sort_order'],
+                'indexes': [models.Index(fields=['category', 'sort_order'], name='people_pers_categor_2fae0e_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='personcategory',
+            constraint=models.UniqueConstraint(fields=('category', 'person'), name='unique_person_category'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.0.14 on 2026-10-19 14:54
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('people', '0026_personcategory'),
+        ('wagtailcore', '0089_log_entry_data_json_null_to_object'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PersonActivity',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('post', 'Blog post'), ('event', 'Event'), ('project', 'Project')], max_length=10)),
+                ('date', models.DateTimeField(help_text='Date used to order the timeline', null=True)),
+                ('end_time', models.DateTimeField(help_text='End of the event; only listed once it is past', null=True)),
+                ('page', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='wagtailcore.page')),
+                ('person', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='activity', to='people.person')),
+            ],
+            options={
+                'verbose_name_plural': 'person activity',
+                'indexes': [models.Index(fields=['person', '-date'], name='people_pers_person__182555_idx'), models.Index(fields=['person', 'kind', '-date'], name='people_pers_person__da3a56_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='personactivity',
+            constraint=models.UniqueConstraint(fields=('person', 'page'), name='unique_person_activity'),
+        ),
+    ]
@@ -1,11 +1,16 @@
+import datetime
 from datetime import date
+from functools import partial
 
+from django.apps import apps
 from django.contrib.auth.models import User
+from django.core.cache import cache
 from django.core.exceptions import ValidationError
-from django.db import models
-from django.db.models import Case, DateField, Max, Value, When
-from django.db.models.functions import Greatest
-from django.db.models.signals import pre_delete
+from django.core.paginator import Paginator
+from django.db import models, transaction
+from django.db.models import Case, DateField, F, Max, Value, When, Window
+from django.db.models.functions import Greatest, RowNumber
+from django.db.models.signals import post_delete, post_save, pre_delete
 from django.dispatch import receiver
 from django.shortcuts import get_object_or_404
 from django.urls import reverse
@@ -21,6 +26,7 @@ from wagtail.contrib.routable_page.models import RoutablePageMixin, path, re_pat
 from wagtail.fields import RichTextField
 from wagtail.models import Page
 from wagtail.search import index
+from wagtail.signals import page_published, page_unpublished
 
 from cdhweb.pages.mixin import SidebarNavigationMixin, StandardHeroMixin
 from cdhweb.pages.models import (
@@ -32,6 +38,8 @@ from cdhweb.pages.models import (
     LinkPage,
     RelatedLink,
 )
+from cdhweb.pages.schedule import bump_generation, get_generation
+from cdhweb.pages.utils import get_website_link
 
 
 class Title(models.Model):
@@ -262,6 +270,38 @@ class PersonQuerySet(models.QuerySet):
             min_start=models.Min("positions__start_date"),
         ).order_by("min_title", "min_start", "last_name")
 
+    @staticmethod
+    def tile_position_prefetches():
+        """Prefetch lookups for positions (with titles) and for project
+        memberships (with roles, projects and project grants with grant
+        types); see :meth:`prefetch_tile_positions`."""
+        # NOTE import here to avoid a circular import; projects depend on people
+        from cdhweb.projects.models import Grant, Membership
+
+        return [
+            models.Prefetch(
+                "positions", queryset=Position.objects.select_related("title")
+            ),
+            models.Prefetch(
+                "membership_set",
+                queryset=Membership.objects.select_related(
+                    "role", "project"
+                ).prefetch_related(
+                    models.Prefetch(
+                        "project__grants",
+                        queryset=Grant.objects.select_related("grant_type"),
+                    )
+                ),
+            ),
+        ]
+
+    def prefetch_tile_positions(self):
+        """Prefetch positions, project memberships (with roles and projects)
+        and project grants (with grant types), so that position labels for
+        tiles can be determined in memory for every person in the queryset;
+        see :meth:`Person.get_position_for_tile`."""
+        return self.prefetch_related(*self.tile_position_prefetches())
+
 
 class PersonTag(TaggedItemBase):
     """Tags for Profile Pages"""
@@ -393,14 +433,16 @@ class Person(ClusterableModel):
     @property
     def current_title(self):
         """Return the first of any non-expired titles held by this Person."""
-        current_positions = self.positions.filter(end_date__isnull=True)
-        if current_positions.exists():
-            return current_positions.first().title
+        # use prefetched positions if available
+        for position in self.positions.all():
+            if position.end_date is None:
+                return position.title
 
     @property
     def most_recent_title(self):
         """Return the most recent of any titles held by this Person."""
-        most_recent_position = self.positions.first()
+        # positions are ordered most recent first; use prefetched if available
+        most_recent_position = next(iter(self.positions.all()), None)
         if most_recent_position:
             return most_recent_position.title
 
@@ -410,6 +452,10 @@ class Person(ClusterableModel):
         # find projects where they are director, then get newest grant
         # that overlaps with their directorship dates
 
+        # use prefetched memberships and grants if available
+        if "membership_set" in getattr(self, "_prefetched_objects_cache", {}):
+            return self._latest_grant_prefetched()
+
         mship = (
             self.membership_set.filter(role__title__in=PersonQuerySet.affiliate_roles)
             .order_by("-start_date")
@@ -437,6 +483,26 @@ class Person(ClusterableModel):
                 .first()
             )
 
+    def _latest_grant_prefetched(self):
+        """In-memory equivalent of :attr:`latest_grant`, for use with
+        memberships and grants loaded by
+        :meth:`PersonQuerySet.prefetch_tile_positions`."""
+        directorships = [
+            mship
+            for mship in self.membership_set.all()
+            if mship.role.title in PersonQuerySet.affiliate_roles
+        ]
+        if not directorships:
+            return None
+        mship = max(directorships, key=lambda mship: mship.start_date)
+        grants = [
+            grant
+            for grant in mship.project.grants.all()
+            if (grant.end_date is None or grant.end_date >= mship.start_date)
+            and (not mship.end_date or grant.start_date <= mship.end_date)
+        ]
+        return max(grants, key=lambda grant: grant.start_date, default=None)
+
     @property
     def profile_url(self):
         """Provide the link to published profile on this site if there is one;
@@ -448,45 +514,41 @@ class Person(ClusterableModel):
         except Profile.DoesNotExist:
             pass
 
-        website = self.related_links.filter(type__name="Website").first()
+        website = get_website_link(self)
         if website:
             return website.url
 
     def get_position_for_tile(self, category):
-        HUM_DATASCI = "Humanities + Data Science Institute"
-        if category in ["staff", "past_staff"]:
-            if self.positions.first():
-                latest_position = self.positions.first()
-                if latest_position.is_current:
-                    return latest_position.title
-                else:
-                    return "%s %s" % (latest_position.years, latest_position.title)
+        """Label for this person's position, for display on a tile on the
+        :class:`PeopleCategoryPage` for the specified category.
 
-        elif category in ["students", "alumni"]:
-            if self.positions.first():
-                latest_position = self.positions.first()
+        Only iterates over positions and memberships, so when a whole
+        category is labeled with :meth:`PersonQuerySet.prefetch_tile_positions`
+        no additional queries are needed."""
+        HUM_DATASCI = "Humanities + Data Science Institute"
+        if category in ["staff", "past_staff", "students", "alumni"]:
+            # positions are ordered most recent first
+            latest_position = next(iter(self.positions.all()), None)
+            if latest_position:
                 if latest_position.is_current:
                     return latest_position.title
                 else:
                     return "%s %s" % (latest_position.years, latest_position.title)
 
-            # if student was a project director, show as grant recipient/fellow
-            elif self.latest_grant:
-                if "Fellow" in self.latest_grant.grant_type.grant_type:
-                    no_ship = self.latest_grant.grant_type.grant_type.split("ship", 1)[
-                        0
-                    ]
-                    return f"{self.latest_grant.years} {no_ship}"
-                else:
-                    # otherwise "X grant recipient"
-                    return f"{self.latest_grant.years} {self.latest_grant.grant_type.grant_type} Grant Recipient"
+            if category in ["students", "alumni"]:
+                # if student was a project director, show as grant recipient/fellow
+                latest_grant = self.latest_grant
+                if latest_grant:
+                    return self.grant_label(latest_grant)
 
-            elif self.membership_set:
                 # for students on projects, label based on project membership
                 roles = set(
                     PersonQuerySet.project_roles + PersonQuerySet.affiliate_roles
                 ) - {"Project Director"}
-                for membership in self.membership_set.filter(role__title__in=roles):
+                # memberships are ordered by role
+                for membership in self.membership_set.all():
+                    if membership.role.title not in roles:
+                        continue
                     # NOTE: it might be better to use memberships for
                     # project director / grant role as well, but with the new
                     # data model it's harder to determine what type of grant they were on
@@ -500,17 +562,26 @@ class Person(ClusterableModel):
                         return "%s %s" % (membership.years, label)
 
         elif category in ["affiliates", "past_affiliates"]:
-            mship = self.membership_set.first()
-            if mship.project.title == HUM_DATASCI:
-                return "%s %s" % (HUM_DATASCI, self.membership_set.first().role.title)
-            elif "Fellow" in self.latest_grant.grant_type.grant_type:
-                no_ship = self.latest_grant.grant_type.grant_type.split("ship", 1)[0]
-                return f"{self.latest_grant.years} {no_ship}"
-            else:
-                return f"{self.latest_grant.years} {self.latest_grant.grant_type.grant_type} Grant Recipient"
+            mship = next(iter(self.membership_set.all()), None)
+            if mship and mship.project.title == HUM_DATASCI:
+                return "%s %s" % (HUM_DATASCI, mship.role.title)
+            latest_grant = self.latest_grant
+            if latest_grant:
+                return self.grant_label(latest_grant)
         else:
             return self.job_title
 
+    @staticmethod
+    def grant_label(grant):
+        """Label for someone who directed a project on the specified grant:
+        fellowships are labeled as fellows, anything else as a grant recipient."""
+        grant_type = grant.grant_type.grant_type
+        if "Fellow" in grant_type:
+            no_ship = grant_type.split("ship", 1)[0]
+            return f"{grant.years} {no_ship}"
+        # otherwise "X grant recipient"
+        return f"{grant.years} {grant_type} Grant Recipient"
+
     def autocomplete_label(self):
         """label when chosen with wagtailautocomplete"""
         return str(self)
@@ -586,19 +657,37 @@ class Profile(BasePage):
         ancestors = self.get_ancestors().live().public().specific()
         return ancestors[1:]  # removing root
 
+    #: number of items per page in the full activity history
+    activity_page_size = 12
+
     def get_context(self, request):
         """Add recent BlogPosts by this Person to their Profile."""
         context = super().get_context(request)
         # get 3 most recent published posts with this person as author;
         # get 3 most recent events with this person as a speaker;
         # get 3 most recent projects with this person as a member;
+        # all from the person's activity index
+        recent = self.person.activity.recent_by_kind(3)
+        kinds = PersonActivity.Kinds
+
+        # paginated history of everything, most recent first
+        paginator = Paginator(
+            self.person.activity.visible().recent(), self.activity_page_size
+        )
+        activity = paginator.get_page(request.GET.get("page"))
+        activity.object_list = PersonActivity.attach_pages(activity.object_list)
+
         # add to context and set open graph metadata
         context.update(
             {
                 "opengraph_type": "profile",
-                "recent_posts": self.person.posts.live().recent()[:3],
-                "recent_events": self.person.events.live().recent()[:3],
-                "recent_projects": self.person.members.live().recent()[:3],
+                "recent_posts": recent[kinds.POST],
+                "recent_events": recent[kinds.EVENT],
+                "recent_projects": recent[kinds.PROJECT],
+                "activity": activity,
+                # only list full history if there is more than shown above
+                "show_activity": paginator.count
+                > sum(len(pages) for pages in recent.values()),
             }
         )
         return context
@@ -664,6 +753,35 @@ class PeopleCategoryPage(BaseLandingPage, SidebarNavigationMixin, RoutablePageMi
     def get_context(self, request, *args, **kwargs):
         context = super().get_context(request, *args, **kwargs)
 
+        people = (
+            self.get_people()
+            .prefetch_related(
+                "image",
+                "image__renditions",
+                "profile",
+                "profile__image",
+                "related_links__type",
+            )
+            .prefetch_tile_positions()
+        )
+
+        for person in people:
+            person.position = person.get_position_for_tile(self.category)
+
+        context["people"] = people
+        return context
+
+    def get_people(self):
+        """People in the category for this page, in display order, as
+        stored in the :class:`PersonCategory` table."""
+        return Person.objects.filter(categories__category=self.category).order_by(
+            "categories__sort_order"
+        )
+
+    def get_category_people(self, category=None):
+        """Calculate the people in a category (by default, the category for
+        this page) in display order, based on positions, project memberships
+        and grants."""
         category_mapping = {
             self.PeopleCategories.STAFF: self.get_current_staff,
             self.PeopleCategories.PAST_STAFF: self.get_past_staff,
@@ -675,22 +793,7 @@ class PeopleCategoryPage(BaseLandingPage, SidebarNavigationMixin, RoutablePageMi
             self.PeopleCategories.SITS_WITH_EXECUTIVE_COMMITTEE: self.get_sits_with_executive_committee,
             self.PeopleCategories.PAST_EXECUTIVE_COMMITTEE: self.get_past_executive_committee,
         }
-
-        people = category_mapping[self.category]()
-        people = people.prefetch_related(
-            "image",
-            "image__renditions",
-            "profile",
-            "positions",
-            "positions__title",
-            "profile__image",
-        )
-
-        for person in people:
-            person.position = person.get_position_for_tile(self.category)
-
-        context["people"] = people
-        return context
+        return category_mapping[category or self.category]()
 
     def get_current_staff(self):
         people = (
@@ -842,6 +945,311 @@ class Position(DateRange):
         return "%s %s (%s)" % (self.person, self.title, self.start_date.year)
 
 
+#: generation name for the data people categories are based on; advanced
+#: when a person, position, project membership or grant changes
+PERSON_CATEGORY_GENERATION = "person-categories"
+
+
+class PersonCategory(models.Model):
+    """Materialized list of the people in each :class:`PeopleCategoryPage`
+    category, with display order, so that category pages can be rendered
+    from a single indexed query instead of recalculating membership from
+    positions, project memberships and grants on every request.
+
+    Changes to a :class:`Person`, :class:`Position`, project membership or
+    grant advance the :data:`PERSON_CATEGORY_GENERATION` generation once
+    they are committed; the ``refresh_people_categories --changed`` manage
+    command, run every few minutes from cron, refreshes the table when the
+    generation has changed since the last refresh, so that any number of
+    edits are applied with a single refresh. The table is also refreshed
+    when positions, memberships and grants start or end (see
+    :mod:`cdhweb.pages.schedule`)."""
+
+    #: cache key for the generation the table was last refreshed for
+    refreshed_cache_key = "person-categories-refreshed"
+
+    person = models.ForeignKey(
+        Person, on_delete=models.CASCADE, related_name="categories"
+    )
+    category = models.CharField(
+        max_length=50, choices=PeopleCategoryPage.PeopleCategories.choices
+    )
+    sort_order = models.PositiveIntegerField()
+
+    class Meta:
+        ordering = ["category", "sort_order"]
+        indexes = [models.Index(fields=["category", "sort_order"])]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["category", "person"], name="unique_person_category"
+            )
+        ]
+
+    def __str__(self):
+        return "%s (%s)" % (self.person, self.get_category_display())
+
+    @classmethod
+    def refresh(cls):
+        """Recalculate category membership and display order for everyone."""
+        # read before calculating, so that changes committed while the
+        # table is being refreshed are picked up by the next refresh
+        generation = get_generation(PERSON_CATEGORY_GENERATION)
+        page = PeopleCategoryPage()
+        entries = []
+        for category in PeopleCategoryPage.PeopleCategories.values:
+            person_ids = page.get_category_people(category).values_list("id", flat=True)
+            # dict preserves order while removing any duplicates
+            for sort_order, person_id in enumerate(dict.fromkeys(person_ids)):
+                entries.append(
+                    cls(person_id=person_id, category=category, sort_order=sort_order)
+                )
+        with transaction.atomic():
+            cls.objects.all().delete()
+            cls.objects.bulk_create(entries)
+        cache.set(cls.refreshed_cache_key, generation, None)
+
+    @classmethod
+    def refresh_if_changed(cls):
+        """Refresh the table if the data it is based on has changed since
+        the last refresh. Returns True if the table was refreshed."""
+        generation = get_generation(PERSON_CATEGORY_GENERATION)
+        if cache.get(cls.refreshed_cache_key) == generation:
+            return False
+        cls.refresh()
+        return True
+
+
+@receiver(post_save, sender=Person)
+@receiver(post_delete, sender=Person)
+@receiver(post_save, sender=Position)
+@receiver(post_delete, sender=Position)
+@receiver(post_save, sender="projects.Membership")
+@receiver(post_delete, sender="projects.Membership")
+@receiver(post_save, sender="projects.Grant")
+@receiver(post_delete, sender="projects.Grant")
+def person_categories_changed(sender, **kwargs):
+    """Handler to advance the people categories generation when any of the
+    data they are based on changes, once the transaction has been
+    committed; see :class:`PersonCategory`."""
+    # skip fixture loading
+    if kwargs.get("raw"):
+        return
+    transaction.on_commit(partial(bump_generation, PERSON_CATEGORY_GENERATION))
+
+
+class PersonActivityQuerySet(models.QuerySet):
+    def visible(self):
+        """Activity that should be listed on profiles: events are only
+        included once they are in the past, as for
+        :meth:`cdhweb.events.models.EventQuerySet.recent`."""
+        now = timezone.now()
+        # construct a datetime based on now but with zero hour/minute/second
+        today = datetime.datetime(
+            now.year, now.month, now.day, tzinfo=timezone.get_default_timezone()
+        )
+        return self.filter(
+            models.Q(end_time__isnull=True) | models.Q(end_time__lt=today),
+            page__live=True,
+        )
+
+    def recent(self):
+        """Order activity most recent first."""
+        return self.order_by(F("date").desc(nulls_last=True))
+
+    def recent_by_kind(self, limit):
+        """Find the most recent visible pages of each kind of activity,
+        with a single query. Returns a dictionary of lists of specific pages,
+        most recent first, keyed on kind."""
+        ranked = (
+            self.visible()
+            .annotate(
+                rank=Window(
+                    RowNumber(),
+                    partition_by=F("kind"),
+                    order_by=F("date").desc(nulls_last=True),
+                )
+            )
+            .filter(rank__lte=limit)
+            .order_by("kind", "rank")
+        )
+        recent = {kind: [] for kind in PersonActivity.Kinds.values}
+        for activity in PersonActivity.attach_pages(ranked):
+            recent[activity.kind].append(activity.page)
+        return recent
+
+
+class PersonActivity(models.Model):
+    """Index of the blog posts, events and projects associated with each
+    person, merged into a single timeline so that a profile can list a
+    person's activity from one indexed query. Kept up to date when pages are
+    published or unpublished and when authors, speakers or project members
+    are added or removed; can be rebuilt with the ``rebuild_person_activity``
+    manage command."""
+
+    class Kinds(models.TextChoices):
+        POST = "post", "Blog post"
+        EVENT = "event", "Event"
+        PROJECT = "project", "Project"
+
+    person = models.ForeignKey(
+        Person, on_delete=models.CASCADE, related_name="activity"
+    )
+    page = models.ForeignKey(Page, on_delete=models.CASCADE, related_name="+")
+    kind = models.CharField(max_length=10, choices=Kinds.choices)
+    date = models.DateTimeField(null=True, help_text="Date used to order the timeline")
+    end_time = models.DateTimeField(
+        null=True, help_text="End of the event; only listed once it is past"
+    )
+
+    objects = PersonActivityQuerySet.as_manager()
+
+    #: page types included in the index, keyed on model label: kind of
+    #: activity, model linking people to the page, name of the page field on
+    #: that model, and page field used to order the timeline
+    page_types = {
+        "blog.BlogPost": (Kinds.POST, "blog.Author", "post", "first_published_at"),
+        "events.Event": (Kinds.EVENT, "events.Speaker", "event", "start_time"),
+        "projects.Project": (
+            Kinds.PROJECT,
+            "projects.Membership",
+            "project",
+            "first_published_at",
+        ),
+    }
+
+    class Meta:
+        verbose_name_plural = "person activity"
+        indexes = [
+            models.Index(fields=["person", "-date"]),
+            models.Index(fields=["person", "kind", "-date"]),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["person", "page"], name="unique_person_activity"
+            )
+        ]
+
+    def __str__(self):
+        return "%s: %s %s" % (self.person, self.get_kind_display(), self.page)
+
+    @classmethod
+    def from_page(cls, page, person_id):
+        """Create (but don't save) an activity entry for a person on a
+        blog post, event or project page."""
+        kind, _, _, date_field = cls.page_types[page._meta.label]
+        return cls(
+            person_id=person_id,
+            page=page,
+            kind=kind,
+            date=getattr(page, date_field),
+            end_time=getattr(page, "end_time", None),
+        )
+
+    @classmethod
+    def update_for_page(cls, page):
+        """Replace the activity entries for a single page."""
+        _, through, page_field, _ = cls.page_types[page._meta.label]
+        person_ids = (
+            apps.get_model(through)
+            .objects.filter(**{page_field: page})
+            .values_list("person_id", flat=True)
+        )
+        with transaction.atomic():
+            cls.objects.filter(page=page).delete()
+            if page.live:
+                cls.objects.bulk_create(
+                    [cls.from_page(page, person_id) for person_id in set(person_ids)]
+                )
+
+    @classmethod
+    def rebuild(cls):
+        """Rebuild the activity index for all people from scratch."""
+        entries = []
+        for label, (_, through, page_field, _) in cls.page_types.items():
+            pages = apps.get_model(label).objects.live().in_bulk()
+            links = (
+                apps.get_model(through)
+                .objects.filter(**{"%s__in" % page_field: pages.keys()})
+                .values_list("%s_id" % page_field, "person_id")
+                .distinct()
+            )
+            entries.extend(
+                cls.from_page(pages[page_id], person_id) for page_id, person_id in links
+            )
+        with transaction.atomic():
+            cls.objects.all().delete()
+            cls.objects.bulk_create(entries)
+
+    @staticmethod
+    def attach_pages(activities):
+        """Replace the page on each of a list of activity entries with the
+        specific page, using one query per page type. Returns a list."""
+        activities = list(activities)
+        pages = Page.objects.filter(
+            pk__in=[activity.page_id for activity in activities]
+        ).specific()
+        pages = {page.pk: page for page in pages}
+        for activity in activities:
+            activity.page = pages[activity.page_id]
+        return activities
+
+
+@receiver(page_published)
+@receiver(page_unpublished)
+def update_person_activity(sender, instance, **kwargs):
+    """Handler to update the activity index when a blog post, event or
+    project is published or unpublished."""
+    if instance._meta.label in PersonActivity.page_types:
+        PersonActivity.update_for_page(instance)
+
+
+def _activity_page_field(through):
+    # name of the page field on a model linking people to activity pages
+    for _, label, page_field, _ in PersonActivity.page_types.values():
+        if through._meta.label == label:
+            return page_field
+
+
+@receiver(post_save, sender="blog.Author")
+@receiver(post_save, sender="events.Speaker")
+@receiver(post_save, sender="projects.Membership")
+def add_person_activity(sender, instance, raw=False, **kwargs):
+    """Handler to add a person's activity entry when they are added to a
+    live blog post, event or project."""
+    # skip fixture loading
+    if raw:
+        return
+    page = getattr(instance, _activity_page_field(sender))
+    if page.live:
+        entry = PersonActivity.from_page(page, instance.person_id)
+        PersonActivity.objects.update_or_create(
+            person_id=instance.person_id,
+            page=page,
+            defaults={
+                "kind": entry.kind,
+                "date": entry.date,
+                "end_time": entry.end_time,
+            },
+        )
+
+
+@receiver(post_delete, sender="blog.Author")
+@receiver(post_delete, sender="events.Speaker")
+@receiver(post_delete, sender="projects.Membership")
+def remove_person_activity(sender, instance, **kwargs):
+    """Handler to remove a person's activity entry when they are no longer
+    linked to a blog post, event or project."""
+    page_field = "%s_id" % _activity_page_field(sender)
+    page_id = getattr(instance, page_field)
+    # a person may have more than one membership on the same project
+    if not sender.objects.filter(
+        **{page_field: page_id, "person_id": instance.person_id}
+    ).exists():
+        PersonActivity.objects.filter(
+            page_id=page_id, person_id=instance.person_id
+        ).delete()
+
+
 def init_person_from_ldap(user, ldapinfo):
     """Extra User init logic for creating and auto-populating a corresponding
     Person with data from LDAP."""
@@ -185,6 +185,44 @@ class TestPerson:
         grant2.save()
         assert person.latest_grant == grant2
 
+    def test_latest_grant_prefetched(self, grad_pi, faculty_pi, staffer):
+        people = Person.objects.filter(
+            pk__in=[grad_pi.pk, faculty_pi.pk, staffer.pk]
+        ).prefetch_tile_positions()
+        # prefetched memberships and grants should give the same result
+        for person in people:
+            assert person.latest_grant == Person.objects.get(pk=person.pk).latest_grant
+
+    def test_get_position_for_tile(self, staffer, grad_pi, faculty_pi):
+        assert staffer.get_position_for_tile("staff") == staffer.positions.first().title
+        assert grad_pi.get_position_for_tile("students") == "%s %s Grant Recipient" % (
+            grad_pi.latest_grant.years,
+            grad_pi.latest_grant.grant_type.grant_type,
+        )
+        assert faculty_pi.get_position_for_tile("affiliates").startswith(
+            faculty_pi.latest_grant.years
+        )
+        # other categories use job title
+        assert faculty_pi.get_position_for_tile("executive") == faculty_pi.job_title
+
+    def test_get_position_for_tile_prefetched(
+        self, django_assert_num_queries, staffer, postdoc, grad_pi, faculty_pi
+    ):
+        people = Person.objects.all().prefetch_tile_positions()
+        # people, positions, memberships and grants
+        with django_assert_num_queries(4):
+            people = list(people)
+            labels = {
+                (person.pk, category): person.get_position_for_tile(category)
+                for person in people
+                for category in ["staff", "students", "affiliates"]
+            }
+        # labels match those calculated without prefetching
+        for person in Person.objects.all():
+            for category in ["staff", "students", "affiliates"]:
+                label = person.get_position_for_tile(category)
+                assert label == labels[(person.pk, category)]
+
     def test_autocomplete_label(self, staffer):
         assert staffer.autocomplete_label() == str(staffer)
 
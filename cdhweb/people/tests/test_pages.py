@@ -1,9 +1,11 @@
 import datetime
 import json
+from datetime import date
 
 import pytest
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError
+from django.core.management import call_command
 from django.test import RequestFactory
 from django.utils import timezone
 from wagtail.models import Page
@@ -11,8 +13,19 @@ from wagtail.test.utils import WagtailPageTestCase
 from wagtail.test.utils.form_data import rich_text
 
 from cdhweb.blog.models import Author, BlogPost
+from cdhweb.events.models import Speaker
 from cdhweb.pages.models import LinkPage
-from cdhweb.people.models import PeopleLandingPageArchived, Person, Profile
+from cdhweb.people.models import (
+    PeopleCategoryPage,
+    PeopleLandingPageArchived,
+    Person,
+    PersonActivity,
+    PersonCategory,
+    Position,
+    Profile,
+    Title,
+)
+from cdhweb.projects.models import Membership, Role
 
 
 class TestPeopleLandingPageArchived(WagtailPageTestCase):
@@ -110,6 +123,83 @@ class TestProfile:
         assert posts["four"] not in context["recent_posts"]
         assert posts["one"] not in context["recent_posts"]
 
+    def test_recent_activity(
+        self, rf, staffer_profile, staffer, article, lecture, workshop, derrida
+    ):
+        """profile should have recent activity of each kind in context"""
+        Speaker.objects.create(person=staffer, event=lecture)
+        Speaker.objects.create(person=staffer, event=workshop)
+        role = Role.objects.get_or_create(title="Lead Developer")[0]
+        Membership.objects.create(
+            person=staffer, project=derrida, role=role, start_date=date(2019, 1, 1)
+        )
+        context = staffer_profile.get_context(rf.get(staffer_profile.get_url()))
+        assert context["recent_posts"] == [article]
+        # most recent first
+        assert context["recent_events"] == [workshop, lecture]
+        assert context["recent_projects"] == [derrida]
+        # everything is shown above, so full history isn't needed
+        assert not context["show_activity"]
+        assert len(context["activity"]) == 4
+
+        # unpublishing removes from activity
+        workshop.unpublish()
+        context = staffer_profile.get_context(rf.get(staffer_profile.get_url()))
+        assert context["recent_events"] == [lecture]
+
+    def test_activity_history(self, rf, staffer_profile, staffer, blog_link_page):
+        """profile should paginate the full activity history"""
+        for i in range(Profile.activity_page_size + 1):
+            post = BlogPost(title="post %d" % i)
+            post.first_published_at = timezone.make_aware(
+                datetime.datetime(2021, 1, i + 1)
+            )
+            blog_link_page.add_child(instance=post)
+            Author.objects.create(post=post, person=staffer)
+        context = staffer_profile.get_context(rf.get(staffer_profile.get_url()))
+        assert len(context["recent_posts"]) == 3
+        assert context["show_activity"]
+        assert context["activity"].has_next()
+        assert context["activity"][0].page.title == "post 12"
+        context = staffer_profile.get_context(
+            rf.get(staffer_profile.get_url(), {"page": 2})
+        )
+        assert [item.page.title for item in context["activity"]] == ["post 0"]
+
+
+class TestPersonActivity:
+    def test_membership_removed(self, derrida):
+        membership = derrida.memberships.first()
+        person = membership.person
+        assert PersonActivity.objects.filter(person=person, page=derrida).exists()
+        # still listed while they have another membership on the project
+        Membership.objects.create(
+            person=person,
+            project=derrida,
+            role=membership.role,
+            start_date=date(2010, 1, 1),
+        )
+        membership.delete()
+        assert PersonActivity.objects.filter(person=person, page=derrida).exists()
+        Membership.objects.filter(person=person, project=derrida).delete()
+        assert not PersonActivity.objects.filter(person=person, page=derrida).exists()
+
+    def test_publish(self, article, staffer):
+        article.unpublish()
+        assert not PersonActivity.objects.filter(page=article).exists()
+        article.save_revision().publish()
+        assert PersonActivity.objects.filter(page=article, person=staffer).exists()
+
+    def test_rebuild(self, article, lecture, derrida):
+        expected = set(PersonActivity.objects.values_list("person", "page", "kind"))
+        PersonActivity.objects.all().delete()
+        call_command("rebuild_person_activity", verbosity=0)
+        assert (
+            set(PersonActivity.objects.values_list("person", "page", "kind"))
+            == expected
+        )
+        assert PersonActivity.objects.filter(kind="event", page=lecture).exists()
+
 
 class TestProfilePage(WagtailPageTestCase):
     def test_parent_pages(self):
@@ -119,3 +209,86 @@ class TestProfilePage(WagtailPageTestCase):
     def test_child_pages(self):
         """no allowed children"""
         self.assertAllowedSubpageTypes(Profile, [])
+
+
+@pytest.fixture
+def category_people(
+    staffer, postdoc, student, grad_pi, grad_pm, faculty_pi, faculty_exec, staff_exec
+):
+    return [
+        staffer,
+        postdoc,
+        student,
+        grad_pi,
+        grad_pm,
+        faculty_pi,
+        faculty_exec,
+        staff_exec,
+    ]
+
+
+class TestPersonCategory:
+    def test_refresh(self, category_people):
+        PersonCategory.refresh()
+        page = PeopleCategoryPage()
+        for category in PeopleCategoryPage.PeopleCategories.values:
+            expected = list(
+                dict.fromkeys(
+                    page.get_category_people(category).values_list("id", flat=True)
+                )
+            )
+            stored = PersonCategory.objects.filter(category=category).values_list(
+                "person_id", flat=True
+            )
+            assert list(stored) == expected
+        # replaces existing entries
+        total = PersonCategory.objects.count()
+        PersonCategory.refresh()
+        assert PersonCategory.objects.count() == total
+
+    def test_refresh_on_change(self, django_capture_on_commit_callbacks, db):
+        PersonCategory.refresh()
+        assert not PersonCategory.refresh_if_changed()
+        title = Title.objects.get_or_create(title="DH Developer")[0]
+        with django_capture_on_commit_callbacks(execute=True):
+            person = Person.objects.create(first_name="New", cdh_staff=True)
+            Position.objects.create(
+                person=person, title=title, start_date=date(2020, 1, 1)
+            )
+            # changes are only marked once committed
+            assert not PersonCategory.refresh_if_changed()
+        assert not PersonCategory.objects.filter(person=person).exists()
+        # any number of changes are applied with one refresh
+        assert PersonCategory.refresh_if_changed()
+        assert not PersonCategory.refresh_if_changed()
+        assert PersonCategory.objects.filter(category="staff", person=person).exists()
+
+        with django_capture_on_commit_callbacks(execute=True):
+            person.delete()
+        assert PersonCategory.refresh_if_changed()
+        assert not PersonCategory.objects.filter(person=person.pk).exists()
+
+    def test_command(self, category_people, capsys):
+        call_command("refresh_people_categories", verbosity=0)
+        assert PersonCategory.objects.filter(category="staff").exists()
+        call_command("refresh_people_categories", changed=True)
+        assert "up to date" in capsys.readouterr().out
+
+
+class TestPeopleCategoryPage:
+    def test_get_people(self, category_people, django_assert_num_queries):
+        page = PeopleCategoryPage(category="staff")
+        PersonCategory.refresh()
+        assert list(page.get_people()) == list(page.get_category_people().distinct())
+        # listing people is a single select
+        with django_assert_num_queries(1):
+            list(page.get_people())
+
+    def test_get_context(self, rf, category_people, staffer, faculty_pi):
+        PersonCategory.refresh()
+        page = PeopleCategoryPage(category="staff")
+        context = page.get_context(rf.get("/"))
+        assert staffer in context["people"]
+        assert faculty_pi not in context["people"]
+        for person in context["people"]:
+            assert person.position == person.get_position_for_tile("staff")
@@ -1,11 +1,24 @@
+from django.db.models import Count
+from django.utils.text import slugify
+from wagtail import hooks
 from wagtail_modeladmin.mixins import ThumbnailMixin
 from wagtail_modeladmin.options import ModelAdmin, ModelAdminGroup, modeladmin_register
 
+from cdhweb.pages.benchmarks import page_benchmark
+from cdhweb.pages.modeladmin import ListQueryMixin, StreamingExportMixin
 from cdhweb.pages.models import RelatedLinkType
-from cdhweb.people.models import Person, Profile, Title
+from cdhweb.pages.schedule import TimeBoundary
+from cdhweb.people.models import (
+    PeopleCategoryPage,
+    Person,
+    PersonCategory,
+    PersonQuerySet,
+    Profile,
+    Title,
+)
 
 
-class PersonAdmin(ThumbnailMixin, ModelAdmin):
+class PersonAdmin(ListQueryMixin, StreamingExportMixin, ThumbnailMixin, ModelAdmin):
     model = Person
     menu_icon = "group"
     list_display = (
@@ -16,6 +29,10 @@ class PersonAdmin(ThumbnailMixin, ModelAdmin):
         "cdh_staff",
     )
     list_display_add_buttons = "first_name"
+    list_select_related = ("image",)
+    list_prefetch_related = PersonQuerySet.tile_position_prefetches()[:1] + [
+        "image__renditions"
+    ]
     search_fields = ("first_name", "last_name", "user__username")
     list_filter = ("pu_status", "cdh_staff")
     list_export = (
@@ -29,24 +46,39 @@ class PersonAdmin(ThumbnailMixin, ModelAdmin):
         "latest_grant",
         "profile_url",
     )
+    export_prefetch = {
+        # positions with titles; memberships with roles, projects and grants
+        "most_recent_title": PersonQuerySet.tile_position_prefetches()[:1],
+        "latest_grant": PersonQuerySet.tile_position_prefetches()[1:],
+        "profile_url": ["profile", "related_links__type"],
+    }
     list_per_page = 25
     export_filename = "cdhweb-people"
     thumb_image_field_name = "image"
 
 
-class TitleAdmin(ModelAdmin):
+class TitleAdmin(ListQueryMixin, ModelAdmin):
     model = Title
     menu_icon = "order"
     list_display = ("title", "sort_order", "num_people")
+    list_annotations = {"people_count": Count("positions", distinct=True)}
     search_fields = ("title",)
 
+    def num_people(self, obj):
+        return obj.people_count
 
-class ProfileAdmin(ThumbnailMixin, ModelAdmin):
+    num_people.short_description = Title.num_people.short_description
+    num_people.admin_order_field = "people_count"
+
+
+class ProfileAdmin(ListQueryMixin, ThumbnailMixin, ModelAdmin):
     model = Profile
     menu_icon = "user"
     list_display = ("admin_thumb", "title", "live")
     list_display_add_buttons = "title"
     list_filter = ("person__pu_status", "person__cdh_staff")
+    list_select_related = ("image",)
+    list_prefetch_related = ["image__renditions"]
     list_per_page = 25
     search_fields = ("title", "body")
     ordering = ("title",)
@@ -67,3 +99,39 @@ class PeopleGroup(ModelAdminGroup):
 
 
 modeladmin_register(PeopleGroup)
+
+
+@hooks.register("register_time_boundaries")
+def register_people_boundaries():
+    """Refresh people category listings when positions, project memberships
+    and grants start or end."""
+    boundaries = []
+    for model in ["people.Position", "projects.Membership", "projects.Grant"]:
+        boundaries.extend(
+            [
+                # current from the start date, through the end date
+                TimeBoundary(
+                    "people", model, "start_date", 0, callbacks=[PersonCategory.refresh]
+                ),
+                TimeBoundary(
+                    "people", model, "end_date", 1, callbacks=[PersonCategory.refresh]
+                ),
+            ]
+        )
+    return boundaries
+
+
+@hooks.register("register_benchmarks")
+def register_people_benchmarks():
+    """Every people category page, and a profile."""
+    benchmarks = []
+    for category in PeopleCategoryPage.PeopleCategories.values:
+        benchmarks.extend(
+            page_benchmark(
+                "people-%s" % slugify(category),
+                PeopleCategoryPage.objects.filter(category=category),
+                40,
+            )
+        )
+    benchmarks.extend(page_benchmark("profile", Profile.objects.all(), 40))
+    return benchmarks
@@ -14,6 +14,7 @@ from wagtailautocomplete.edit_handlers import AutocompletePanel
 from cdhweb.pages.blocks.accordion_block import ProjectAccordion
 from cdhweb.pages.mixin import OpenGraphMixin, StandardHeroMixin
 from cdhweb.pages.models import BasePage, DateRange, LandingPage, LinkPage, RelatedLink
+from cdhweb.pages.utils import get_website_link
 from cdhweb.people.models import Person
 
 
@@ -224,23 +225,27 @@ class Project(BasePage, OpenGraphMixin, ClusterableModel, StandardHeroMixin):
     @property
     def website_url(self):
         """URL for this Project's website, if set"""
-        website = self.related_links.filter(type__name="Website").first()
         if self.project_website:
             return self.project_website
-        elif website:
+        website = get_website_link(self)
+        if website:
             return website.url
 
     def latest_grant(self):
         """Most recent :class:`Grant` for this Project"""
-        if self.grants.count():
-            return self.grants.order_by("-start_date").first()
+        return self.grants.order_by("-start_date").first()
 
     def current_memberships(self):
         """:class:`MembershipQueryset` of current members sorted by role"""
         # NOTE memberships is a FakeQuerySet from modelcluster.ParentalKey when
         # the page is being previewed in wagtail, so Q lookups are not possible.
         # see: https://github.com/wagtail/django-modelcluster/issues/121
-        memberships = Membership.objects.filter(project__pk=self.pk)
+        # fetch what is displayed for each member, including profile urls
+        memberships = (
+            Membership.objects.filter(project__pk=self.pk)
+            .select_related("role", "person__profile")
+            .prefetch_related("person__related_links__type")
+        )
         # uses memberships rather than members so that we can retain role
         # information attached to the membership
         today = timezone.now().date()
@@ -267,6 +272,8 @@ class Project(BasePage, OpenGraphMixin, ClusterableModel, StandardHeroMixin):
             self.members.distinct()
             .exclude(membership__in=self.current_memberships())
             .order_by("last_name")
+            .select_related("profile")
+            .prefetch_related("related_links__type")
         )
 
     def get_sitemap_urls(self, request):
@@ -1,6 +1,7 @@
 from wagtail.test.utils import WagtailPageTestCase
 
 from cdhweb.pages.models import LinkPage, RelatedLinkType
+from cdhweb.pages.nplusone import NPlusOneDetector
 from cdhweb.people.models import Person
 from cdhweb.projects.models import (
     Grant,
@@ -65,6 +66,12 @@ class TestProject:
         assert chloe not in alums
         assert renee not in alums
 
+    def test_page_queries(self, client, derrida):
+        """project page should not query once per team member"""
+        with NPlusOneDetector(threshold=3, raise_error=True):
+            response = client.get(derrida.url)
+        assert response.status_code == 200
+
     def test_sitemap(self, rf, derrida):
         """project should increase sitemap priority if built by cdh with site"""
         # project not built by cdh and without site doesn't set priority
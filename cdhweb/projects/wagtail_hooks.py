@@ -1,6 +1,9 @@
+from wagtail import hooks
 from wagtail_modeladmin.mixins import ThumbnailMixin
 from wagtail_modeladmin.options import ModelAdmin, ModelAdminGroup, modeladmin_register
 
+from cdhweb.pages.benchmarks import page_benchmark
+from cdhweb.pages.modeladmin import ListQueryMixin, StreamingExportMixin
 from cdhweb.projects.models import (
     GrantType,
     Membership,
@@ -8,16 +11,19 @@ from cdhweb.projects.models import (
     ProjectField,
     ProjectMethod,
     ProjectRole,
+    ProjectsLandingPage,
     Role,
 )
 
 
-class ProjectAdmin(ThumbnailMixin, ModelAdmin):
+class ProjectAdmin(ListQueryMixin, StreamingExportMixin, ThumbnailMixin, ModelAdmin):
     model = Project
     menu_label = "Projects"
     menu_icon = "site"
     list_display = ("admin_thumb", "title", "live", "cdh_built")
     list_display_add_buttons = "title"
+    list_select_related = ("feed_image",)
+    list_prefetch_related = ["feed_image__renditions"]
     list_filter = ("grants__grant_type",)
     list_export = (
         "title",
@@ -29,9 +35,13 @@ class ProjectAdmin(ThumbnailMixin, ModelAdmin):
         "website_url",
         "last_published_at",
     )
+    export_prefetch = {
+        "tags": ["tags"],
+        "website_url": ["related_links__type"],
+    }
     search_fields = ("title", "description", "body")
     export_filename = "cdhweb-projects"
-    thumb_image_field_name = "thumbnail"
+    thumb_image_field_name = "feed_image"
     thumb_col_header_text = "thumbnail"
     ordering = ("title",)
 
@@ -107,3 +117,16 @@ class ProjectsGroup(ModelAdminGroup):
 
 
 modeladmin_register(ProjectsGroup)
+
+
+@hooks.register("register_benchmarks")
+def register_project_benchmarks():
+    """Project listings, unfiltered and with filters, and a project."""
+    landing_pages = ProjectsLandingPage.objects.all()
+    return [
+        *page_benchmark("projects", landing_pages, 35),
+        *page_benchmark("projects-past", landing_pages, 35, "?current="),
+        *page_benchmark("projects-built", landing_pages, 35, "?cdh_built=on"),
+        *page_benchmark("projects-search", landing_pages, 35, "?q=data"),
+        *page_benchmark("project", Project.objects.all(), 65),
+    ]
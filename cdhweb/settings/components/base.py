@@ -45,6 +45,10 @@ MEDIA_URL = "/media/"
 # Example: "/home/media/media.lawrence.com/media/"
 MEDIA_ROOT = BASE_DIR / MEDIA_URL.strip("/")
 
+# Absolute filesystem path to the directory for request profiles, which are
+# only served to staff through the admin; must not be publicly served.
+REQUEST_PROFILE_ROOT = BASE_DIR / "request_profiles"
+
 
 ########################
 # MAIN DJANGO SETTINGS #
@@ -208,6 +212,10 @@ INSTALLED_APPS = [
 # these middleware classes will be applied in the order given, and in the
 # response phase the middleware will be applied in reverse order.
 MIDDLEWARE = [
+    # only used when SERVER_TIMING is enabled; first, to time everything else
+    "cdhweb.pages.timing.ServerTimingMiddleware",
+    # only used when NPLUSONE_SAMPLE_RATE is set
+    "cdhweb.pages.nplusone.NPlusOneMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.BrokenLinkEmailsMiddleware",
     # Uncomment if using internationalisation or localisation
@@ -215,9 +223,11 @@ MIDDLEWARE = [
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    # only used when REQUEST_PROFILING is enabled; after authentication
+    "cdhweb.pages.profiling.ProfilingMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
-    "wagtail.contrib.redirects.middleware.RedirectMiddleware",
+    "cdhweb.pages.redirects.RedirectMiddleware",
 ]
 
 DEFAULT_AUTO_FIELD = "django.db.models.AutoField"
@@ -286,15 +296,16 @@ WAGTAILSEARCH_BACKENDS = {
     },
 }
 
-# enable feature detection in images
-WAGTAILIMAGES_FEATURE_DETECTION_ENABLED = True
+# suggest focal points for images in the background, with the
+# detect_focal_points manage command, instead of while uploading
+WAGTAILIMAGES_FEATURE_DETECTION_ENABLED = False
 
 # custom document model
 WAGTAILDOCS_DOCUMENT_MODEL = "cdhpages.LocalAttachment"
 
 # custom embed finders
 WAGTAILEMBEDS_FINDERS = [
-    {"class": "wagtail.embeds.finders.oembed"},
+    {"class": "cdhweb.pages.embed_finders.OEmbedFinder"},
     {"class": "cdhweb.pages.embed_finders.GlitchHubEmbedFinder"},
 ]
 
@@ -431,13 +442,14 @@ media_central_provider = {
 # These will be tried in order; we put the Media Central one first so that the
 # custom provider will be used. See:
 # https://docs.wagtail.io/en/stable/advanced_topics/embeds.html#customising-the-provider-list
+# The oEmbed finder is wagtail's, with pooled connections and timeouts.
 WAGTAILEMBEDS_FINDERS = [
     {
-        "class": "wagtail.embeds.finders.oembed",
+        "class": "cdhweb.pages.embed_finders.OEmbedFinder",
         "providers": [media_central_provider],
     },
     {
-        "class": "wagtail.embeds.finders.oembed",
+        "class": "cdhweb.pages.embed_finders.OEmbedFinder",
     },
     {"class": "cdhweb.pages.embed_finders.GlitchHubEmbedFinder"},
 ]
@@ -7,24 +7,21 @@ from django.urls import include, path, re_path
 from django.views.generic.base import RedirectView, TemplateView
 from wagtail import urls as wagtail_urls
 from wagtail.admin import urls as wagtailadmin_urls
-from wagtail.contrib.sitemaps import Sitemap
-from wagtail.contrib.sitemaps import views as sitemap_views
 from wagtail.documents import urls as wagtaildocs_urls
 from wagtailautocomplete.urls.admin import urlpatterns as autocomplete_admin_urls
 
 from cdhweb.blog.views import AtomBlogPostFeed, BlogPostRedirectView, RssBlogPostFeed
 from cdhweb.context_processors import favicon_path
-from cdhweb.events.views import EventIcalView
-from cdhweb.pages.views import OpenSearchDescriptionView, SiteSearchView
+from cdhweb.events.views import EventCalendarView, EventIcalView, IcalCalendarView
+from cdhweb.pages.views import (
+    DocumentServeView,
+    OpenSearchDescriptionView,
+    SitemapView,
+    SiteSearchView,
+)
 
 admin.autodiscover()
 
-# sitemap configuration for sections of the site
-sitemaps = {
-    "pages": Sitemap,  # wagtail content pages
-}
-
-
 urlpatterns = [
     # wagtail autocompletes; must come before admin urls
     re_path(r"^cms/autocomplete/", include(autocomplete_admin_urls)),
@@ -50,16 +47,15 @@ urlpatterns = [
     ),
     # CAS login urls
     path("accounts/", include("pucas.cas_urls")),
-    # sitemaps
-    path(
-        "sitemap.xml", sitemap_views.index, {"sitemaps": sitemaps}, name="sitemap-index"
-    ),
+    # sitemaps; prebuilt for each section, see cdhweb.pages.sitemaps
+    path("sitemap.xml", SitemapView.as_view(), name="sitemap-index"),
     re_path(
         r"^sitemap-(?P<section>.+)\.xml$",
-        sitemap_views.sitemap,
-        {"sitemaps": sitemaps},
+        SitemapView.as_view(),
         name="django.contrib.sitemaps.views.sitemap",
     ),
+    path("events/calendar.ics", IcalCalendarView.as_view(), name="events-ical"),
+    path("events/calendar.json", EventCalendarView.as_view(), name="events-calendar"),
     re_path(
         r"^events/(?P<year>\d{4})/(?P<month>\d{2})/(?P<slug>[\w-]+).ics$",
         EventIcalView.as_view(),
@@ -67,6 +63,12 @@ urlpatterns = [
     ),
     # wagtail paths
     path("cms/", include(wagtailadmin_urls)),
+    # documents are served by the front-end server when configured; see
+    # cdhweb.pages.documents
+    path(
+        "documents/<int:document_id>/<str:document_filename>",
+        DocumentServeView.as_view(),
+    ),
     path("documents/", include(wagtaildocs_urls)),
     path("updates/rss/", RssBlogPostFeed(), name="rss"),
     path("updates/atom/", AtomBlogPostFeed(), name="atom"),